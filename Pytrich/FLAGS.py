@@ -3,4 +3,13 @@ LOG_SEARCH=True
 LOG_HEURISTIC=False
 MONITOR_SEARCH_RESOURCES=False #monitor resources while search
 MONITOR_LM_TIME=False #monitor time elapsed for landmark components
-USE_TO_REACHABILITY=False
\ No newline at end of file
+USE_MUTEX_PRUNING=False #drop operators and methods with mutually exclusive preconditions (SAS mutex groups)
+USE_TO_REACHABILITY=False
+USE_MACROS=False #inline single-method tasks and compile leading operator runs into macros
+USE_FACT_RELEVANCE=False #drop facts no condition depends on and re-index the rest densely
+USE_DUPLICATE_ELIMINATION=False #merge operators and methods with equal preconditions, effects and networks
+USE_METHOD_DOMINANCE=False #also drop methods dominated by a weaker-precondition twin (implies duplicate elimination)
+USE_METHOD_TRIE=False #factor shared leading subtasks of methods into a trie of artificial tasks
+PACKED_STATES=False #store states in the closed list with one field per SAS variable (see PackedStateLayout)
+MODEL_CACHE_DIR=None #directory of post-processed model snapshots, disabled if None
+GROUNDING_CACHE_DIR=None #directory of grounded SAS files keyed by domain/problem content, disabled if None
@@ -0,0 +1,197 @@
+"""
+Grounds every domain/problem pair of a benchmark folder in parallel and
+stores the SAS files in the grounding cache, so later planner runs with
+--grounding_cache skip PANDA entirely.
+
+    python -m Pytrich.Grounder.batch_grounding <benchmark_folder> \
+        --grounding_cache <dir> [-j N] [--time_limit s] [--memory_limit MB]
+
+Each problem is grounded in its own process (and process group) under
+CPU-time and address-space limits; at most N run at once. One JSON record
+per problem is printed (or appended to --output) with its status, grounding
+time and model sizes (Model.problem_stats).
+
+The processes are started by a forkserver: the pool's threads never fork
+the planner process itself, so no child inherits a lock held by another
+thread.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import Pytrich.FLAGS as FLAGS
+from Pytrich.Grounder.panda_ground import PandaGrounder
+
+IGNORED_DOMAINS = ("ipc2020-feature-tests", "SCCTEST")
+
+
+def find_problems(benchmark_folder: str, ignored_domains=IGNORED_DOMAINS) -> List[Tuple[str, str, str]]:
+    """
+    (domain name, domain file, problem file) for each problem, paired as in
+    Experiments/bash_scripts/benchmark_runner.sh: a single *domain*.hddl
+    serves every problem of its folder, otherwise <name>-domain.hddl pairs
+    with <name>.hddl.
+    """
+    problems = []
+    for domain_name in sorted(os.listdir(benchmark_folder)):
+        domain_dir = os.path.join(benchmark_folder, domain_name)
+        if not os.path.isdir(domain_dir) or domain_name in ignored_domains:
+            continue
+        files = sorted(f for f in os.listdir(domain_dir)
+                       if f.endswith('.hddl') and '-grounded' not in f.lower()
+                       and os.path.isfile(os.path.join(domain_dir, f)))
+        domain_files = [f for f in files if 'domain' in f]
+        problem_files = [f for f in files if 'domain' not in f]
+        if len(domain_files) == 1:
+            problems.extend((domain_name, os.path.join(domain_dir, domain_files[0]), os.path.join(domain_dir, p))
+                            for p in problem_files)
+            continue
+        for domain_file in domain_files:
+            for suffix in ('-domain-grounded.hddl', '-domain.hddl'):
+                if domain_file.endswith(suffix):
+                    problem_file = domain_file[:-len(suffix)] + '.hddl'
+                    if problem_file in problem_files:
+                        problems.append((domain_name, os.path.join(domain_dir, domain_file),
+                                         os.path.join(domain_dir, problem_file)))
+                    break
+    return problems
+
+
+def _limit_status(returncode: int, memory_limit: int) -> Optional[str]:
+    """
+    TIMEOUT or MEMOUT when a process (the grounding child or PANDA) was
+    ended by the signal one of its limits produces, None otherwise:
+        - reaching the RLIMIT_CPU soft limit sends SIGXCPU
+        - running out of RLIMIT_AS aborts C++ code (uncaught std::bad_alloc)
+          or crashes it on the failed allocation, and the kernel's OOM
+          killer sends SIGKILL
+    `returncode` follows subprocess/multiprocessing: -N for signal N.
+    """
+    if returncode == -signal.SIGXCPU:
+        return 'TIMEOUT'
+    if memory_limit and returncode in (-signal.SIGABRT, -signal.SIGSEGV, -signal.SIGKILL):
+        return 'MEMOUT'
+    return None
+
+
+def _ground_problem(conn, domain_file: str, problem_file: str, cache_dir: str,
+                    model_cache: Optional[str], time_limit: int, memory_limit: int):
+    """Child process: grounds one problem under resource limits and sends back its record."""
+    os.setpgid(0, 0)
+    # PANDA writes to the inherited stdout, keep it out of the records
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    # hard limit above the soft one: SIGXCPU is sent first, SIGKILL only if ignored
+    resource.setrlimit(resource.RLIMIT_CPU, (time_limit, time_limit + 1))
+    if memory_limit:
+        limit = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    FLAGS.GROUNDING_CACHE_DIR = cache_dir
+    FLAGS.MODEL_CACHE_DIR = model_cache
+
+    record = {}
+    start_time = time.time()
+    try:
+        grounder = PandaGrounder(domain_file=domain_file, problem_file=problem_file)
+        model = grounder()
+        record['grounding_time'] = time.time() - start_time
+        record['cache'] = 'HIT' if grounder.grounding_cache_hit else 'MISS'
+        if model is None:
+            record['status'] = 'FAILED'
+        else:
+            record['status'] = 'SUCCESS'
+            record.update(model.problem_stats())
+    except MemoryError:
+        record['status'] = 'MEMOUT'
+    except subprocess.CalledProcessError as e:
+        record['status'] = _limit_status(e.returncode, memory_limit) or 'FAILED'
+        record['error'] = str(e)
+    except Exception as e:
+        record['status'] = 'FAILED'
+        record['error'] = f'{type(e).__name__}: {e}'
+    conn.send(record)
+    conn.close()
+
+
+def ground_one(domain_name: str, domain_file: str, problem_file: str, cache_dir: str,
+               model_cache: Optional[str] = None, time_limit: int = 120, memory_limit: int = 8192) -> Dict:
+    """
+    Grounds one problem in a fresh process and waits at most `time_limit`
+    wall-clock seconds; the whole process group (PANDA included) is killed
+    on timeout. A process ending without a record is classified from its
+    exit signal (see _limit_status).
+    """
+    ctx = multiprocessing.get_context('forkserver')
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_ground_problem,
+                          args=(sender, domain_file, problem_file, cache_dir, model_cache, time_limit, memory_limit))
+    start_time = time.time()
+    process.start()
+    sender.close()
+    record = {'domain': domain_name, 'problem': os.path.basename(problem_file)}
+    if receiver.poll(time_limit):
+        try:
+            record.update(receiver.recv())
+        except EOFError:
+            record['status'] = 'CRASHED'
+    else:
+        record['status'] = 'TIMEOUT'
+    if process.is_alive() or record['status'] in ('TIMEOUT', 'CRASHED'):
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+    process.join()
+    receiver.close()
+    record.setdefault('grounding_time', time.time() - start_time)
+    if record['status'] == 'CRASHED':
+        record['status'] = _limit_status(process.exitcode, memory_limit) or 'CRASHED'
+    return record
+
+
+def ground_benchmarks(benchmark_folder: str, cache_dir: str, jobs: int = os.cpu_count(),
+                      model_cache: Optional[str] = None, time_limit: int = 120,
+                      memory_limit: int = 8192, output=sys.stdout) -> List[Dict]:
+    """
+    Grounds every problem of benchmark_folder with at most `jobs` processes
+    alive at once; records are written to `output` as they complete.
+    """
+    problems = find_problems(benchmark_folder)
+    records = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(ground_one, domain_name, domain_file, problem_file,
+                                   cache_dir, model_cache, time_limit, memory_limit)
+                   for domain_name, domain_file, problem_file in problems]
+        for future in futures:
+            record = future.result()
+            records.append(record)
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+    return records
+
+
+def main():
+    argparser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    argparser.add_argument("benchmark_folder", help="Folder with one sub-folder of HDDL files per domain")
+    argparser.add_argument("--grounding_cache", required=True, help="Grounding cache directory to populate")
+    argparser.add_argument("--model_cache", help="Also store post-processed model snapshots in this directory")
+    argparser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Problems grounded in parallel")
+    argparser.add_argument("--time_limit", type=int, default=120, help="Seconds per problem")
+    argparser.add_argument("--memory_limit", type=int, default=8192, help="Address space per problem in MB (0 disables it)")
+    argparser.add_argument("-o", "--output", help="Append the JSON records to this file instead of stdout")
+    args = argparser.parse_args()
+
+    with (open(args.output, 'a') if args.output else contextlib.nullcontext(sys.stdout)) as output:
+        ground_benchmarks(args.benchmark_folder, args.grounding_cache, args.jobs, args.model_cache,
+                          args.time_limit, args.memory_limit, output)
+
+
+if __name__ == "__main__":
+    main()
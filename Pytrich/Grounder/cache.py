@@ -0,0 +1,120 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional
+
+# bump whenever the grounder invocation changes the produced SAS files
+GROUNDING_CACHE_VERSION = 1
+GROUNDER_FLAGS = ('-q', '-D', '-e')
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive advisory lock (flock) on `path`, created if missing."""
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def atomic_output(path: str, mode: str = 'wb'):
+    """
+    Yields a file in path's directory that replaces `path` once it is
+    completely written; on error it is removed and `path` is untouched.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def content_hash(paths: Iterable[str], *extra: str) -> str:
+    """SHA-256 over the content of each file in `paths` and the `extra` strings."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        digest.update(b'\0')
+    for value in extra:
+        digest.update(value.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class GroundingCache:
+    """
+    Content-addressed store of grounded SAS files:
+        <cache_dir>/<key>.psas   key = hash(domain, problem, grounder flags)
+
+    A missing entry is produced in a private temporary directory and
+    renamed into place while holding <key>.lock, so concurrent planners
+    ground each problem once and never read a partial file. Hits and misses
+    are accumulated in <cache_dir>/stats.json.
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, domain_file: str, problem_file: str) -> str:
+        return content_hash((domain_file, problem_file),
+                            f'v{GROUNDING_CACHE_VERSION}', ' '.join(GROUNDER_FLAGS))
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.psas')
+
+    def get_or_ground(self, domain_file: str, problem_file: str,
+                      ground: Callable[[str], Optional[str]]):
+        """
+        Returns (path of the cached SAS file or None if grounding failed, hit).
+        `ground(tmp_dir)` grounds into tmp_dir and returns the produced file.
+        """
+        key = self.key(domain_file, problem_file)
+        path = self.path(key)
+        if os.path.exists(path):
+            self._record(hit=True)
+            return path, True
+
+        with file_lock(os.path.join(self.cache_dir, f'{key}.lock')):
+            # another planner may have grounded it while we waited
+            if os.path.exists(path):
+                self._record(hit=True)
+                return path, True
+            tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=f'{key[:12]}-')
+            try:
+                produced = ground(tmp_dir)
+                if produced is None:
+                    return None, False
+                os.replace(produced, path)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._record(hit=False)
+        return path, False
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            with open(os.path.join(self.cache_dir, 'stats.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'hits': 0, 'misses': 0}
+
+    def _record(self, hit: bool):
+        with file_lock(os.path.join(self.cache_dir, 'stats.lock')):
+            stats = self.stats()
+            stats['hits' if hit else 'misses'] += 1
+            with atomic_output(os.path.join(self.cache_dir, 'stats.json'), 'w') as f:
+                json.dump(stats, f)
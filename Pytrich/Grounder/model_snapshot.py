@@ -0,0 +1,175 @@
+import io
+import os
+import pickle
+from typing import Dict, List, Optional
+
+import Pytrich.FLAGS as FLAGS
+from Pytrich.Grounder.cache import atomic_output, content_hash
+from Pytrich.model import AbstractTask, Decomposition, Fact, MacroOperator, Model, Operator, TrieDecomposition
+
+SNAPSHOT_MAGIC = b'PYTRICH-MODEL\n'
+# bump whenever the record layout below or the post-processing passes change
+SNAPSHOT_VERSION = 8
+
+
+def snapshot_key(sas_file: str) -> str:
+    """
+    Content hash of the SAS file plus everything that changes the
+    post-processed model (snapshot version and the FLAGS.USE_* switches).
+    """
+    switches = [f'{name}={value}' for name, value in sorted(vars(FLAGS).items()) if name.startswith('USE_')]
+    return content_hash((sas_file,), f'v{SNAPSHOT_VERSION}', *switches)
+
+
+def snapshot_path(cache_dir: str, sas_file: str) -> str:
+    return os.path.join(cache_dir, f'{snapshot_key(sas_file)}.model')
+
+
+def _flatten(model: Model) -> Dict:
+    """
+    Plain tuples of ints and strings: components refer to each other by
+    global id, so the snapshot holds no object graph and (un)pickling never
+    recurses through method task networks.
+    """
+    primitives: List = []
+    primitive_ids: Dict[int, int] = {}
+    def primitive_id(o: Operator) -> int:
+        pid = primitive_ids.get(id(o))
+        if pid is None:
+            pid = primitive_ids[id(o)] = len(primitives)
+            primitives.append((o.name, o.cost, o.pos_precons, o.neg_precons, o.add_effects, o.del_effects))
+        return pid
+
+    operators = []
+    for o in model.operators:
+        parts = tuple(primitive_id(p) for p in o.expand()) if isinstance(o, MacroOperator) else None
+        operators.append((o.name, o.cost, o.pos_precons, o.neg_precons, o.add_effects, o.del_effects, parts))
+
+    # methods referred to but not in the model: original methods of the
+    # method trie leaves, or methods a task still lists
+    detached: List = []
+    detached_ids: Dict[int, int] = {}
+    def detached_id(d: Decomposition) -> int:
+        did = detached_ids.get(id(d))
+        if did is None:
+            did = detached_ids[id(d)] = len(detached)
+            detached.append((d.name, d.compound_task.local_id, d.pos_precons,
+                             d.neg_precons, [t.global_id for t in d.task_network]))
+        return did
+
+    def origin_id(d: Decomposition) -> Optional[int]:
+        if not isinstance(d, TrieDecomposition):
+            return -1
+        if d.origin is None:
+            return None
+        return detached_id(d.origin)
+
+    # position in model.decompositions, ~position in `detached` for the others
+    positions = {id(d): i for i, d in enumerate(model.decompositions)}
+    def decomposition_ref(d: Decomposition) -> int:
+        position = positions.get(id(d))
+        return ~detached_id(d) if position is None else position
+
+    return {
+        'facts': [f.name for f in model.facts],
+        'mutex_groups': model.mutex_groups,
+        'original_subtasks': {name: [-1 if o is None else primitive_id(o) for o in originals]
+                              for name, originals in model.original_subtasks.items()},
+        'primitives': primitives,
+        'operators': operators,
+        'abstract_tasks': [(t.name, [decomposition_ref(d) for d in t.decompositions])
+                           for t in model.abstract_tasks],
+        'decompositions': [(d.name, d.compound_task.local_id, d.pos_precons, d.neg_precons,
+                            [t.global_id for t in d.task_network], origin_id(d))
+                           for d in model.decompositions],
+        'detached': detached,
+        'initial_tn': [t.global_id for t in model.initial_tn],
+        'initial_state': model.initial_state,
+        'goals': model.goals,
+    }
+
+
+def _unflatten(data: Dict) -> Model:
+    facts = [Fact(name, f_id, f_id) for f_id, name in enumerate(data['facts'])]
+    next_id = len(facts)
+
+    primitives = [Operator(-1, -1, *record) for record in data['primitives']]
+    operators = []
+    for local_id, (name, cost, pos, neg, add, dele, parts) in enumerate(data['operators']):
+        if parts is None:
+            operators.append(Operator(next_id + local_id, local_id, name, cost, pos, neg, add, dele))
+        else:
+            operators.append(MacroOperator(next_id + local_id, local_id,
+                                           [primitives[p] for p in parts], pos, neg, add, dele))
+    next_id += len(operators)
+
+    abstract_tasks = [AbstractTask(next_id + local_id, local_id, [], name)
+                      for local_id, (name, _) in enumerate(data['abstract_tasks'])]
+    next_id += len(abstract_tasks)
+
+    detached = [Decomposition(name, -1, -1, pos, neg, abstract_tasks[compound_task], task_network)
+                for name, compound_task, pos, neg, task_network in data['detached']]
+    decompositions = []
+    for local_id, (name, compound_task, pos, neg, task_network, origin) in enumerate(data['decompositions']):
+        if origin == -1:
+            decompositions.append(Decomposition(name, next_id + local_id, local_id, pos, neg,
+                                                abstract_tasks[compound_task], task_network))
+        else:
+            decompositions.append(TrieDecomposition(name, next_id + local_id, local_id, pos, neg,
+                                                    abstract_tasks[compound_task], task_network,
+                                                    None if origin is None else detached[origin]))
+    for t, (_, decomposition_refs) in zip(abstract_tasks, data['abstract_tasks']):
+        t.decompositions = [decompositions[ref] if ref >= 0 else detached[~ref] for ref in decomposition_refs]
+
+    tasks = facts + operators + abstract_tasks
+    for d in decompositions + detached:
+        d.task_network = [tasks[global_id] for global_id in d.task_network]
+    initial_tn = [tasks[global_id] for global_id in data['initial_tn']]
+    model = Model(facts, data['initial_state'], initial_tn, data['goals'],
+                  operators, decompositions, abstract_tasks)
+    model.mutex_groups = data['mutex_groups']
+    model.original_subtasks = {name: [None if p == -1 else primitives[p] for p in originals]
+                               for name, originals in data['original_subtasks'].items()}
+    return model
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """
+    Snapshots only hold builtin containers, ints and strings (see _flatten),
+    so no global is ever resolved: a file placed in a shared cache directory
+    cannot make load_snapshot import or call anything.
+    """
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f'snapshot refers to {module}.{name}')
+
+
+def save_snapshot(model: Model, path: str) -> None:
+    """Writes the snapshot atomically, concurrent readers never see a partial file."""
+    with atomic_output(path) as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(SNAPSHOT_VERSION.to_bytes(4, 'little'))
+        pickle.dump(_flatten(model), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_snapshot(path: str) -> Optional[Model]:
+    """
+    Loads a snapshot with one bulk read. Returns None if there is none, it
+    was written by another snapshot version or it holds anything but plain
+    data (see _SnapshotUnpickler).
+    """
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    header_end = len(SNAPSHOT_MAGIC) + 4
+    if not content.startswith(SNAPSHOT_MAGIC) or \
+            int.from_bytes(content[len(SNAPSHOT_MAGIC):header_end], 'little') != SNAPSHOT_VERSION:
+        return None
+    stream = io.BytesIO(content)
+    stream.seek(header_end)
+    try:
+        data = _SnapshotUnpickler(stream).load()
+    except pickle.UnpicklingError:
+        return None
+    return _unflatten(data)
@@ -1,8 +1,20 @@
 import subprocess
 import os
+import shutil
+import tempfile
+import time
+from Pytrich.DESCRIPTIONS import Descriptions
+from Pytrich.Grounder.cache import GROUNDER_FLAGS, GroundingCache
+from Pytrich.Grounder.model_snapshot import load_snapshot, save_snapshot, snapshot_path
 from Pytrich.Grounder.sasplus_parser import SASPlusParser
 import Pytrich.FLAGS as FLAGS
 from Pytrich.model import AbstractTask, Decomposition, Fact, Model, Operator
+from Pytrich.PostProcessing.duplicate_elimination import eliminate_duplicates
+from Pytrich.PostProcessing.fact_relevance import fact_relevance
+from Pytrich.PostProcessing.macro_compilation import compile_macros
+from Pytrich.PostProcessing.method_trie import build_method_trie
+from Pytrich.PostProcessing.mutex_pruning import mutex_pruning
+from Pytrich.PostProcessing.total_order_reachability import TO_relax_reachability
 
 
 class PandaGrounder:
@@ -17,6 +29,7 @@ class PandaGrounder:
         self.problem_file    = problem_file
         self.sasplus_parser  = None
         self.grounder_status = 'NOT_RUN'
+        self.grounding_cache_hit = None
         self.model = None
         
         # Validate that either sas_file is provided or both domain_file and problem_file are provided
@@ -26,6 +39,9 @@ class PandaGrounder:
     def __call__(self):
         """
         Runs the grounding process if needed, then parses the SAS file.
+        With FLAGS.MODEL_CACHE_DIR set, the post-processed model is loaded
+        from (or saved to) a snapshot keyed by the SAS file content and the
+        post-processing flags.
         """
         if not self.sas_file:
             # If sas_file is not provided, perform grounding
@@ -34,10 +50,51 @@ class PandaGrounder:
                 print("Grounding failed.")
                 return
         
+        cache_path = None
+        if FLAGS.MODEL_CACHE_DIR:
+            start_time = time.time()
+            cache_path = snapshot_path(FLAGS.MODEL_CACHE_DIR, self.sas_file)
+            model = load_snapshot(cache_path)
+            if model is not None:
+                desc = Descriptions()
+                print(f'{desc("model_snapshot", "HIT")}')
+                print(f'{desc("snapshot_elapsed_time", time.time() - start_time)}')
+                return model
+
         # Parse the SAS file to create the model
-        self.sasplus_parser = SASPlusParser(self._read_sas_file())
+        self.sasplus_parser = SASPlusParser(self.sas_file)
         self.sasplus_parser.parse()
-        return self._build_model()
+        model = self._build_model()
+        self._post_process(model)
+        if cache_path:
+            save_snapshot(model, cache_path)
+            print(f'{Descriptions()("model_snapshot", "MISS")}')
+        if FLAGS.LOG_GROUNDER:
+            print(model.problem_info())
+            print(model)
+        return model
+
+    def _post_process(self, model):
+        """
+        Model transformations enabled by FLAGS, in order: mutex pruning,
+        total-order reachability pruning, macro compilation, fact relevance
+        (after the passes removing the operators using some facts), then
+        duplicate elimination (components differing only in irrelevant facts are
+        duplicates once those facts are dropped), then the method trie
+        (merged methods share their prefixes too).
+        """
+        if FLAGS.USE_MUTEX_PRUNING:
+            mutex_pruning(model)
+        if FLAGS.USE_TO_REACHABILITY:
+            TO_relax_reachability(model)
+        if FLAGS.USE_MACROS:
+            compile_macros(model)
+        if FLAGS.USE_FACT_RELEVANCE:
+            fact_relevance(model)
+        if FLAGS.USE_DUPLICATE_ELIMINATION or FLAGS.USE_METHOD_DOMINANCE:
+            eliminate_duplicates(model, FLAGS.USE_METHOD_DOMINANCE)
+        if FLAGS.USE_METHOD_TRIE:
+            build_method_trie(model)
 
     def _build_model(self):
         facts = [Fact(**fact_dict) for fact_dict in self.sasplus_parser.facts]
@@ -56,33 +113,68 @@ class PandaGrounder:
                     d.task_network[task_id]=abstract_tasks[task_name]
         #processs intial task network
         initial_task_network = [abstract_tasks[t['local_id']]  for t in self.sasplus_parser.initial_task_network]
-        return Model(facts,
+        model = Model(facts,
                     self.sasplus_parser.initial_state,
                     initial_task_network,
                     self.sasplus_parser.goals,
                     operators,
                     decompositions,
                     abstract_tasks)
+        model.mutex_groups = [list(range(group['first'], group['last'] + 1))
+                              for group in self.sasplus_parser.mutex_groups]
+        return model
 
     def _run_panda_grounding(self):
         """
         Run the panda grounding process on the provided domain and problem files.
         Returns the path to the generated SAS file if successful, otherwise None.
+
+        With FLAGS.GROUNDING_CACHE_DIR set the SAS file is taken from (or
+        added to) the grounding cache. Otherwise it is written to
+        `<domain folder>-<problem>.psas` in the working directory. Either way
+        PANDA runs in a private temporary directory, so concurrent planners
+        never share intermediate files.
         """
-        script_dir = os.path.dirname(__file__)
-        pandaPIparser_path = os.path.join(script_dir, "../../PandaBuilds/pandaPIparser")
-        pandaPIgrounder_path = os.path.join(script_dir, "../../PandaBuilds/pandaPIgrounder")
+        if FLAGS.LOG_GROUNDER:
+            print(f"Grounding domain: {self.domain_file}\nProblem: {self.problem_file}")
+
+        if FLAGS.GROUNDING_CACHE_DIR:
+            cache = GroundingCache(FLAGS.GROUNDING_CACHE_DIR)
+            psas_output, hit = cache.get_or_ground(self.domain_file, self.problem_file, self._ground_into)
+            self.grounding_cache_hit = hit
+            stats = cache.stats()
+            desc = Descriptions()
+            print(f'{desc("grounding_cache", "HIT" if hit else "MISS")}')
+            print(f'{desc("grounding_cache_hits", stats["hits"])}')
+            print(f'{desc("grounding_cache_misses", stats["misses"])}')
+            if hit:
+                self.grounder_status = 'SUCCESS'
+            return psas_output
 
-        
         domain_folder = os.path.basename(os.path.dirname(self.domain_file))
-        #domain_base = os.path.splitext(os.path.basename(self.domain_file))[0]
         problem_base = os.path.splitext(os.path.basename(self.problem_file))[0]
+        psas_output = f"{domain_folder}-{problem_base}.psas"
+        tmp_dir = tempfile.mkdtemp(dir='.', prefix='.pytrich-ground-')
+        try:
+            produced = self._ground_into(tmp_dir)
+            if produced is None:
+                return None
+            os.replace(produced, psas_output)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return psas_output
 
-        if FLAGS.LOG_GROUNDER:
-            print(f"Grounding domain: {self.domain_file}\nProblem: {self.problem_file}")
+    def _ground_into(self, out_dir):
+        """
+        Runs pandaPIparser and pandaPIgrounder, keeping every file they
+        write inside `out_dir`. Returns the SAS file path, or None on failure.
+        """
+        script_dir = os.path.dirname(__file__)
+        pandaPIparser_path = os.path.join(script_dir, "../../PandaBuilds/pandaPIparser")
+        pandaPIgrounder_path = os.path.join(script_dir, "../../PandaBuilds/pandaPIgrounder")
 
         # Step 1: Parse with pandaPIparser
-        parsed_output = "temp.parsed"
+        parsed_output = os.path.join(out_dir, "temp.parsed")
         result = subprocess.run(
             [pandaPIparser_path, self.domain_file, self.problem_file, parsed_output],
             check=True
@@ -98,9 +190,9 @@ class PandaGrounder:
             print("Panda Parsing ended")
 
         # Step 2: Ground with pandaPIgrounder
-        psas_output = f"{domain_folder}-{problem_base}.psas"
+        psas_output = os.path.join(out_dir, "grounded.psas")
         result = subprocess.run(
-            [pandaPIgrounder_path, "-q", "-D", "-e", parsed_output, psas_output],
+            [pandaPIgrounder_path, *GROUNDER_FLAGS, parsed_output, psas_output],
             check=True
         )
 
@@ -118,13 +210,6 @@ class PandaGrounder:
         self.grounder_status = 'SUCCESS'
         return psas_output
 
-    def _read_sas_file(self):
-        """
-        Reads the content of the SAS file.
-        """
-        with open(self.sas_file, "r") as file:
-            return file.read()
-    
     def get_model(self):
         """
         Returns the parsed model data from the SAS file.
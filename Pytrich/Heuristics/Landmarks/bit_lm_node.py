@@ -18,6 +18,12 @@ class BitLm_Node:
             self.achieved_cost+=lm_cost
         self.mark |= 1 << node_id
 
+    # undo an achievement: a marked lm counts as not achieved again
+    def unmark_lm(self, node_id, lm_cost=1):
+        if self.lms & (1 << node_id) and self.mark & (1 << node_id):
+            self.achieved_cost-=lm_cost
+        self.mark &= ~(1 << node_id)
+
     def is_active_lm(self, node_id):
         return self.lms & (1 << node_id) and ~self.mark & (1 << node_id)
     
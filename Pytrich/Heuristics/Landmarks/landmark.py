@@ -33,61 +33,65 @@ class Landmarks:
         self.td_count  = None
         self.td_lookup = None
         if mt:
-            self.mt_graph  = AndOrGraph(model, graph_type=2)
-            self.mt_count  = len(self.mt_graph.nodes)
+            self.mt_graph  = AndOrGraph.for_model(model, graph_type=2)
+            self.mt_count  = len(self.mt_graph)
             self.mt_lookup = [None] * self.mt_count
         if bu:
-            self.bu_graph  = AndOrGraph(model, graph_type=0)
-            self.bu_count  = len(self.bu_graph.nodes)
+            self.bu_graph  = AndOrGraph.for_model(model, graph_type=0)
+            self.bu_count  = len(self.bu_graph)
             self.bu_lookup = [None] * self.bu_count
         if bid:
-            self.td_graph  = AndOrGraph(model, graph_type=1)
-            self.td_count  = len(self.td_graph.nodes)
+            self.td_graph  = AndOrGraph.for_model(model, graph_type=1)
+            self.td_count  = len(self.td_graph)
             self.td_lookup = [None] * self.td_count
     
     def generate_mt_table(self, reinitialize=True):
         self._generate_lm_table(self.mt_lookup, self.mt_graph, reinitialize)
     
     def generate_bu_table(self, state=None, reinitialize=True):
-        if not reinitialize:
-            self.bu_graph.update_bu_graph(state)
-        self._generate_lm_table(self.bu_lookup, self.bu_graph, reinitialize)
+        # the graph is shared, the state's INIT facts go into a copy of its node types
+        node_type = None if reinitialize else self.bu_graph.state_node_types(state)
+        self._generate_lm_table(self.bu_lookup, self.bu_graph, reinitialize, node_type)
 
     def generate_td_table(self, reinitialize=True):
         self._generate_lm_table(self.td_lookup, self.td_graph, reinitialize)
     
-    def _generate_lm_table(self, lm_table, and_or_graph, reinitialize):
+    def _generate_lm_table(self, lm_table, and_or_graph, reinitialize, node_type=None):
         """
         
         We calculate landmarks using binary representation
         """
-        queue = deque([node for node in and_or_graph.nodes if node and (len(node.predecessors) == 0 or node.type == NodeType.INIT)])
+        if node_type is None:
+            node_type = and_or_graph.node_type
+        all_nodes = (1 << len(and_or_graph)) - 1
+        queue = deque([node_id for node_id in range(len(and_or_graph))
+                       if and_or_graph.in_degree(node_id) == 0 or node_type[node_id] == NodeType.INIT])
         it=0
 
-        for node in and_or_graph.nodes:
-            if node and node.type == NodeType.INIT:
-                lm_table[node.ID] = 0
+        for node_id in range(len(and_or_graph)):
+            if node_type[node_id] == NodeType.INIT:
+                lm_table[node_id] = 0
             if reinitialize:
             #else:
-                lm_table[node.ID] = (1 << len(and_or_graph.nodes)) - 1
+                lm_table[node_id] = all_nodes
 
         while queue:
             it+=1
-            node = queue.popleft()
+            node_id = queue.popleft()
+            predecessors = and_or_graph.predecessors(node_id)
             new_landmarks= 0
-            if node.type == NodeType.OR and node.predecessors:
-                new_landmarks= (1 << len(and_or_graph.nodes)) - 1 # initialize intersection operation with ALLNODES
-                for pred_lm in node.predecessors:
-                    new_landmarks &= lm_table[pred_lm.ID]
-            elif node.type == NodeType.AND and node.predecessors:
-                for pred_lm in node.predecessors:
-                    new_landmarks |= lm_table[pred_lm.ID]
-            new_landmarks |= (1<<node.ID)
+            if node_type[node_id] == NodeType.OR and predecessors:
+                new_landmarks= all_nodes # initialize intersection operation with ALLNODES
+                for pred_lm in predecessors:
+                    new_landmarks &= lm_table[pred_lm]
+            elif node_type[node_id] == NodeType.AND and predecessors:
+                for pred_lm in predecessors:
+                    new_landmarks |= lm_table[pred_lm]
+            new_landmarks |= (1<<node_id)
             
-            if  new_landmarks != lm_table[node.ID]:
-                lm_table[node.ID] = new_landmarks
-                for succ in node.successors:
-                    queue.append(succ)
+            if  new_landmarks != lm_table[node_id]:
+                lm_table[node_id] = new_landmarks
+                queue.extend(and_or_graph.successors(node_id))
         if reinitialize:
             print(f'ITERATIONS {it}')
 
@@ -99,12 +103,12 @@ class Landmarks:
         while new_lms != self.bid_lms:
             it_n += 1
             self.bid_lms = new_lms
-            for n_id in range(len(self.bu_graph.nodes)):
+            for n_id in range(len(self.bu_graph)):
                 if new_lms & (1 << n_id):
                     new_lms |= self.bu_lookup[n_id]
                 if new_lms & (1 << n_id):
                     new_lms |= self.td_lookup[n_id]
-        self.bid_lms = self.bid_lms & ((1 << len(self.bu_graph.nodes))-1) #remove recomposition nodes
+        self.bid_lms = self.bid_lms & ((1 << len(self.bu_graph))-1) #remove recomposition nodes
 
     def top_down_lms(self):
         for lm in range(self.bu_lms.bit_length()):
@@ -151,8 +155,8 @@ class Landmarks:
         # Initialize or reset data structures.
         if not hasattr(self, "index_of"):
             self.index_of = {}
-            for node in self.bu_graph.nodes:
-                self.index_of[node.ID] = -1
+            for node_id in range(len(self.bu_graph)):
+                self.index_of[node_id] = -1
         if not hasattr(self, "appears_in"):
             self.appears_in = {}
         if not hasattr(self, "ucp_cost"):
@@ -172,20 +176,20 @@ class Landmarks:
             if ~landmarks & (1 << lm_id):
                 continue
 
-            node = self.bu_graph.nodes[lm_id]
-            if node.type == NodeType.INIT:
+            if self.bu_graph.node_type[lm_id] == NodeType.INIT:
                 continue
             
             curr_lm = []
-            if node.content_type == ContentType.METHOD:
+            content_type = self.bu_graph.content_type[lm_id]
+            if content_type == ContentType.METHOD:
                 self.count_method_lms += 1
                 curr_lm = [lm_id]
-            elif node.content_type == ContentType.OPERATOR:
+            elif content_type == ContentType.OPERATOR:
                 self.count_operator_lms += 1
                 curr_lm = [lm_id]
             else:
                 self.count_disjunction_lms += 1
-                curr_lm = [pred.ID for pred in node.predecessors]
+                curr_lm = list(self.bu_graph.predecessors(lm_id))
             for ulm in curr_lm:
                 if self.index_of.get(ulm, -1) == -1:
                     self.index_of[ulm] = iof
@@ -228,19 +232,21 @@ class Landmarks:
         '''
         self.gn_fact_orderings = [[] for _ in range(len(self.model.facts))]  # NOTE: only considering facts for now
         
-        for f_prime_id, node_f_prime in enumerate(and_or_graph.nodes):
-            if (lm_set & (1 << f_prime_id)) and node_f_prime.content_type == ContentType.FACT:
+        content_type = and_or_graph.content_type
+        for f_prime_id in range(len(and_or_graph)):
+            if (lm_set & (1 << f_prime_id)) and content_type[f_prime_id] == ContentType.FACT:
                 # compute first achievers FA(f'): actions a in pred(f') where f' not in LM(a)
                 first_achievers = [
-                    pred_node for pred_node in node_f_prime.predecessors
-                    if not (lm_table[pred_node.ID] & (1 << f_prime_id))
+                    pred_id for pred_id in and_or_graph.predecessors(f_prime_id)
+                    if not (lm_table[pred_id] & (1 << f_prime_id))
                 ]
                 if not first_achievers:
                     continue
 
                 # compute the intersection of fact predecessors of first-achievers
+                f_prime_init = and_or_graph.node_type[f_prime_id] == NodeType.INIT
                 tmp_f_pred = [
-                    {pred_node.ID for pred_node in fa.predecessors if pred_node.content_type == ContentType.FACT and node_f_prime.type != NodeType.INIT}
+                    {pred_id for pred_id in and_or_graph.predecessors(fa) if content_type[pred_id] == ContentType.FACT and not f_prime_init}
                     for fa in first_achievers
                 ]
                 
@@ -265,28 +271,28 @@ class Landmarks:
 
     def compute_gn_task_orderings(self, lm_table, and_or_graph, lm_set):
         self.gn_task_orderings = [[] for _ in range(len(self.model.abstract_tasks)+len(self.model.operators))]  # For tasks instead of facts
-        for t_prime_id, node_t_prime in enumerate(and_or_graph.nodes):
-            if  (node_t_prime.content_type == ContentType.OPERATOR or node_t_prime.content_type == ContentType.ABSTRACT_TASK) and lm_set & (1 << t_prime_id):
+        content_type = and_or_graph.content_type
+        for t_prime_id in range(len(and_or_graph)):
+            if  (content_type[t_prime_id] == ContentType.OPERATOR or content_type[t_prime_id] == ContentType.ABSTRACT_TASK) and lm_set & (1 << t_prime_id):
                 first_achievers = None
                 achievers = None
                 
-                if node_t_prime.content_type == ContentType.OPERATOR:
-                    node_t_prime = and_or_graph.nodes[and_or_graph.components_count+node_t_prime.LOCALID]
+                node_t_prime = t_prime_id
+                if content_type[t_prime_id] == ContentType.OPERATOR:
+                    node_t_prime = and_or_graph.components_count+and_or_graph.local_id[t_prime_id]
                 first_achievers = [
-                    pred_node for pred_node in node_t_prime.predecessors
-                    if not (lm_table[pred_node.ID] & (1 << t_prime_id))
-                ]
-                achievers = [
-                    pred_node for pred_node in node_t_prime.predecessors
+                    pred_id for pred_id in and_or_graph.predecessors(node_t_prime)
+                    if not (lm_table[pred_id] & (1 << t_prime_id))
                 ]
+                achievers = list(and_or_graph.predecessors(node_t_prime))
                 if not first_achievers:
                     continue
                 
                 
                 # Compute the intersection of task compound tasks
                 tmp_t_pred = [
-                    {pred_node.ID for pred_node in fa.predecessors
-                    if pred_node.content_type in {ContentType.ABSTRACT_TASK}}
+                    {pred_id for pred_id in and_or_graph.predecessors(fa)
+                    if content_type[pred_id] == ContentType.ABSTRACT_TASK}
                     for fa in first_achievers
                 ]
                 
@@ -321,14 +327,15 @@ class Landmarks:
          
     def identify_lms(self, lm_set, and_or_graph):
         for lm_id in range(lm_set.bit_length()):
-            if lm_id < len(and_or_graph.nodes) and lm_set & (1 << lm_id):
-                if and_or_graph.nodes[lm_id].content_type == ContentType.FACT:
+            if lm_id < len(and_or_graph) and lm_set & (1 << lm_id):
+                content_type = and_or_graph.content_type[lm_id]
+                if content_type == ContentType.FACT:
                     self.count_fact_lms +=1
-                elif and_or_graph.nodes[lm_id].content_type == ContentType.METHOD:
+                elif content_type == ContentType.METHOD:
                     self.count_method_lms +=1
-                elif and_or_graph.nodes[lm_id].content_type == ContentType.ABSTRACT_TASK:
+                elif content_type == ContentType.ABSTRACT_TASK:
                     self.count_abtask_lms +=1
-                elif and_or_graph.nodes[lm_id].content_type == ContentType.OPERATOR:
+                elif content_type == ContentType.OPERATOR:
                     self.count_operator_lms +=1
 
     def clear_structures(self):
@@ -1,9 +1,10 @@
-from collections import deque
-from copy import deepcopy
+from array import array
 import heapq
 import math
 import time
 from Pytrich.ProblemRepresentation.and_or_graph import AndOrGraph, NodeType, ContentType
+from Pytrich.ProblemRepresentation.relaxed_costs import RelaxedCosts
+from Pytrich.Search.progression import plan_length
 
 class LMCutRC:
     """
@@ -12,18 +13,25 @@ class LMCutRC:
     The RC graph is assumed to be an instance of AndOrGraph built via rc_initialize.
     
     Cost propagation:
-      - INIT nodes (facts in the initial state) have cost 0.
+      - INIT nodes (facts in the state, operators without preconditions) cost their local cost.
       - For AND nodes, cost = local_cost (if any) + max_{p in predecessors} cost(p)
       - For OR nodes, cost = min_{p in predecessors} cost(p)
     
-    Only operator nodes (i.e. AND nodes with content_type OPERATOR) carry a weight
-    (stored in node.weight). These are the only nodes whose cost is reduced when a
-    landmark cut is extracted.
+    Only operator and method nodes carry a weight (stored in graph.weight,
+    methods get `method_cost` if given, and with use_plan_length operators
+    get the number of original operators they stand for, see plan_length).
+    These are the only nodes whose cost is reduced when a landmark cut is
+    extracted.
+
+    lm_cut(state, goals) can be called for every search node: the h_max
+    costs of the state are repaired from the previous call (RelaxedCosts),
+    and the cost, pcf and local cost buffers are flat arrays refilled from
+    templates instead of being rebuilt.
     """
 
-    def __init__(self, model):
+    def __init__(self, model, method_cost=None, use_plan_length=False):
         self.model= model
-        self.graph = AndOrGraph(model, graph_type=3)
+        self.graph = AndOrGraph.for_model(model, graph_type=3)
         self.lms = set()
         
         self.count_operator_lms = 0
@@ -33,145 +41,74 @@ class LMCutRC:
         self.index_of = {}
         self.appears_in = {}
         self.appears_in[-1]=[]
-        self.local_costs = {}
-        for node in self.graph.nodes:
-            self.index_of[node.ID] = -1
-            
-            if node is not None and node.type == NodeType.AND:
-                self.local_costs[node.ID] = node.weight
-        
-    def hmax_update(self, cut, cut_cost, pcf, cost):
-        needs_update = set()
-        for c in cut:
-            # old_cost = cost[c]
-            cost[c] -= cut_cost
-            node_c = self.graph.nodes[c]
-            #print(f"Cut update: Node {node_c.str_name} (ID {c}) cost updated from {old_cost} to {cost[c]} (subtracted cut_cost {cut_cost})")
-            for succ in node_c.successors:
-                needs_update.add(succ.ID)
-            #    print(f"  Adding successor {succ.str_name} (ID {succ.ID}) for update")
-        
-        while needs_update:
-            next_updates =set()
-            #print("\n--- New update round ---")
-            #update_names = [self.graph.nodes[nid].str_name for nid in needs_update]
-            #print("Nodes to update:", len(update_names))
+        for node_id in range(len(self.graph)):
+            self.index_of[node_id] = -1
 
-            for nid in needs_update:
-                node = self.graph.nodes[nid]
-                if node.type == NodeType.AND:
-                    max_val=-math.inf
-                    curr_pcf = -1
-                    for pred in node.predecessors:
-                        if cost[pred.ID] > max_val:
-                            max_val=cost[pred.ID]
-                            curr_pcf=pred.ID
-                    # print(f"AND Node {node.str_name} (ID {nid}):")
-                    # print(f"  - Max predecessor cost = {max_val} from node {self.graph.nodes[curr_pcf].str_name if curr_pcf is not None else 'None'}")
-                    # print(f"  - Local cost = {self.local_costs.get(nid, 0)}")
-                    # print(f"  - Current cost = {cost[nid]}, New computed cost = {max_val + self.local_costs[nid]}")
-                    if pcf[nid] != curr_pcf or max_val != cost[nid]:
-                        pcf[nid] = curr_pcf
-                        nid_old_cost = cost[nid]
-                        cost[nid] = max_val + self.local_costs[nid]
-                        for succ in node.successors:
-                            # [OPT] only update successor (OR nodes) if the new value affects the successors
-                            if pcf[succ.ID] and \
-                                ((pcf[succ.ID] != nid and cost[pcf[succ.ID]] > cost[nid]) or \
-                                (pcf[succ.ID] == nid and nid_old_cost != cost[nid])):
-                                next_updates.add(succ.ID)
-                elif node.type == NodeType.OR:
-                    min_val=math.inf
-                    curr_pcf = -1 # pcf for OR nodes is useless, debug verificaiton only
-                    # print(f"OR Node {node.str_name} (ID {nid}):")
-                    # print(f'Predecessors:')
-                    for pred in node.predecessors:
-                        #print(f'\t{pred.str_name} and cost {cost[pred.ID]}')
-                        if cost[pred.ID] < min_val:
-                            min_val=cost[pred.ID]
-                            curr_pcf=pred.ID
-                    # print()
-                    # print(f"  - Min predecessor cost = {min_val} from node {self.graph.nodes[curr_pcf].str_name if curr_pcf is not None else 'None'}")
-                    # print(f"  - Current cost = {cost[nid]}, New computed cost = {min_val}")
-                    if min_val != cost[nid]:
-                        pcf[nid] = curr_pcf
-                        cost[nid] = min_val
-                        for succ in node.successors:
-                            # [OPT] only update successor (AND nodes) if the new value affects the successors
-                            if pcf[succ.ID] == nid:
-                                next_updates.add(succ.ID)
-
-            needs_update = next_updates
+        self.base_costs = array('q', self.graph.weight)
+        if method_cost is not None:
+            for d in model.decompositions:
+                self.base_costs[d.global_id] = method_cost
+        if use_plan_length:
+            for o in model.operators:
+                self.base_costs[o.global_id] = plan_length([o])
+        self.local_costs = array('q', self.base_costs)
+        # h_max of the last state, before any cut
+        self.hmax = RelaxedCosts(self.graph, use_max=True, weight=self.base_costs)
+        self.cost = list(self.hmax.cost)
+        self._no_pcf = array('i', [-1]) * len(self.graph)
+        self.pcf = array('i', self._no_pcf)
 
+    def _pcf(self, node_id, cost, pcf):
+        """Precondition choice function of an AND node: its most expensive predecessor (-1 if none)."""
+        if pcf[node_id] == -1:
+            high_pred = -1
+            for pred in self.graph.predecessors(node_id):
+                if high_pred == -1 or cost[pred] > cost[high_pred]:
+                    high_pred = pred
+            pcf[node_id] = high_pred
+        return pcf[node_id]
 
+    def hmax_update(self, cut, cut_cost, pcf, cost):
+        """
+        Repairs h_max after the local cost of the cut nodes dropped by
+        cut_cost: costs only decrease, so the decreases are propagated in
+        cost order. An AND node is only recomputed when the decreased
+        predecessor is its pcf (or its pcf is not known yet).
+        """
+        node_type = self.hmax.node_type
+        local_costs = self.local_costs
+        queue = []
+        for c in cut:
+            cost[c] -= cut_cost
+            queue.append((cost[c], c))
+        heapq.heapify(queue)
 
-    def compute_h_max(self):
-        cost = {}
-        num_ft = {}
-        forced_true = {}
-        heap = []
-        for node in self.graph.nodes:
-            num_ft[node.ID]=0
-            forced_true[node.ID]= False
-            if node.type == NodeType.INIT:
-                cost[node.ID] = 0
-                heapq.heappush(heap, (0, node.ID))
-            elif node.type == NodeType.AND:
-                cost[node.ID] = -math.inf
-            else:
-                cost[node.ID] = math.inf
-        pcf = {node.ID: None for node in self.graph.nodes}
-        while heap:
-            c, u_id = heapq.heappop(heap)
-            u_node = self.graph.nodes[u_id]
-            # print(f'{u_node.str_name}')
-            # print(f'\t{u_node.type}')
-            # print(f'\t{num_ft[u_id]} {len(u_node.predecessors)}')
-            # print(f'\t{c} {cost[u_id]}')
-            # assert (u_node.type == NodeType.AND and num_ft[u_id] == len(u_node.predecessors)) or\
-            #     (u_node.type == NodeType.OR and num_ft[u_id] >= 1) or\
-            #     (u_node.type == NodeType.INIT)
-            
-            if cost[u_id] != c:
-                continue
-            if forced_true[u_id]:
+        while queue:
+            c, u_id = heapq.heappop(queue)
+            if c > cost[u_id]:
                 continue
-            forced_true[u_id]=True
-            for v_node in u_node.successors:
-                v_id = v_node.ID
-                num_ft[v_id]+=1
-                if v_node.type == NodeType.OR:
-                    new_cost = c
-                    if new_cost < cost[v_id]:
-                        cost[v_id]=c
-                        pcf[v_id] = u_id
-                        heapq.heappush(heap, (c, v_id))
-                        # print(f'\tnew cost: {cost[v_id]} to {v_node.str_name}')
-                elif v_node.type == NodeType.AND and num_ft[v_id] == len(v_node.predecessors):
-                    high_predv = -1
-                    pcf_v  = -1
-                    lc_v = self.local_costs[v_id]
-                    for pred in v_node.predecessors:
-                        #assert cost[pred.ID] < math.inf
-                        #assert forced_true[pred.ID]
-                        if high_predv < cost[pred.ID]:
-                            high_predv = cost[pred.ID]
-                            pcf_v = pred.ID
-                    v_cost = high_predv + lc_v
-                    cost[v_id]= v_cost
-                    pcf[v_id] = pcf_v
-                    # print(f'\tnew cost: {cost[v_id]} to {v_node.str_name} ')
-                    heapq.heappush(heap, (v_cost, v_id))
+            for v_id in self.graph.successors(u_id):
+                if node_type[v_id] == NodeType.OR:
+                    if local_costs[v_id] + c < cost[v_id]:
+                        cost[v_id] = local_costs[v_id] + c
+                        heapq.heappush(queue, (cost[v_id], v_id))
+                elif node_type[v_id] == NodeType.AND and pcf[v_id] in (-1, u_id):
+                    pcf[v_id] = -1
+                    v_cost = local_costs[v_id] + cost[self._pcf(v_id, cost, pcf)]
+                    if v_cost < cost[v_id]:
+                        cost[v_id] = v_cost
+                        heapq.heappush(queue, (v_cost, v_id))
 
-        # for node in self.graph.nodes:
-        #     print(f'{node.ID}\ttype: {node.type}\tcost: {cost[node.ID]}\tpcf: {str(pcf[node.ID])}\t pcf-cost: {str(cost[pcf[node.ID]]) if node.type==NodeType.AND else '---'}')
-        # for t in self.model.initial_tn:
-        #     node = self.graph.nodes[t.global_id]
-        #     pcf_node = self.graph.nodes[pcf[node.ID]]
-        #     print(f'{t.name}\ttype: GOAL_NODE\tcost: {cost[node.ID]}\tpcf: {pcf_node.str_name}\t pcf-cost: {str(cost[pcf[node.ID]]) if node.type==NodeType.AND else '---'}')
-        #     pcf_of_pcf = self.graph.nodes[pcf[pcf_node.ID]]
-        #     print(f'{pcf_of_pcf.str_name}\tcost: {cost[pcf_of_pcf.ID]}')
-        # exit(0)            
+    def compute_h_max(self, state=None):
+        """
+        h_max costs of `state` (the initial state by default) in the cost
+        buffer, with the pcf buffer cleared (pcfs are computed on demand).
+        """
+        hmax = self.hmax.update(self.model.initial_state if state is None else state)
+        cost = self.cost
+        cost[:] = hmax
+        pcf = self.pcf
+        pcf[:] = self._no_pcf
         return cost, pcf
 
     def find_landmark_cut(self, cost, pcf, goals, hmax_value):
@@ -185,10 +122,13 @@ class LMCutRC:
             that justify AND's cost (precondition choice function)
         - When an AND node has cost different than its pcf, 
             this means the AND node is part of the cut.
+        - INIT and AND nodes without predecessors (e.g. operators without
+            preconditions) are part of the cut if they have a cost.
         """
         cut = set()
         stack = []
         visited = set()
+        node_type = self.hmax.node_type
         
         for gid in goals:
             if cost[gid] == hmax_value:
@@ -200,18 +140,23 @@ class LMCutRC:
             if v_id in visited:
                 continue
             visited.add(v_id)
-            v_node = self.graph.nodes[v_id]
             
             # OR node, include all predecessors with the same cost of v
-            if v_node.type == NodeType.OR:
-                for u_node in v_node.predecessors:
-                    #if cost[u_node.ID] == cost[v_id]:
-                    stack.append(u_node.ID)
+            if node_type[v_id] == NodeType.OR:
+                for u_id in self.graph.predecessors(v_id):
+                    #if cost[u_id] == cost[v_id]:
+                    stack.append(u_id)
+            elif node_type[v_id] == NodeType.INIT: # fact of the state or operator without preconditions
+                if self.local_costs[v_id] > 0:
+                    cut.add(v_id)
+            elif cost[v_id] == math.inf: # never reached by h_max, it does not support v
+                continue
             else: 
             # AND node: get pcf node check pcf -> v
-                u_id = pcf[v_id]
-                if cost[u_id] == math.inf: # unsatisfiable test: pcf max value is inf
-                    return
+                u_id = self._pcf(v_id, cost, pcf)
+                if u_id == -1: # no predecessor: cut test on its own cost
+                    if self.local_costs[v_id] > 0:
+                        cut.add(v_id)
                 elif cost[u_id] < cost[v_id]: # cut test: pcf has a lower cost of v
                     cut.add(v_id)
                 else: # goal zone: pcf has the same cost as v, both are in the goal zone
@@ -219,22 +164,20 @@ class LMCutRC:
         
         return cut
 
-    
-    def compute_lm_cut(self, goal_ids):
+    def lm_cut(self, state, goal_ids):
         """
-        Compute the LM-Cut heuristic over the Relaxed Composition Graph 
-        for the given goal nodes.
+        LM-Cut value of `state` for the given goal nodes and the cuts found,
+        (inf, cuts so far) if a goal is unreachable or outside the graph.
         """
-        start_time = time.perf_counter()
         h = 0
         landmarks = []
-        iterations = 0
-        cost, pcf = self.compute_h_max()
+        goal_ids = list(goal_ids)
+        if not all(0 <= gid < len(self.graph) for gid in goal_ids):
+            return math.inf, landmarks
+        self.local_costs[:] = self.base_costs
+        cost, pcf = self.compute_h_max(state)
         while True:
-            iterations+=1
-            #cost, pcf = self.compute_h_max()
-            hmax_val = max(cost.get(gid, math.inf) for gid in goal_ids)
-            #print(f'iteration {iterations} {hmax_val}')
+            hmax_val = max((cost[gid] for gid in goal_ids), default=0)
             if hmax_val == 0:
                 break
             if hmax_val == math.inf:
@@ -245,15 +188,23 @@ class LMCutRC:
                 break
 
             cut_cost = min(self.local_costs[nid] for nid in cut)
-            #print(f'[',end='')
             for nid in cut:
                 self.local_costs[nid] -= cut_cost
-                #print(f'{self.graph.nodes[nid].str_name} ',end='')
-            #print(f']')
             h += cut_cost
             landmarks.append(cut)
             self.hmax_update(cut, cut_cost, pcf, cost)
-            
+        return h, landmarks
+
+    def compute_lm_cut(self, goal_ids):
+        """
+        Compute the LM-Cut heuristic over the Relaxed Composition Graph 
+        for the given goal nodes.
+        """
+        start_time = time.perf_counter()
+        h, landmarks = self.lm_cut(self.model.initial_state, goal_ids)
+        if h == math.inf:
+            return math.inf, landmarks
+
         elapsed_time = time.perf_counter() - start_time
         print(f"compute_lm_cut completed in {elapsed_time:.6f} seconds")
         # process data structure for tracking lms
@@ -265,9 +216,9 @@ class LMCutRC:
         for i_dlm, dlm in enumerate(landmarks):
             if len(dlm) == 1:
                 element = next(iter(dlm))
-                if self.graph.nodes[element].content_type == ContentType.METHOD:
+                if self.graph.content_type[element] == ContentType.METHOD:
                     self.count_method_lms +=1
-                elif self.graph.nodes[element].content_type == ContentType.OPERATOR:
+                elif self.graph.content_type[element] == ContentType.OPERATOR:
                     self.count_operator_lms +=1
             else:
                 self.count_disjunction_lms+=1
@@ -284,7 +235,7 @@ class LMCutRC:
         # print(bin(self.lms))
         # print(self.appears_in)
         #for lm in landmarks:
-        #    print(f'{[self.graph.nodes[id].str_name + " " + str(self.index_of[id]) for id in lm]}')
+        #    print(f'{[self.graph.name(id) + " " + str(self.index_of[id]) for id in lm]}')
         #return h, landmarks
     
     def compute_lms(self):
@@ -10,12 +10,13 @@ class NoveltyFT:
         return has novelty or not.
         """
         novelty = 1
+        task_ids = [t.global_id for t in node.task_network]
         for bit_pos in range(node.state.bit_length()):
             if node.state & (1 << bit_pos):
-                for t in node.task_network:
-                    if (bit_pos, t.global_id) not in self.seen_tuples:
+                for t_id in task_ids:
+                    if (bit_pos, t_id) not in self.seen_tuples:
                         novelty = 0
-                        self.seen_tuples.add((bit_pos, t.global_id))
+                        self.seen_tuples.add((bit_pos, t_id))
         
         return novelty
 
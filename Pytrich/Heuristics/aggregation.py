@@ -13,6 +13,9 @@ class Aggregation:
     def initialize(self, model, node):
         pass
     
+    def is_preferred(self, parent_node, node):
+        return any(param.is_preferred(parent_node, node) for param in self.params)
+
     def __output__(self):
         print(self.params)
 
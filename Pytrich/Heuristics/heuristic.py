@@ -25,6 +25,14 @@ class Heuristic:
         
     def __call__(self, parent_node, node):
         pass
+
+    def is_preferred(self, parent_node, node):
+        """
+        Whether `node` is a preferred successor of the evaluated `parent_node`.
+        Called before `node` is evaluated, so it must only rely on the
+        parent's heuristic information.
+        """
+        return False
     
     def __output__(self):
         pass
\ No newline at end of file
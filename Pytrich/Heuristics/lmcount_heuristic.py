@@ -1,3 +1,4 @@
+from array import array
 import time
 from Pytrich.DESCRIPTIONS import Descriptions
 from Pytrich.Heuristics.Landmarks.bit_lm_node import BitLm_Node
@@ -5,11 +6,9 @@ from Pytrich.Heuristics.Landmarks.landmark import Landmarks
 from Pytrich.Heuristics.Landmarks.landmark_cut import LMCutRC
 from Pytrich.Heuristics.heuristic import Heuristic
 from Pytrich.Search.htn_node import HTNNode
-from Pytrich.model import AbstractTask, Operator, Model
+from Pytrich.model import AbstractTask, Operator, Model, mask_facts
 import Pytrich.FLAGS as FLAGS
 #TODO: need code refactor
-# landmark should have a lm_index that is different from global_id (at least not necessarily equal)
-# this is implemented in UCP and lm-cut lms
 class LandmarkCountHeuristic(Heuristic):
     """
     Compute landmarks and perform a sort of hamming distance with it (not admissible yet)
@@ -20,6 +19,13 @@ class LandmarkCountHeuristic(Heuristic):
         use_disj: <UNAVAILABLE> compute disjunctive landmarks over facts with minimal hitting set over fatcs (work in progress)
         use_bu_update: updates landmarks based on node's task network
         use_bu_strict: bottom-up landmarks without mandatory tasks
+
+    BitLm_Node bits are landmark indices, not global ids: the landmarks are
+    renumbered 0..L-1 at initialize (lm_index maps a global id to its index,
+    -1 for components that are not landmarks), so the per-node bitsets have
+    L bits. With use_bu_update the index grows as new landmarks (and
+    achieved components, which must not become landmarks again) show up.
+    lmcut and ucp landmarks are indexed by their disjunctions already.
     """
     
     def __init__(self,
@@ -48,6 +54,9 @@ class LandmarkCountHeuristic(Heuristic):
         self._define_param_str()
 
         self.landmarks = None
+        # global id -> landmark index (-1 if not a landmark), and back
+        self.lm_index = None
+        self.lm_ids = []
         
         # Timing and statistics
         self.start_time = 0
@@ -67,6 +76,8 @@ class LandmarkCountHeuristic(Heuristic):
     def initialize(self, model, initial_node):
         """Generate and initialize landmarks."""
         self.start_time = time.perf_counter()
+        self.lm_index = array('i', [-1]) * len(model.components)
+        self.lm_ids = []
         
         if self.use_bid:
             self.landmarks = Landmarks(model, True, True, False)
@@ -77,13 +88,13 @@ class LandmarkCountHeuristic(Heuristic):
             self.landmarks.bidirectional_lms()
             self.landmarks.identify_lms(self.landmarks.bid_lms, self.landmarks.bu_graph)
             initial_node.lm_node = BitLm_Node()
-            initial_node.lm_node.initialize_lms(self.landmarks.bid_lms)
+            initial_node.lm_node.initialize_lms(self._index_lms(self.landmarks.bid_lms))
         elif self.use_mt:
             self.landmarks =Landmarks(model, False, False, True)
             self.landmarks.generate_mt_table()
             self.landmarks.mandatory_tasks_lms(model.initial_tn)
             initial_node.lm_node = BitLm_Node()
-            initial_node.lm_node.initialize_lms(self.landmarks.mt_lms)
+            initial_node.lm_node.initialize_lms(self._index_lms(self.landmarks.mt_lms))
             self.landmarks.identify_lms(self.landmarks.mt_lms, self.landmarks.mt_graph)
         elif self.use_bu_strict:
             self.landmarks =Landmarks(model, True, False, True)
@@ -92,7 +103,7 @@ class LandmarkCountHeuristic(Heuristic):
             self.landmarks.generate_bu_table()
             self.landmarks.bottom_up_lms(model.initial_state, model.initial_tn)
             initial_node.lm_node = BitLm_Node()
-            initial_node.lm_node.initialize_lms(self.landmarks.bu_lms-self.landmarks.mt_lms)
+            initial_node.lm_node.initialize_lms(self._index_lms(self.landmarks.bu_lms-self.landmarks.mt_lms))
             self.landmarks.identify_lms(self.landmarks.bu_lms-self.landmarks.mt_lms, self.landmarks.bu_graph)
         elif self.use_lmc:
             self.landmarks =LMCutRC(model)
@@ -110,7 +121,7 @@ class LandmarkCountHeuristic(Heuristic):
                 self.landmarks.compute_ucp(self.landmarks.bu_lms)
                 initial_node.lm_node.initialize_lms(self.landmarks.bu_lms, lm_sum=sum(self.landmarks.ucp_cost))
             else:
-                initial_node.lm_node.initialize_lms(self.landmarks.bu_lms)
+                initial_node.lm_node.initialize_lms(self._index_lms(self.landmarks.bu_lms))
             
         self.elapsed_time = time.perf_counter() - self.start_time                                     
         
@@ -125,10 +136,8 @@ class LandmarkCountHeuristic(Heuristic):
                                 self.methods_lms + \
                                 self.fact_lms
             if not self.use_ucp:
-                for fact_pos in range(initial_node.state.bit_length()):
-                    if initial_node.state & (1 << fact_pos) \
-                            and initial_node.state & (1 << fact_pos):
-                            initial_node.lm_node.mark_lm(fact_pos)
+                for fact_pos in mask_facts(initial_node.state):
+                    self._mark(initial_node.lm_node, fact_pos)
         else: #lmcut doesen't have fact and abstract task landmarks
             self.operator_lms    = self.landmarks.count_operator_lms
             self.methods_lms     = self.landmarks.count_method_lms
@@ -148,13 +157,9 @@ class LandmarkCountHeuristic(Heuristic):
             # else:
             #     node.lm_node.mark_lm(node.decomposition.global_id)
             node.lm_node = BitLm_Node(parent=parent_node.lm_node)
-            if isinstance(node.task, Operator):
-                lm_index =  self.landmarks.index_of[node.task.global_id]
-            else:
-                lm_index = self.landmarks.index_of[node.decomposition.global_id]
-                
-            for dlm in self.landmarks.appears_in[lm_index]:
-                node.lm_node.mark_lm(dlm)
+            for lm_index in self._lm_indexes(node):
+                for dlm in self.landmarks.appears_in[lm_index]:
+                    node.lm_node.mark_lm(dlm)
             h_value =  node.lm_node.lm_value()
 
             super().update_info(h_value)
@@ -162,15 +167,11 @@ class LandmarkCountHeuristic(Heuristic):
         
         if self.use_ucp:
             node.lm_node = BitLm_Node(parent=parent_node.lm_node)
-            if isinstance(node.task, Operator):
-                lm_index =  self.landmarks.index_of[node.task.global_id]
-            else:
-                lm_index = self.landmarks.index_of[node.decomposition.global_id]
-            
-            for dlm in self.landmarks.appears_in[lm_index]:
-                if node.lm_node.is_active_lm(dlm):
-                    lm_cost = self.landmarks.ucp_cost[dlm]
-                    node.lm_node.mark_lm(dlm, lm_cost)
+            for lm_index in self._lm_indexes(node):
+                for dlm in self.landmarks.appears_in[lm_index]:
+                    if node.lm_node.is_active_lm(dlm):
+                        lm_cost = self.landmarks.ucp_cost[dlm]
+                        node.lm_node.mark_lm(dlm, lm_cost)
             h_value =  node.lm_node.lm_value()
             super().update_info(h_value)
             return h_value
@@ -179,27 +180,32 @@ class LandmarkCountHeuristic(Heuristic):
         if self.use_bu_update:
             #self.landmarks.generate_bu_table(node.state, reinitialize=False)
             self.landmarks.bottom_up_lms(node.state, node.task_network, reinitialize=False)
-            node.lm_node.update_lms(self.landmarks.bu_lms)
+            node.lm_node.update_lms(self._index_lms(self.landmarks.bu_lms))
             
         # mark last reached task (also add decomposition here)
-        node.lm_node.mark_lm(node.task.global_id)
+        self._mark(node.lm_node, node.task.global_id)
         # in case there is a change in the state:
         if isinstance(node.task, Operator):
-            for fact_pos in range(node.task.add_effects.bit_length()):
-                if node.task.add_effects & (1 << fact_pos) \
-                    and node.state & (1 << fact_pos):
-                    node.lm_node.mark_lm(fact_pos)
-                if self.use_disj:
-                    node.lm_node.mark_disjunction(node.state)
+            # every operator applied to reach node (the whole run if the
+            # chain was collapsed, node.task being its last operator) and
+            # every fact it adds were reached along the way, even if a later
+            # operator of the run deletes them again
+            for operator in node.chain or (node.task,):
+                self._mark(node.lm_node, operator.global_id)
+                for fact_pos in mask_facts(operator.add_effects):
+                    self._mark(node.lm_node, fact_pos)
+            if self.use_disj:
+                node.lm_node.mark_disjunction(node.state)
             # orderings: deleted facts can reactivate fact landmarks
             if self.use_task_ord \
-                and (node.task.del_effects & node.lm_node.mark):  # fact landmark is deleted
+                and any(self._is_marked(node.lm_node, fact_pos)
+                        for fact_pos in mask_facts(node.task.del_effects)):  # fact landmark is deleted
                 self._deal_with_fact_ordering(node, parent_node)
         else: #otherwise mark the decomposition
-            node.lm_node.mark_lm(node.decomposition.global_id)
+            self._mark(node.lm_node, node.decomposition.global_id)
             # task landmark applied ('delete' task from task network)
             if self.use_fact_ord \
-                and (node.task.global_id & node.lm_node.lms): 
+                and self._is_lm(node.lm_node, node.task.global_id):
                 self._deal_with_task_ordering(node, parent_node)
         
             
@@ -208,6 +214,73 @@ class LandmarkCountHeuristic(Heuristic):
         
         return h_value
 
+    def is_preferred(self, parent_node:HTNNode, node:HTNNode):
+        """
+        Preferred successors achieve a landmark still open in the parent.
+        """
+        lm_node = parent_node.lm_node
+        if self.use_lmc or self.use_ucp:
+            return any(lm_node.is_active_lm(dlm)
+                       for lm_index in self._lm_indexes(node)
+                       for dlm in self.landmarks.appears_in.get(lm_index, ()))
+
+        if isinstance(node.task, Operator):
+            return any(self._is_active(lm_node, operator.global_id)
+                       or any(self._is_active(lm_node, fact_pos) for fact_pos in mask_facts(operator.add_effects))
+                       for operator in node.chain or (node.task,))
+        return self._is_active(lm_node, node.task.global_id) \
+            or self._is_active(lm_node, node.decomposition.global_id)
+
+    def _index_lms(self, lms):
+        """
+        Landmark bitset over global ids renumbered into landmark indices,
+        landmarks seen for the first time get the next free index.
+        """
+        indexed = 0
+        for global_id in mask_facts(lms):
+            indexed |= 1 << self._lm_position(global_id, grow=True)
+        return indexed
+
+    def _lm_position(self, global_id, grow=False):
+        index = self.lm_index[global_id]
+        if index == -1 and grow:
+            index = self.lm_index[global_id] = len(self.lm_ids)
+            self.lm_ids.append(global_id)
+        return index
+
+    def _mark(self, lm_node, global_id):
+        """
+        Marks the component as achieved. Components that are not landmarks are
+        skipped, unless use_bu_update has to remember them.
+        """
+        index = self._lm_position(global_id, grow=self.use_bu_update)
+        if index != -1:
+            lm_node.mark_lm(index)
+
+    def _is_lm(self, lm_node, global_id):
+        """
+        The component is one of the node's landmarks. Having an index is not
+        enough: with use_bu_update every marked component gets one.
+        """
+        index = self.lm_index[global_id]
+        return index != -1 and (lm_node.lms >> index) & 1 == 1
+
+    def _is_marked(self, lm_node, global_id):
+        index = self.lm_index[global_id]
+        return index != -1 and (lm_node.mark >> index) & 1 == 1
+
+    def _is_active(self, lm_node, global_id):
+        index = self.lm_index[global_id]
+        return index != -1 and bool(lm_node.is_active_lm(index))
+
+    def _lm_indexes(self, node:HTNNode):
+        """
+        Landmark indexes (lmc/ucp) of the operators or method that reached node.
+        """
+        if isinstance(node.task, Operator):
+            return [self.landmarks.index_of[operator.global_id] for operator in node.chain or (node.task,)]
+        return [self.landmarks.index_of[node.decomposition.global_id]]
+
     # NOTE: DEBUG only
     # def close(self, node):
     #     """
@@ -266,9 +339,8 @@ class LandmarkCountHeuristic(Heuristic):
         # -- Handle Fact Orderings/Dependencies --
         if self.landmarks.gn_fact_orderings:
             # Retrieve any fact landmarks deleted by the current operator.
-            deleted_lm_facts = node.lm_node.mark & node.task.del_effects
-            for bit_pos in range(deleted_lm_facts.bit_length()):
-                if deleted_lm_facts & (1 << bit_pos):  # If a landmark fact was deleted
+            for bit_pos in mask_facts(node.task.del_effects):
+                if self._is_marked(node.lm_node, bit_pos):  # If a landmark fact was deleted
                     # Check if it was actually satisfied in the parent's state
                     if parent_node.state & (1 << bit_pos):
                         is_goal_fact = (self.model.goals & (1 << bit_pos)) != 0
@@ -281,14 +353,13 @@ class LandmarkCountHeuristic(Heuristic):
                             # Check other landmark facts that depend on this fact
                             for psi in self.landmarks.gn_fact_orderings[bit_pos]:
                                 # If psi is not yet accepted, fact is needed again
-                                if not (node.lm_node.mark & (1 << psi)):
+                                if not self._is_marked(node.lm_node, psi):
                                     required_again = True
                                     break
 
                         if required_again:
                             # Unmark the fact landmark so it can be re-established
-                            node.lm_node.mark &= ~(1 << bit_pos)
-                            node.lm_node.achieved_lms -= 1
+                            node.lm_node.unmark_lm(self.lm_index[bit_pos])
                             self.fact_lm_reactivations+=1
 
     def _deal_with_task_ordering(self, node: HTNNode, parent_node: HTNNode):
@@ -304,7 +375,8 @@ class LandmarkCountHeuristic(Heuristic):
 
         """
         # -- Handle Task Orderings/Dependencies --
-        if len(self.landmarks.gn_task_orderings[node.task.global_id-len(self.model.facts)]) == 0:
+        if not self.landmarks.gn_task_orderings \
+            or len(self.landmarks.gn_task_orderings[node.task.global_id-len(self.model.facts)]) == 0:
             return
     
         # The current node's task is a recognized landmark task. Check if this task
@@ -318,9 +390,9 @@ class LandmarkCountHeuristic(Heuristic):
         for psi in self.landmarks.gn_task_orderings[node.task.global_id-len(self.model.facts)]:
             # If psi is a landmark task not yet achieved and not reachable from here,
             # the current task may need to stay "unresolved" to enforce ordering.
-            psi_accepted = (node.lm_node.mark & (1 << psi)) != 0
+            psi_accepted = self._is_marked(node.lm_node, psi)
             psi_reachable = (reachable_tasks & (1 << psi)) != 0
-            if (node.lm_node.lms & (1 << psi)) and (not psi_accepted) and (not psi_reachable):
+            if self._is_lm(node.lm_node, psi) and (not psi_accepted) and (not psi_reachable):
                 # print(f'\norderings of {node.task.name}')
                 # print(f'\t-> {self.model.get_component(psi).name}')
                 # print(f'\trequired again, pikced {node.decomposition.name}' )
@@ -330,9 +402,7 @@ class LandmarkCountHeuristic(Heuristic):
         if required_again:
             # print(f'task requires again {node.task.name}')
             # Unmark the current landmark task to indicate it must remain "open"
-            node.lm_node.mark &= ~(1 << node.task.global_id)
-            #print(node.lm_node.lm_value())
-            node.lm_node.achieved_lms -= 1
+            node.lm_node.unmark_lm(self.lm_index[node.task.global_id])
             #print(node.lm_node.lm_value())
             self.task_lm_reactivations+=1
 
@@ -0,0 +1,53 @@
+import time
+from typing import List
+
+from Pytrich.Heuristics.Landmarks.landmark_cut import LMCutRC
+from Pytrich.Heuristics.heuristic import Heuristic
+from Pytrich.Search.htn_node import HTNNode
+from Pytrich.model import Model, mask_facts
+
+
+class LMCutHeuristic(Heuristic):
+    """
+    LM-cut over the relaxed composition graph, recomputed for every node:
+    h_max from the node's state, goals are the tasks of its task network and
+    the goal facts, and the cost of each landmark cut is added to h until
+    the goals cost nothing (see LMCutRC.lm_cut). Costs follow the search's
+    g-values, so the estimate is admissible: methods cost nothing and
+    operators the number of original operators they stand for (zero cost
+    operators included, see plan_length).
+    """
+    def __init__(self, name="lmcut"):
+        super().__init__(name=name)
+        self.lmcut = None
+        self.goal_facts: List[int] = []
+        self.preprocessing_time = 0
+        self.total_cuts = 0
+
+    def initialize(self, model: Model, initial_node: HTNNode):
+        start_time = time.time()
+        self.lmcut = LMCutRC(model, method_cost=0, use_plan_length=True)
+        self.goal_facts = list(mask_facts(model.goals))
+        h_value = self._evaluate(initial_node)
+        self.preprocessing_time = time.time() - start_time
+        return super().initialize(model, h_value)
+
+    def _evaluate(self, node: HTNNode):
+        goals = set(self.goal_facts)
+        goals.update(task.global_id for task in node.task_network)
+        h_value, cuts = self.lmcut.lm_cut(node.state, goals)
+        self.total_cuts += len(cuts)
+        return h_value
+
+    def __call__(self, parent_node: HTNNode, node: HTNNode):
+        h_value = self._evaluate(node)
+        super().update_info(h_value)
+        return h_value
+
+    def __output__(self):
+        return (
+            f"Heuristic info:\n"
+            f"\tName: {self.name}\n"
+            f"\tGraph size: {len(self.lmcut.graph)}\n"
+            f"\tPreprocessing time: {self.preprocessing_time:.2f} s\n"
+        )
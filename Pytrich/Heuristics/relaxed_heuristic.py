@@ -0,0 +1,114 @@
+from array import array
+import time
+from typing import List
+
+from Pytrich.Heuristics.heuristic import Heuristic
+from Pytrich.ProblemRepresentation.and_or_graph import AndOrGraph
+from Pytrich.ProblemRepresentation.relaxed_costs import RelaxedCosts
+from Pytrich.Search.htn_node import HTNNode
+from Pytrich.Search.progression import plan_length
+from Pytrich.model import Model, Operator, mask_facts
+
+
+class RelaxedCompositionHeuristic(Heuristic):
+    """
+    State-dependent heuristics over the relaxed composition graph
+    (AndOrGraph graph_type=3): the facts of the node's state are its INIT
+    nodes and the goals are the tasks of the node's task network plus the
+    goal facts. Operators cost their cost and methods `method_cost`; with
+    `use_plan_length` operators cost the number of original operators they
+    stand for, as in the search's g-values (see plan_length).
+
+    Costs are kept by a RelaxedCosts instance and repaired from the last
+    evaluated state, so a method successor (same state as its parent) only
+    pays for summing its goals.
+    """
+    use_max = False
+    method_cost = 1
+    use_plan_length = False
+
+    def __init__(self, name="rc"):
+        super().__init__(name=name)
+        self.and_or_graph = None
+        self.costs = None
+        self.goal_facts: List[int] = []
+        self.preprocessing_time = 0
+
+    def initialize(self, model: Model, initial_node: HTNNode):
+        start_time = time.time()
+        self.and_or_graph = AndOrGraph.for_model(model, graph_type=3)
+        weight = None
+        if self.method_cost != 1 or self.use_plan_length:
+            weight = array('q', self.and_or_graph.weight)
+            for d in model.decompositions:
+                weight[d.global_id] = self.method_cost
+            if self.use_plan_length:
+                for o in model.operators:
+                    weight[o.global_id] = plan_length([o])
+        self.costs = RelaxedCosts(self.and_or_graph, use_max=self.use_max, weight=weight)
+        self.goal_facts = list(mask_facts(model.goals))
+        h_value = self._evaluate(initial_node)
+        self.preprocessing_time = time.time() - start_time
+        return super().initialize(model, h_value)
+
+    def _goals(self, node: HTNNode) -> List[int]:
+        return self.goal_facts + [task.global_id for task in node.task_network]
+
+    def _evaluate(self, node: HTNNode):
+        """Sum of the goal costs (h_add), FF and h_max override it."""
+        self.costs.update(node.state)
+        return sum(self.costs.goal_costs(self._goals(node)))
+
+    def __call__(self, parent_node: HTNNode, node: HTNNode):
+        h_value = self._evaluate(node)
+        super().update_info(h_value)
+        return h_value
+
+    def __output__(self):
+        return (
+            f"Heuristic info:\n"
+            f"\tName: {self.name}\n"
+            f"\tGraph size: {len(self.and_or_graph)}\n"
+            f"\tPreprocessing time: {self.preprocessing_time:.2f} s\n"
+        )
+
+
+class AdditiveHeuristic(RelaxedCompositionHeuristic):
+    """
+    h_add: sum of the additive costs of the goals.
+    """
+    def __init__(self, name="hadd"):
+        super().__init__(name=name)
+
+
+class FFHeuristic(RelaxedCompositionHeuristic):
+    """
+    h_FF: cost of the relaxed plan extracted from the h_add supporters
+    (operator costs plus one per method).
+
+    The evaluated node keeps in `node.preferred` the ids of its successors
+    (the head operator or the head task's methods) that are in the relaxed
+    plan, they are its preferred successors (see is_preferred).
+    """
+    def __init__(self, name="hff"):
+        super().__init__(name=name)
+
+    def _evaluate(self, node: HTNNode):
+        self.costs.update(node.state)
+        plan = self.costs.relaxed_plan(self._goals(node))
+        if plan is None:
+            node.preferred = frozenset()
+            return float('inf')
+        if node.task_network:
+            head = node.task_network.head
+            successors = (head,) if isinstance(head, Operator) else head.decompositions
+            node.preferred = frozenset(s.global_id for s in successors if s.global_id in plan)
+        weight = self.costs.weight
+        return sum(weight[v] for v in plan)
+
+    def is_preferred(self, parent_node: HTNNode, node: HTNNode):
+        if not parent_node.preferred:
+            return False
+        if node.decomposition is not None:
+            return node.decomposition.global_id in parent_node.preferred
+        return (node.chain or (node.task,))[0].global_id in parent_node.preferred
@@ -1,15 +1,25 @@
 import time
 from Pytrich.Heuristics.heuristic import Heuristic
-from Pytrich.ProblemRepresentation.and_or_graph import AndOrGraph, ContentType, NodeType
+from Pytrich.ProblemRepresentation.and_or_graph import AndOrGraph
 from Pytrich.Search.htn_node import HTNNode
 from Pytrich.model import Model
 
 class TaskDecompositionHeuristic(Heuristic):
+    """
+    Sum of the TDG values of the tasks in the node's task network.
+
+    h is computed incrementally: a node keeps in `node.tdg_value` the sum of
+    the finite values of its network and the number of tasks with infinite
+    value, and a successor only removes the popped task (the applied chain)
+    and adds the precomputed value of the method's network.
+    """
     def __init__(self, use_satis=False, name="tdg"):
         super().__init__(name=name)
-        self.use_satis = use_satis
-        self.tdg_values = {}
-        self.iterations = 0
+        self.use_satis = use_satis  # deprecated, no effect: the Dijkstra values are the same either way
+        # TDG value by global id, inf for components outside the graph
+        self.tdg_values = []
+        # (finite sum, infinite count) of the task network of each decomposition, by local id
+        self.network_values = []
         self.preprocessing_time = 0
         self.and_or_graph=None
 
@@ -18,56 +28,58 @@ class TaskDecompositionHeuristic(Heuristic):
         Initialize the heuristic with the model and compute task decomposition graph.
         """
         start_time = time.time()
-        self.and_or_graph = AndOrGraph(model, graph_type=3)
-        self._compute_tdg()
+        self.and_or_graph = AndOrGraph.for_model(model, graph_type=3)
+        values = self._compute_tdg()
+        size = len(model.components)
+        self.tdg_values = values[:size] + [float('inf')] * (size - len(values))
+        self.network_values = [self._network_value(d.task_network) for d in model.decompositions]
         self.preprocessing_time = time.time() - start_time
 
-        for node in self.and_or_graph.nodes:
-            if node and node.content_type in \
-                {ContentType.OPERATOR, ContentType.ABSTRACT_TASK}:
-                self.tdg_values[node.ID] = node.value
+        initial_node.tdg_value = self._network_value(initial_node.task_network)
+        return super().initialize(model, self._h_value(initial_node.tdg_value))
+
+    def _network_value(self, tasks):
+        total = unreachable = 0
+        for task in tasks:
+            value = self.tdg_values[task.global_id]
+            if value == float('inf'):
+                unreachable += 1
+            else:
+                total += value
+        return total, unreachable
 
-        h_value = sum(self.tdg_values.get(task.global_id, float('inf')) \
-                      for task in initial_node.task_network)
-        
-        return super().initialize(model, h_value)
+    @staticmethod
+    def _h_value(network_value):
+        total, unreachable = network_value
+        return float('inf') if unreachable else total
 
     def _compute_tdg(self):
         """
-        Iteratively compute values for the AND/OR graph using a bottom-up approach.
+        Values of the AND/OR graph bottom-up: operators cost their cost plus
+        their preconditions, methods 1 plus their subtasks and abstract tasks
+        their cheapest method, computed by the graph's generalized Dijkstra
+        (each node is finalised once).
+        Returns the value of each node.
         """
-        for node in self.and_or_graph.nodes:
-            if not node:
-                continue
-            if node.content_type == ContentType.OPERATOR:
-                node.value = 0
-            else:
-                node.value = 1 if self.use_satis and \
-                node.content_type == ContentType.ABSTRACT_TASK \
-                else float('inf')
-
-        changed = True
-        while changed:
-            self.iterations += 1
-            changed = False
-
-            for node in self.and_or_graph.nodes:
-                if not node:
-                    continue
-
-                new_value = node.weight
-                if node.type == NodeType.OR:
-                    new_value += min(n.value for n in node.predecessors)
-                elif node.type == NodeType.AND:
-                    new_value += sum(n.value for n in node.predecessors)
-
-                if new_value != node.value:
-                    changed = True
-                    node.value = new_value
+        return self.and_or_graph.generalized_dijkstra()
 
     def __call__(self, parent_node, node):
-        h_value = sum(self.tdg_values.get(task.global_id, float('inf')) \
-                      for task in node.task_network)
+        if parent_node is None or parent_node.tdg_value is None:
+            node.tdg_value = self._network_value(node.task_network)
+        else:
+            total, unreachable = parent_node.tdg_value
+            for task in node.chain or (node.task,):
+                value = self.tdg_values[task.global_id]
+                if value == float('inf'):
+                    unreachable -= 1
+                else:
+                    total -= value
+            if node.decomposition is not None:
+                method_total, method_unreachable = self.network_values[node.decomposition.local_id]
+                total += method_total
+                unreachable += method_unreachable
+            node.tdg_value = (total, unreachable)
+        h_value = self._h_value(node.tdg_value)
         super().update_info(h_value)
         return h_value
     
@@ -89,7 +101,6 @@ class TaskDecompositionHeuristic(Heuristic):
         return (
             f"Heuristic info:\n"
             f"\tName: {self.name}\n"
-            f"\tGraph size: {len(self.tdg_values)}\n"
-            f"\tIterations: {self.iterations}\n"
+            f"\tGraph size: {len(self.and_or_graph)}\n"
             f"\tPreprocessing time: {self.preprocessing_time:.2f} s\n"
         )
\ No newline at end of file
@@ -0,0 +1,123 @@
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from Pytrich.DESCRIPTIONS import Descriptions
+import Pytrich.FLAGS as FLAGS
+from Pytrich.model import AbstractTask, Decomposition, MacroOperator, Model, Operator
+
+
+def _merge_operators(model: Model) -> Dict[Operator, Operator]:
+    """
+    Groups operators by (cost, masks) and maps every operator to the first
+    one of its group. Returns the replacement map of the merged operators.
+    Macro operators are never merged: equal masks do not make their
+    expansions, hence their plans and plan lengths, equal.
+    """
+    canonical: Dict[Tuple[int, int, int, int, int], Operator] = {}
+    replace: Dict[Operator, Operator] = {}
+    for o in model.operators:
+        if isinstance(o, MacroOperator):
+            continue
+        key = (o.cost, o.pos_precons, o.neg_precons, o.add_effects, o.del_effects)
+        representative = canonical.setdefault(key, o)
+        if representative is not o:
+            replace[o] = representative
+    return replace
+
+
+def _replace_operators(model: Model, name: Optional[str],
+                       task_network: List[Union[Operator, AbstractTask]],
+                       replace: Dict[Operator, Operator]) -> List[Union[Operator, AbstractTask]]:
+    """
+    `task_network` with merged operators replaced; the replaced ones are
+    recorded in model.original_subtasks[name] (None where kept).
+    """
+    originals = [t if t in replace else None for t in task_network]
+    if any(o is not None for o in originals):
+        model.original_subtasks[name] = originals
+        return [replace.get(t, t) for t in task_network]
+    return task_network
+
+
+def _dominates(d1: Decomposition, d2: Decomposition) -> bool:
+    """d1 is applicable in every state d2 is (same compound task and network assumed)."""
+    return (d1.pos_precons & ~d2.pos_precons) == 0 and (d1.neg_precons & ~d2.neg_precons) == 0
+
+
+def _merge_decompositions(model: Model, use_dominance: bool) -> Dict[Decomposition, Decomposition]:
+    """
+    Groups methods by (compound task, task network) and keeps, per group,
+    one method per distinct precondition pair, or with use_dominance only
+    the methods no other method of the group dominates.
+    Returns the map of each removed method to the method replacing it.
+    """
+    groups: Dict[Tuple[int, Tuple[int, ...]], List[Decomposition]] = {}
+    for d in model.decompositions:
+        key = (d.compound_task.global_id, tuple(t.global_id for t in d.task_network))
+        groups.setdefault(key, []).append(d)
+
+    replace: Dict[Decomposition, Decomposition] = {}
+    for group in groups.values():
+        kept: List[Decomposition] = []
+        for d in group:
+            for k in kept:
+                if (k.pos_precons == d.pos_precons and k.neg_precons == d.neg_precons) or \
+                        (use_dominance and _dominates(k, d)):
+                    replace[d] = k
+                    break
+            else:
+                if use_dominance:
+                    for k in [k for k in kept if _dominates(d, k)]:
+                        kept.remove(k)
+                        replace[k] = d
+                kept.append(d)
+    # a method may have been replaced by one dominated later on
+    for d, k in replace.items():
+        while k in replace:
+            k = replace[k]
+        replace[d] = k
+    return replace
+
+
+def _branching_factor(abstract_tasks: List[AbstractTask]) -> float:
+    return sum(len(t.decompositions) for t in abstract_tasks) / len(abstract_tasks) if abstract_tasks else 0.0
+
+
+def eliminate_duplicates(model: Model, use_dominance: bool = False) -> None:
+    """
+    Merges operators with equal cost, preconditions and effects, and
+    methods with equal compound task, preconditions and (merged) task
+    network. With use_dominance a method is also dropped when a method
+    of the same task with the same network has weaker preconditions.
+    Where a method (or the initial task network) had an operator replaced
+    by its duplicate, model.original_subtasks keeps the original operator
+    by position, so plans name the operators of the original methods (see
+    HTNNode.extract_solution).
+    """
+    print('Starting duplicate elimination.')
+    start_time = time.time()
+    number_o_before = len(model.operators)
+    number_m_before = len(model.decompositions)
+    branching_before = _branching_factor(model.abstract_tasks)
+
+    replace_o = _merge_operators(model)
+    if replace_o:
+        for d in model.decompositions:
+            d.task_network = _replace_operators(model, d.name, d.task_network, replace_o)
+        model.initial_tn = _replace_operators(model, None, model.initial_tn, replace_o)
+        model.operators = [o for o in model.operators if o not in replace_o]
+
+    replace_d = _merge_decompositions(model, use_dominance)
+    if replace_d:
+        for t in model.abstract_tasks:
+            t.decompositions = [d for d in t.decompositions if d not in replace_d]
+        model.decompositions = [d for d in model.decompositions if d not in replace_d]
+
+    model.assign_global_ids()
+
+    if FLAGS.LOG_GROUNDER:
+        print(f'operators: {number_o_before} to {len(model.operators)}')
+        print(f'methods: {number_m_before} to {len(model.decompositions)}')
+    desc = Descriptions()
+    print(f'{desc("method_branching_factor", f"{branching_before:.2f} to {_branching_factor(model.abstract_tasks):.2f}")}')
+    print(f'{desc("duplicate_elapsed_time", time.time() - start_time)}')
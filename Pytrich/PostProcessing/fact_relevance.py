@@ -0,0 +1,83 @@
+import time
+from typing import List
+
+from Pytrich.DESCRIPTIONS import Descriptions
+import Pytrich.FLAGS as FLAGS
+from Pytrich.model import MacroOperator, Model, mask_facts
+
+
+def _relevant_facts(model: Model) -> int:
+    """
+    Mask of the facts some condition depends on: operator and method
+    preconditions (positive or negative) and goals. Any other fact is only
+    ever added or deleted, so dropping it changes no applicability test.
+    """
+    relevant = model.goals
+    for o in model.operators:
+        relevant |= o.pos_precons | o.neg_precons
+    for d in model.decompositions:
+        relevant |= d.pos_precons | d.neg_precons
+    return relevant
+
+
+def _remap(mask: int, new_ids: List[int]) -> int:
+    """Moves each fact of mask to its new bit, dropping facts with new id -1."""
+    remapped = 0
+    for fact in mask_facts(mask):
+        new_id = new_ids[fact]
+        if new_id >= 0:
+            remapped |= 1 << new_id
+    return remapped
+
+
+def fact_relevance(model: Model) -> None:
+    """
+    Drops irrelevant facts from the model and packs the remaining ones into a
+    dense bit range, in their original order. Model.facts, the initial
+    state, the goals and every operator and method mask are rewritten
+    (including the operators kept by macros).
+    Fact objects keep their names, so states and plans print as before.
+    Mutex groups keep their remaining facts.
+    """
+    print('Starting fact relevance analysis.')
+    start_time = time.time()
+    number_f_before = len(model.facts)
+
+    relevant = _relevant_facts(model)
+    new_ids: List[int] = [-1] * len(model.facts)
+    facts = []
+    for fact in model.facts:
+        if relevant >> fact.local_id & 1:
+            new_ids[fact.local_id] = len(facts)
+            facts.append(fact)
+
+    model.mutex_groups = [[new_ids[f] for f in group if new_ids[f] >= 0] for group in model.mutex_groups]
+    model.mutex_groups = [group for group in model.mutex_groups if group]
+    for new_id, fact in enumerate(facts):
+        fact.local_id = fact.global_id = new_id
+    model.facts = facts
+
+    model.initial_state = _remap(model.initial_state, new_ids)
+    model.goals = _remap(model.goals, new_ids)
+    remapped = set()
+    operators = list(model.operators)
+    for o in model.operators:
+        if isinstance(o, MacroOperator):
+            operators.extend(o.expand())
+    for o in operators:
+        if id(o) in remapped:
+            continue
+        remapped.add(id(o))
+        o.pos_precons = _remap(o.pos_precons, new_ids)
+        o.neg_precons = _remap(o.neg_precons, new_ids)
+        o.add_effects = _remap(o.add_effects, new_ids)
+        o.del_effects = _remap(o.del_effects, new_ids)
+    for d in model.decompositions:
+        d.pos_precons = _remap(d.pos_precons, new_ids)
+        d.neg_precons = _remap(d.neg_precons, new_ids)
+    model.assign_global_ids()
+
+    if FLAGS.LOG_GROUNDER:
+        print(f'facts: {number_f_before} to {len(model.facts)}')
+    desc = Descriptions()
+    print(f'{desc("relevance_elapsed_time", time.time() - start_time)}')
@@ -0,0 +1,153 @@
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from Pytrich.DESCRIPTIONS import Descriptions
+import Pytrich.FLAGS as FLAGS
+from Pytrich.model import AbstractTask, MacroOperator, Model, Operator
+from Pytrich.PostProcessing.pruning import remove_unreferenced
+
+# subtasks inlining may add to a task network (method or initial), nested
+# single-method tasks could otherwise grow it exponentially
+MAX_INLINE_GROWTH = 16
+
+
+def _inline_single_method_tasks(model: Model) -> int:
+    """
+    Replaces abstract tasks that have exactly one decomposition by that
+    decomposition's task network wherever it is safe:
+        - the method has no preconditions, or
+        - the task is the first subtask of its parent method: both methods
+          are applied in the same state, so the inlined method's
+          preconditions are merged into the parent's.
+    Self-recursive tasks are never inlined, and a task network never grows
+    past its original size plus MAX_INLINE_GROWTH subtasks. Repeats until a
+    fixpoint. Returns the number of inlined occurrences.
+    """
+    inlined = 0
+    size_limit = {d: len(d.task_network) + MAX_INLINE_GROWTH for d in model.decompositions}
+    initial_limit = len(model.initial_tn) + MAX_INLINE_GROWTH
+    changed = True
+    while changed:
+        changed = False
+        single = {t: t.decompositions[0] for t in model.abstract_tasks
+                  if len(t.decompositions) == 1 and t not in t.decompositions[0].task_network}
+
+        for d in model.decompositions:
+            new_tn: List[Union[Operator, AbstractTask]] = []
+            size = len(d.task_network)
+            for i, subtask in enumerate(d.task_network):
+                method = single.get(subtask) if isinstance(subtask, AbstractTask) else None
+                if method is None or ((method.pos_precons or method.neg_precons) and i > 0) \
+                        or size + len(method.task_network) - 1 > size_limit[d]:
+                    new_tn.append(subtask)
+                    continue
+                size += len(method.task_network) - 1
+                d.pos_precons |= method.pos_precons
+                d.neg_precons |= method.neg_precons
+                new_tn.extend(method.task_network)
+                inlined += 1
+                changed = True
+            d.task_network = new_tn
+
+        new_initial_tn: List[Union[Operator, AbstractTask]] = []
+        size = len(model.initial_tn)
+        for subtask in model.initial_tn:
+            method = single.get(subtask) if isinstance(subtask, AbstractTask) else None
+            if method is None or method.pos_precons or method.neg_precons \
+                    or size + len(method.task_network) - 1 > initial_limit:
+                new_initial_tn.append(subtask)
+                continue
+            size += len(method.task_network) - 1
+            new_initial_tn.extend(method.task_network)
+            inlined += 1
+            changed = True
+        model.initial_tn = new_initial_tn
+        remove_unreferenced(model)
+    return inlined
+
+
+def _fold(masks: Tuple[int, int, int, int], operator: Operator) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Masks (pre, neg, add, del) of the macro applying `masks` then `operator`,
+    or None if `operator` can never be applied right after `masks`.
+        pre = pre1 | (pre2 & ~add1),  neg = neg1 | (neg2 & ~del1)
+        add = (add1 & ~del2) | add2,  del = del1 | del2
+    """
+    pre1, neg1, add1, del1 = masks
+    if operator.pos_precons & del1 & ~add1:
+        return None
+    if operator.neg_precons & add1:
+        return None
+    return (pre1 | (operator.pos_precons & ~add1),
+            neg1 | (operator.neg_precons & ~del1),
+            (add1 & ~operator.del_effects) | operator.add_effects,
+            del1 | operator.del_effects)
+
+
+def _compile_leading_macros(model: Model) -> int:
+    """
+    Folds the leading run of operators of each method into one macro operator.
+    Runs are cut at the first operator that cannot follow the previous ones.
+    Methods with the same leading run share the macro.
+    Returns the number of macros created.
+    """
+    macros: Dict[Tuple[Operator, ...], MacroOperator] = {}
+    for d in model.decompositions:
+        run: List[Operator] = []
+        masks = None
+        for subtask in d.task_network:
+            if not isinstance(subtask, Operator):
+                break
+            if not run:
+                masks = (subtask.pos_precons, subtask.neg_precons, subtask.add_effects, subtask.del_effects)
+                run.append(subtask)
+                continue
+            folded = _fold(masks, subtask)
+            if folded is None:
+                break
+            masks = folded
+            run.append(subtask)
+        if len(run) < 2:
+            continue
+        key = tuple(run)
+        macro = macros.get(key)
+        if macro is None:
+            operators = []
+            for o in run:
+                operators.extend(o.operators if isinstance(o, MacroOperator) else [o])
+            macro = MacroOperator(-1, -1, operators, *masks)
+            macros[key] = macro
+            model.operators.append(macro)
+        d.task_network = [macro] + d.task_network[len(run):]
+    remove_unreferenced(model)
+    return len(macros)
+
+
+def compile_macros(model: Model) -> None:
+    """
+    Model transformation that shrinks the search space without changing the
+    primitive plans:
+        1. abstract tasks with a single method are inlined into their parents
+        2. the leading run of operators of each method is folded into a
+           MacroOperator, which keeps the original operators (plans are
+           expanded back by HTNNode.extract_solution)
+    Global ids are reassigned afterwards.
+    """
+    print('Starting macro compilation.')
+    start_time = time.time()
+    number_o_before = len(model.operators)
+    number_abt_before = len(model.abstract_tasks)
+    number_m_before = len(model.decompositions)
+
+    inlined = _inline_single_method_tasks(model)
+    count_macros = _compile_leading_macros(model)
+    model.assign_global_ids()
+
+    if FLAGS.LOG_GROUNDER:
+        print(f'inlined single-method tasks: {inlined}')
+        print(f'macro operators created: {count_macros}')
+        print(f'operators: {number_o_before} to {len(model.operators)}')
+        print(f'abstract tasks: {number_abt_before} to {len(model.abstract_tasks)}')
+        print(f'methods: {number_m_before} to {len(model.decompositions)}')
+    desc = Descriptions()
+    print(f'{desc("macro_elapsed_time", time.time() - start_time)}')
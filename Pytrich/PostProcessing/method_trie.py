@@ -0,0 +1,145 @@
+import time
+from typing import Dict, List, Tuple, Union
+
+from Pytrich.DESCRIPTIONS import Descriptions
+import Pytrich.FLAGS as FLAGS
+from Pytrich.model import AbstractTask, Decomposition, Model, Operator, TrieDecomposition
+from Pytrich.PostProcessing.pruning import task_sccs
+
+# (original method, remaining subtasks, preconditions still to check)
+_Member = Tuple[Decomposition, List[Union[Operator, AbstractTask]], int, int]
+
+
+def _modified_facts(model: Model) -> List[int]:
+    """
+    Add|delete mask of the operators reachable from each abstract task (by
+    local id), i.e. the facts some decomposition of the task may change.
+    """
+    scc_of, sccs = task_sccs(model)
+    modified: List[int] = [0] * len(sccs)
+    # an SCC comes after every SCC it reaches
+    for scc_id, scc in enumerate(sccs):
+        mask = 0
+        for t in scc:
+            for d in t.decompositions:
+                for sub in d.task_network:
+                    if isinstance(sub, Operator):
+                        mask |= sub.add_effects | sub.del_effects
+                    else:
+                        mask |= modified[scc_of[sub.local_id]]
+        modified[scc_id] = mask
+    return [modified[scc_of[t.local_id]] for t in model.abstract_tasks]
+
+
+def _shared_prefix(members: List[_Member]) -> List[Union[Operator, AbstractTask]]:
+    """
+    Longest common prefix of the remaining networks, cut so that every
+    member keeps at least one subtask (no empty methods after the branch).
+    """
+    shortest = min(len(subtasks) for _, subtasks, _, _ in members)
+    first = members[0][1]
+    length = 0
+    while length < shortest - 1 and all(subtasks[length] is first[length] for _, subtasks, _, _ in members):
+        length += 1
+    return first[:length]
+
+
+class _TrieBuilder:
+    def __init__(self, modified: List[int]):
+        self.modified = modified
+        self.new_tasks: List[AbstractTask] = []
+        self.shared_subtasks = 0
+
+    def _changes(self, subtasks: List[Union[Operator, AbstractTask]]) -> int:
+        mask = 0
+        for t in subtasks:
+            if isinstance(t, Operator):
+                mask |= t.add_effects | t.del_effects
+            else:
+                mask |= self.modified[t.local_id]
+        return mask
+
+    def build(self, task: AbstractTask, members: List[_Member], top: bool) -> List[Decomposition]:
+        """
+        Methods of `task` for the members' remaining networks. Members with the
+        same first subtask share one method running their common prefix and
+        then an artificial task choosing among the rest; members that cannot
+        be factored keep their own method (the original one at the top level).
+        """
+        groups: Dict[int, List[_Member]] = {}
+        for member in members:
+            groups.setdefault(id(member[1][0]), []).append(member)
+
+        methods: List[Decomposition] = []
+        for group in groups.values():
+            prefix = _shared_prefix(group) if len(group) > 1 else []
+            if prefix:
+                pos = neg = -1
+                for _, _, m_pos, m_neg in group:
+                    pos &= m_pos
+                    neg &= m_neg
+                # the rest of a member's preconditions is checked after the prefix,
+                # sound only if the prefix cannot change those facts
+                changes = self._changes(prefix)
+                if any(((m_pos & ~pos) | (m_neg & ~neg)) & changes for _, _, m_pos, m_neg in group):
+                    prefix = []
+            if not prefix:
+                for origin, subtasks, m_pos, m_neg in group:
+                    if top:
+                        methods.append(origin)
+                    else:
+                        methods.append(TrieDecomposition(f'{origin.name}|leaf', -1, -1, m_pos, m_neg,
+                                                         task, subtasks, origin))
+                continue
+
+            branch = AbstractTask(-1, -1, [], f'{task.name}|{len(self.new_tasks)}')
+            self.new_tasks.append(branch)
+            self.shared_subtasks += (len(group) - 1) * len(prefix)
+            branch.decompositions = self.build(
+                branch,
+                [(origin, subtasks[len(prefix):], m_pos & ~pos, m_neg & ~neg)
+                 for origin, subtasks, m_pos, m_neg in group],
+                top=False)
+            methods.append(TrieDecomposition(f'{branch.name}|prefix', -1, -1, pos, neg,
+                                             task, prefix + [branch]))
+        return methods
+
+
+def build_method_trie(model: Model) -> None:
+    """
+    Factors the common leading subtasks of the methods of each abstract
+    task: the methods of a task form a trie over their networks, each
+    branch point becomes an artificial abstract task and the preconditions
+    shared below a branch move up to the method running the prefix.
+    Branching then happens only where methods diverge.
+
+    A precondition is only moved below a prefix that cannot change it
+    (facts added or deleted by operators reachable from the prefix), so
+    applicability is unchanged; otherwise the methods stay separate.
+    Leaves are TrieDecompositions whose `origin` is the original method,
+    used to map plans back.
+    """
+    print('Starting method trie construction.')
+    start_time = time.time()
+    number_m_before = len(model.decompositions)
+    number_t_before = len(model.abstract_tasks)
+
+    builder = _TrieBuilder(_modified_facts(model))
+    for t in list(model.abstract_tasks):
+        # methods with an empty network never share a prefix
+        members = [(d, d.task_network, d.pos_precons, d.neg_precons) for d in t.decompositions if d.task_network]
+        if len(members) > 1:
+            t.decompositions = [d for d in t.decompositions if not d.task_network] + \
+                builder.build(t, members, top=True)
+
+    if builder.new_tasks:
+        model.abstract_tasks = model.abstract_tasks + builder.new_tasks
+        model.decompositions = [d for t in model.abstract_tasks for d in t.decompositions]
+        model.assign_global_ids()
+
+    if FLAGS.LOG_GROUNDER:
+        print(f'methods: {number_m_before} to {len(model.decompositions)}')
+        print(f'abstract tasks: {number_t_before} to {len(model.abstract_tasks)}')
+    desc = Descriptions()
+    print(f'{desc("trie_shared_subtasks", builder.shared_subtasks)}')
+    print(f'{desc("trie_elapsed_time", time.time() - start_time)}')
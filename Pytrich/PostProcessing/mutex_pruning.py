@@ -0,0 +1,70 @@
+import time
+from typing import List
+
+from Pytrich.DESCRIPTIONS import Descriptions
+import Pytrich.FLAGS as FLAGS
+from Pytrich.model import Decomposition, Model, Operator
+from Pytrich.PostProcessing.pruning import bottom_up_removal, keep_initial_tasks, remove_unreferenced
+from Pytrich.ProblemRepresentation.state_layout import group_mask, invariant_mutex_groups
+
+
+def _mutex(pos_precons: int, neg_precons: int, group_masks: List[int]) -> bool:
+    """The preconditions can never hold together."""
+    if pos_precons & neg_precons:
+        return True
+    for group_mask in group_masks:
+        required = pos_precons & group_mask
+        if required & (required - 1):
+            return True
+    return False
+
+
+def _method_precons(d: Decomposition) -> int:
+    """
+    Preconditions of d and of its leading operators without effects (as
+    PANDA compiles method preconditions): all are checked in the same state.
+    """
+    pos_precons = d.pos_precons
+    for t in d.task_network:
+        if not isinstance(t, Operator) or t.add_effects or t.del_effects:
+            break
+        pos_precons |= t.pos_precons
+    return pos_precons
+
+
+def mutex_pruning(model: Model) -> None:
+    """
+    Removes operators and methods whose preconditions are mutually exclusive
+    under the model's invariant mutex groups (two facts of one SAS variable,
+    or a fact required both true and false). Methods losing a subtask and
+    tasks losing all their methods are removed in turn.
+    """
+    print('Starting mutex pruning.')
+    start_time = time.time()
+    number_o_before = len(model.operators)
+    number_abt_before = len(model.abstract_tasks)
+    number_m_before = len(model.decompositions)
+
+    group_masks = [group_mask(group) for group in invariant_mutex_groups(model)]
+    operators = [o for o in model.operators if not _mutex(o.pos_precons, o.neg_precons, group_masks)]
+    decompositions = [d for d in model.decompositions
+                      if not _mutex(_method_precons(d), d.neg_precons, group_masks)]
+    abstract_tasks = model.abstract_tasks[:]
+    kept = set(decompositions)
+    for t in abstract_tasks:
+        t.decompositions = [d for d in t.decompositions if d in kept]
+    bottom_up_removal(decompositions, operators, abstract_tasks, -1)
+    keep_initial_tasks(model, operators, abstract_tasks)
+    model.operators = operators
+    model.decompositions = decompositions
+    model.abstract_tasks = abstract_tasks
+    remove_unreferenced(model)
+    model.assign_global_ids()
+
+    if FLAGS.LOG_GROUNDER:
+        print(f'invariant mutex groups: {len(group_masks)} of {len(model.mutex_groups)}')
+        print(f'operators: {number_o_before} to {len(model.operators)}')
+        print(f'abstract tasks: {number_abt_before} to {len(model.abstract_tasks)}')
+        print(f'methods: {number_m_before} to {len(model.decompositions)}')
+    desc = Descriptions()
+    print(f'{desc("mutex_elapsed_time", time.time() - start_time)}')
@@ -3,6 +3,8 @@ import sys
 
 
 from Pytrich.model import Operator, AbstractTask
+from Pytrich.PostProcessing.pruning import bottom_up_removal, remove_unreferenced
+from Pytrich.PostProcessing.total_order_reachability import Dreachable_operators, Ereachable_operators
 import Pytrich.FLAGS as FLAGS
 
 
@@ -114,74 +116,16 @@ def remove_negative_precons(model):
 
 
 
-def convert_bitwise_repr(model):
-    def map_explicit_to_int(model):
-        """
-        Maps each fact to a unique integer, creating a mapping for bitwise operations.
-        This method is part of the process to convert states and operations to a bitwise format.
-        """
-        cont = 0
-
-        model.facts = sorted(model.facts)
-        model.goals = sorted(model.goals)
-        # NOTE: this is essential for fact count heuristic works faster
-        for g in model.goals:
-                model._explicit_to_int[g]    = cont
-                model._int_to_explicit[cont] = g
-                cont+=1
-        
-        for f in model.facts:
-            if f in model.goals:
-                continue
-            model._explicit_to_int[f]    = cont
-            model._int_to_explicit[cont] = f
-            cont+=1
-    
-    def convert_to_bitwise(model, facts_set):
-        bitwise_representation = 0
-        for fact in facts_set:
-            bit_position = model._explicit_to_int[fact]
-            bitwise_representation |= 1 << bit_position
-        return bitwise_representation
-    
-    """
-    Compresses fact representations by mapping facts to bit positions and converting
-    states to integer representations.
-    """
-    # map facts to bit position for bit representation
-    map_explicit_to_int(model)
-    
-    # convert initial and goal state to int
-    si_bitwise_repr = convert_to_bitwise(model, model.initial_state)
-    sf_bitwise_repr = convert_to_bitwise(model, model.goals)
-    model.initial_state = si_bitwise_repr
-    model._goal_bit_pos = [model._explicit_to_int[g] for g in model.goals]
-    model.goals = sf_bitwise_repr
-    
-    # convert preconditions and effects to integers for bitwise operations
-    for o in model.operators:
-        o.pos_precons_bitwise = convert_to_bitwise(model, o.pos_precons)
-        o.neg_precons_bitwise = convert_to_bitwise(model, o.neg_precons)
-        o.add_effects_bitwise = convert_to_bitwise(model, o.add_effects)
-        o.del_effects_bitwise = convert_to_bitwise(model, o.del_effects)
-        o.pos_precons = frozenset()
-        o.neg_precons = frozenset()
-        o.add_effects = frozenset()
-        o.del_effects = frozenset()
-    for d in model.decompositions:
-        d.pos_precons_bitwise = convert_to_bitwise(model, d.pos_precons)
-        d.neg_precons_bitwise = convert_to_bitwise(model, d.neg_precons)
-        d.pos_precons = frozenset()
-        d.neg_precons = frozenset()
-
-
-    
-
-#TODO:  Need code refactoring for efficiency and readability
 def del_relax_reachability(model):
     """
     Performs delete relaxation to identify reachable operators, tasks, and decompositions.
-    It iteratively prunes elements not reachable from the task decomposition graph.
+    It iteratively prunes elements not reachable from the task decomposition graph:
+        - operators not delete-relaxed reachable from the initial state
+          (counter-based, see Ereachable_operators)
+        - decompositions with an unreachable precondition or a pruned
+          subtask, and tasks left without decompositions (worklist, see
+          bottom_up_removal)
+        - whatever is no longer reachable from the initial task network
 
     Args:
         model (Model): The planning model to optimize.
@@ -190,72 +134,30 @@ def del_relax_reachability(model):
     initial_decomp_len = len(model.decompositions)
     initial_task_len = len(model.abstract_tasks)
 
-    removed_tasks     = set()
-    removed_operators = set()
-    initial_operators = {op for op in model.initial_tn if isinstance(op, Operator)} #in case there are operators into the initial task network
-    # TODO: problem here is to updated used_operators based on TDG, it generates invalid plans
-    changed=True
-    while changed:
-        changed=False
-        reachable_ops, positive_facts = _applicable_operators(model, model.initial_state)
-        
-        htn_reachable_operators = set(initial_operators)
-        removed_operators |= set(model.operators) - reachable_ops
-        for t in model.abstract_tasks[:]:
-            if t in removed_tasks:
-                continue
-
-            
-            # NOTE: remove decompositions: (1) not applicable (2) containing removed subtask
-            d_removal = False  # indicate if at least one decomposition 'd' was removed from task 't' 
-            for d in t.decompositions:
-                if not model.applicable(d, positive_facts) or any(subtask in removed_operators or subtask in removed_tasks for subtask in d.task_network):
-                # if not model.applicable(d, positive_facts):
-                   t.decompositions.remove(d)
-                   d_removal=True
-            
-            if d_removal and len(t.decompositions) == 0:
-                removed_tasks.add(t)
-                model.abstract_tasks.remove(t)
-            
-        reachable_decompositions = set()
-        for t in model.abstract_tasks:
-            if t in removed_tasks:
-               continue
-            for d in t.decompositions:
-                reachable_decompositions.add(d)
-                for subt in d.task_network:
-                    if isinstance(subt, Operator) and not subt in removed_operators:
-                        htn_reachable_operators.add(subt)
-                    
-        reachable_tasks = set(model.abstract_tasks) -  removed_tasks
+    while True:
+        count_operators = len(model.operators)
+        count_tasks = len(model.abstract_tasks)
+        count_decompositions = len(model.decompositions)
+        tdg_reachable = Dreachable_operators(model.initial_tn)
+        operators, reachable_facts = Ereachable_operators(
+            [o for o in model.operators if o in tdg_reachable], model.initial_state)
+        decompositions = model.decompositions[:]
+        abstract_tasks = model.abstract_tasks[:]
+        bottom_up_removal(decompositions, operators, abstract_tasks, reachable_facts)
+        model.operators = operators
+        model.decompositions = decompositions
+        model.abstract_tasks = abstract_tasks
+        remove_unreferenced(model)
         if FLAGS.LOG_GROUNDER:
-            print(f" op ({len(model.operators)}=>{len(htn_reachable_operators)})|tsks ({len(model.abstract_tasks)}=>{len(reachable_tasks)})|decompo ({len(model.decompositions)}=>{len(reachable_decompositions)})")
-        if len(reachable_tasks) != len(model.abstract_tasks) or len(htn_reachable_operators) != len(model.operators) or len(model.decompositions) != len(reachable_decompositions):
-            model.operators = list(htn_reachable_operators)  
-            model.decompositions = list(reachable_decompositions)
-            model.abstract_tasks = list(reachable_tasks) 
-            changed=True
+            print(f" op ({count_operators}=>{len(model.operators)})|tsks ({count_tasks}=>{len(model.abstract_tasks)})|decompo ({count_decompositions}=>{len(model.decompositions)})")
+        if len(model.operators) == count_operators:
+            break
+    model.assign_global_ids()
     
     if FLAGS.LOG_GROUNDER:   
         print(f"Delete Relaxation Reachability: Operators {initial_op_len} to {len(model.operators)}, Decompositions {initial_decomp_len} to {len(model.decompositions)}, Tasks {initial_task_len} to {len(model.abstract_tasks)}")    #correctness_check(model)
     
 
-def _applicable_operators(model, initial_facts):
-    reachable_operators = set()
-    reachable_facts = initial_facts
-    
-    changed = True
-    while changed:
-        changed = False
-        valid_operators =  set(model.operators) - reachable_operators
-        for op in valid_operators:
-            if not op in reachable_operators and model.applicable(op, reachable_facts):
-                reachable_operators.add(op)
-                reachable_facts = op.relaxed_apply_bitwise(reachable_facts)
-                changed = True
-    return reachable_operators, reachable_facts
-
 def correctness_check(model):
     ab_set = set(model.abstract_tasks)
     op_set = set(model.operators)
@@ -309,21 +211,20 @@ def pullup(model):
             next_task = decomp.task_network[decomp_progression[m_idx]]
             # if operator, pullup facts that are not effects of some previous task
             if type(next_task) is Operator:
-                pullup_precons = next_task.pos_precons_bitwise & ~decomp_pullup_eff[m_idx]
-                decomp_pullup_eff[m_idx] |= next_task.add_effects_bitwise
-                decomp.pos_precons_bitwise |= pullup_precons
+                pullup_precons = next_task.pos_precons & ~decomp_pullup_eff[m_idx]
+                decomp_pullup_eff[m_idx] |= next_task.add_effects
+                decomp.pos_precons |= pullup_precons
                 count_op_pus+=1
                 
             # if abstract task and its done, pullup common facts from task's decompositions
             else:
-                ctask_idx = ctask_map[decomp]
-                if not task_done[ctask_idx]:
+                if not task_done[next_task.local_id]:
                     continue
-                precons_intersec = next_task.decompositions[0]
+                precons_intersec = next_task.decompositions[0].pos_precons
                 for d in next_task.decompositions:
-                    precons_intersec &= d.pos_precons_bitwise
+                    precons_intersec &= d.pos_precons
                 pullup_precons = precons_intersec & ~decomp_pullup_eff[m_idx]
-                decomp.pos_precons_bitwise |= pullup_precons
+                decomp.pos_precons |= pullup_precons
                 count_t_pus+=1
                 #print(f'>>> ABSTRACT task pullup {decomp.name}')
 
@@ -0,0 +1,184 @@
+"""
+Pruning steps shared by the post-processing passes that remove components
+from the model (reachability, mutex pruning, macro compilation), and the
+decomposition graph SCCs used by reachability and the method trie.
+"""
+from typing import Dict, List, Set, Tuple
+
+from Pytrich.model import AbstractTask, Decomposition, Model, Operator
+
+
+def bottom_up_removal(R_decompositions: List[Decomposition],
+                      R_operators: List[Operator], 
+                      R_abstract_tasks: List[AbstractTask],
+                      reachable_facts: int) -> None:
+    """
+    Performs a bottom-up removal process on the reachable decompositions, operators, and abstract tasks
+    to eliminate those that cannot be achieved or are invalid due to the absence of their required components.
+
+    Decompositions are removed:
+        (1) Not applicable based on the current set of delete-relaxed reachable facts.
+        (2) If some subtask (operator or abstract) was pruned.
+    
+    Abstract tasks are removed when they no longer have valid decompositions.
+
+    Removals are propagated with a worklist: each subtask indexes the
+    decompositions using it, and a task losing its last decomposition
+    removes its users in turn, so every decomposition is visited a
+    constant number of times.
+    
+    @param R_decompositions: List of decompositions to be pruned.
+    @param R_operators: List of operators to be pruned.
+    @param R_abstract_tasks: List of abstract tasks to be pruned.
+    @param reachable_facts: Set of facts that are currently reachable.
+    """
+    alive_operators: Set[Operator] = set(R_operators)
+    alive_tasks: Set[AbstractTask] = {t for t in R_abstract_tasks if t.decompositions}
+    removed: Set[Decomposition] = set()
+    users: Dict[AbstractTask, List[Decomposition]] = {}
+    worklist: List[Decomposition] = []
+
+    for d in R_decompositions:
+        valid: bool = (d.pos_precons & reachable_facts) == d.pos_precons
+        for t in d.task_network:
+            if isinstance(t, Operator):
+                valid = valid and t in alive_operators
+            else:
+                users.setdefault(t, []).append(d)
+                valid = valid and t in alive_tasks
+        if not valid:
+            removed.add(d)
+            worklist.append(d)
+
+    remaining: Dict[AbstractTask, int] = {t: len(t.decompositions) for t in alive_tasks}
+    while worklist:
+        d = worklist.pop()
+        t = d.compound_task
+        if t not in alive_tasks:
+            continue
+        remaining[t] -= 1
+        if remaining[t] > 0:
+            continue
+        alive_tasks.discard(t)
+        for user in users.get(t, ()):
+            if user not in removed:
+                removed.add(user)
+                worklist.append(user)
+
+    for t in R_abstract_tasks:
+        t.decompositions = [d for d in t.decompositions if d not in removed]
+    R_decompositions[:] = [d for d in R_decompositions if d not in removed]
+    R_abstract_tasks[:] = [t for t in R_abstract_tasks if t in alive_tasks]
+
+
+def keep_initial_tasks(model: Model,
+                       R_operators: List[Operator],
+                       R_abstract_tasks: List[AbstractTask]) -> bool:
+    """
+    A pruning pass removing a task of the initial task network proves the
+    problem unsolvable. Such tasks are kept (abstract tasks without any
+    decomposition, operators as they are, they were pruned because they can
+    never be applied), so initial_tn only refers to components of the model
+    and the search reports UNSOLVABLE.
+    Returns True if some initial task was pruned.
+    """
+    kept = set(R_operators)
+    kept.update(R_abstract_tasks)
+    pruned = [t for t in dict.fromkeys(model.initial_tn) if t not in kept]
+    for t in pruned:
+        if isinstance(t, Operator):
+            R_operators.append(t)
+        else:
+            t.decompositions = []
+            R_abstract_tasks.append(t)
+    if pruned:
+        print(f'Pruned {len(pruned)} task(s) of the initial task network: the problem is unsolvable.')
+    return bool(pruned)
+
+
+def remove_unreferenced(model: Model) -> None:
+    """
+    Drops operators, abstract tasks and decompositions no longer reachable
+    from the initial task network, and rebuilds the decomposition list of
+    the remaining tasks from the remaining decompositions.
+    """
+    operators = set()
+    abstract_tasks = set()
+    stack = list(model.initial_tn)
+    while stack:
+        task = stack.pop()
+        if isinstance(task, Operator):
+            operators.add(task)
+        elif task not in abstract_tasks:
+            abstract_tasks.add(task)
+            for d in task.decompositions:
+                stack.extend(d.task_network)
+    model.operators = [o for o in model.operators if o in operators]
+    model.abstract_tasks = [t for t in model.abstract_tasks if t in abstract_tasks]
+    model.decompositions = [d for d in model.decompositions if d.compound_task in abstract_tasks]
+    for t in model.abstract_tasks:
+        t.decompositions = []
+    for d in model.decompositions:
+        d.compound_task.decompositions.append(d)
+
+
+def task_sccs(model: Model) -> Tuple[List[int], List[List[AbstractTask]]]:
+    """
+    Strongly connected components of the task decomposition graph
+    (abstract task -> abstract subtasks of its decompositions), computed
+    with an iterative Tarjan.
+    Returns the SCC index of each task (by local id) and the SCCs in
+    reverse topological order: an SCC comes after every SCC it reaches.
+    """
+    tasks = model.abstract_tasks
+    successors: List[List[int]] = [
+        [sub.local_id for d in t.decompositions for sub in d.task_network if isinstance(sub, AbstractTask)]
+        for t in tasks
+    ]
+    index: List[int] = [-1] * len(tasks)
+    low: List[int] = [0] * len(tasks)
+    on_stack: List[bool] = [False] * len(tasks)
+    scc_of: List[int] = [-1] * len(tasks)
+    sccs: List[List[AbstractTask]] = []
+    stack: List[int] = []
+    counter = 0
+
+    for root in range(len(tasks)):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+            edges = successors[v]
+            recurse = False
+            while i < len(edges):
+                w = edges[i]
+                i += 1
+                if index[w] == -1:
+                    work.append((v, i))
+                    work.append((w, 0))
+                    recurse = True
+                    break
+                if on_stack[w]:
+                    low[v] = min(low[v], index[w])
+            if recurse:
+                continue
+            if low[v] == index[v]:
+                scc = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    scc_of[w] = len(sccs)
+                    scc.append(tasks[w])
+                    if w == v:
+                        break
+                sccs.append(scc)
+            if work:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+    return scc_of, sccs
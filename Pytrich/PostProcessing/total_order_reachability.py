@@ -5,179 +5,115 @@ from typing import List, Set, Dict, NewType, Tuple, Union
 
 from Pytrich.DESCRIPTIONS import Descriptions
 import Pytrich.FLAGS as FLAGS
-from Pytrich.model import Decomposition, Model, Operator, AbstractTask
+from Pytrich.model import Decomposition, Model, Operator, AbstractTask, mask_facts
+from Pytrich.PostProcessing.pruning import bottom_up_removal, keep_initial_tasks, task_sccs
 
 GlobalID = NewType('GlobalID', int)
 LocalID  = NewType('LocalID', int)
 
-def _calculate_TO_achievers(model: Model, reachable: List[Set[int]]) -> Dict[int, Set[int]]:
-    """
-    Calculate the achievers for each operator.
-    The achievers are those that came before (predecessors) based on Total-Order reachability
-        and enable an operator (have at least one of its preconditions as effect).
-
-    NOTE: shift_offset_id (int): The offset used to map global task IDs to local task IDs.
-    NOTE: predecessors (List[Set[int]]): A list where each index corresponds to a local operator ID, 
-        and each element is a set of local IDs that can achieve the operator based on TO constraints.
-    NOTE: achivers_group (Dict[int, Set[int]]): A dictionary mapping each operator's global ID to a set of 
-        global IDs of operators that can achieve it.
 
+def _calculate_TO_reachable(model: Model, scc_of: List[int], sccs: List[List[AbstractTask]]) -> List[int]:
     """
-        
-    shift_offset_id: int = model.ifacts_end + 1
-    predecessors: List[Set[LocalID]] = [set() for _ in range(len(model.operators))]
-    
-    # compute predecessors mapping global->local ids
-    for decomposition in model.decompositions:
-        subtasks = decomposition.task_network
-        
-        for sub_i, subtask in enumerate(subtasks, start=1):
-            taski_id: GlobalID = subtask.global_id
-            taski_local_id: LocalID = taski_id - shift_offset_id  # shift left: global->local
-            for operator_local_id in reachable[taski_local_id]:
-                for j in range(sub_i - 1, -1, -1):
-                    taskj_id: GlobalID = subtasks[j].global_id
-                    taskj_local_id: LocalID = taskj_id - shift_offset_id  # shift left: global->local
-                    r: Set[int] = reachable[taskj_local_id]
-                    predecessors[operator_local_id].update(r)
-    
-    subtasks = model.initial_tn
-    for sub_i, subtask in enumerate(subtasks):
-        taski_id: GlobalID = subtask.global_id
-        taski_local_id: LocalID = taski_id - shift_offset_id  # shift left: global->local
-        for operator_local_id in reachable[taski_local_id]:
-            for j in range(sub_i - 1, -1, -1):
-                taskj_id: GlobalID = subtasks[j].global_id
-                taskj_local_id: LocalID = taskj_id - shift_offset_id  # shift left: global->local
-                predecessors[operator_local_id].update(reachable[taskj_local_id])
-                
-    # compute achievers mappping local->global ids
-    achivers_group: Dict[GlobalID, Set[GlobalID]] = {a.global_id: set() for a in model.operators}
-    for o in model.operators:
-        if o.applicable_bitwise(model.initial_state):
-            achivers_group[o.global_id] = {-1}  # mark trivial applicable operators
-            continue
-        
-        o_achievers: Set[GlobalID] = set()
-        o_local_id: LocalID = o.global_id - shift_offset_id
-        o_predecessors: Set[LocalID] = predecessors[o_local_id]
-        
-        for pred_loc_id in o_predecessors:
-            pred_global_id: GlobalID = pred_loc_id + shift_offset_id  # shift RIGHT: local -> global
-            pred_instance: Operator = model.get_component(pred_global_id)
-            if pred_instance.add_effects_bitwise & o.pos_precons_bitwise != 0:
-                o_achievers.add(pred_global_id)
-        achivers_group[o.global_id] = o_achievers
+    Operators reachable from each SCC of the decomposition graph, as a
+    bitmask over operator local ids. Tasks of an SCC reach each other, so
+    they share one mask; SCCs are visited in reverse topological order
+    and each one is computed once from its successors.
+    """
+    reach: List[int] = [0] * len(sccs)
+    for scc_id, scc in enumerate(sccs):
+        r = 0
+        for t in scc:
+            for d in t.decompositions:
+                for sub in d.task_network:
+                    if isinstance(sub, Operator):
+                        r |= 1 << sub.local_id
+                    else:
+                        r |= reach[scc_of[sub.local_id]]
+        reach[scc_id] = r
+    return reach
 
-    return achivers_group
 
-def _calculate_TO_reachable(model: Model) -> List[Set[int]]:
+def _calculate_TO_achievers(model: Model, scc_of: List[int], sccs: List[List[AbstractTask]],
+                            reach: List[int]) -> List[int]:
     """
-    Calculate the reachable set of operators for each task.
+    Calculate the achievers for each operator.
+    The achievers are those that came before (predecessors) based on Total-Order reachability
+        and enable an operator (have at least one of its preconditions as effect).
 
-    NOTE: R_set : A list where each index corresponds to a task's local ID, 
-         and each element is a set of reachable task local IDs.
-    NOTE: visited : A list to track which tasks have been 
-        visited during the depth-first search (DFS).
-    NOTE: v_it : A visit marker that increments with each DFS 
-        run to avoid resetting the `visited` list.
-    NOTE: shift_offset_ids: The offset used to map global task IDs to local task IDs.
-    
-    TODO: Use Dijkstra for updating nodes instead of DFS; not sure if it compensates.
+    NOTE: predecessors of an operator o: union, over every task network
+        position whose task reaches o, of the operators reachable from the
+        tasks before that position. Each position contributes its prefix
+        once to its own task (acc); the prefixes are then pushed down the
+        SCC condensation in topological order, so o inherits those of every
+        task reaching it.
+    NOTE: returns a bitmask over operator local ids per operator local id.
     """
-    
-    len_operators = len(model.operators)
-    len_abstract_tasks = len(model.abstract_tasks)
-    shift_offset_ids = model.ifacts_end + 1
-    
-    R_set: List[Set[LocalID]] = [set() for _ in range(len_operators + len_abstract_tasks)]
-    visited: List[LocalID] = [0] * (len_operators + len_abstract_tasks)
-    v_it: int = 1
-
-    # Operators are trivially reachable
-    for i in range(len_operators):
-        R_set[i] = {i}
+    task_reach = lambda t: 1 << t.local_id if isinstance(t, Operator) else reach[scc_of[t.local_id]]
 
-    for task in model.abstract_tasks:
-        r_task: Set[LocalID] = set()
-        _dfs_iterative(model, task, R_set, r_task, v_it, visited, shift_offset_ids)
-        
-        # Shift left to get task local IDs
-        task_local_id: LocalID = task.global_id - shift_offset_ids
-        R_set[task_local_id] = r_task
-        v_it += 1
-
-    return R_set
-        
+    predecessors: List[int] = [0] * len(model.operators)
+    inherited: List[int] = [0] * len(sccs)
+    for task_network in [d.task_network for d in model.decompositions] + [model.initial_tn]:
+        prefix = 0
+        for sub in task_network:
+            if isinstance(sub, Operator):
+                predecessors[sub.local_id] |= prefix
+            else:
+                inherited[scc_of[sub.local_id]] |= prefix
+            prefix |= task_reach(sub)
 
-def _dfs_iterative(model: Model, task: AbstractTask, R: List[Set[LocalID]], 
-                   r: Set[LocalID], v_it: int, visited: List[LocalID], soid: int) -> None:
-    stack = [task]
-    
-    while stack:
-        current_task = stack.pop()
-        task_id = current_task.global_id
-        
-        # Shift left to get task local IDs
-        task_local_id: LocalID = LocalID(task_id - soid)
-        
-        if visited[task_local_id] == v_it:
+    for scc_id in range(len(sccs) - 1, -1, -1):
+        prefixes = inherited[scc_id]
+        if not prefixes:
             continue
-        
-        visited[task_local_id] = v_it
-        r_task = R[task_local_id]
-        if r_task:
-            r.update(r_task)
+        for t in sccs[scc_id]:
+            for d in t.decompositions:
+                for sub in d.task_network:
+                    if isinstance(sub, Operator):
+                        predecessors[sub.local_id] |= prefixes
+                    else:
+                        inherited[scc_of[sub.local_id]] |= prefixes
 
-        for decomposition in current_task.decompositions:
-            for subtask in decomposition.task_network:
-                if subtask in model.operators:
-                    r.add(LocalID(subtask.global_id - soid))  # use local ID
-                else:
-                    stack.append(subtask)
+    # operators adding each fact, as a mask over operator local ids
+    adders: Dict[int, int] = {}
+    for o in model.operators:
+        for fact in mask_facts(o.add_effects):
+            adders[fact] = adders.get(fact, 0) | (1 << o.local_id)
+
+    achievers: List[int] = [0] * len(model.operators)
+    for o in model.operators:
+        if o.applicable(model.initial_state):
+            continue  # trivially applicable, needs no achiever
+        precons_adders = 0
+        for fact in mask_facts(o.pos_precons):
+            precons_adders |= adders.get(fact, 0)
+        achievers[o.local_id] = predecessors[o.local_id] & precons_adders
+    return achievers
 
 
-def _TOreachable_operators(model: Model, O: List[Operator], achievers: Dict[GlobalID, Set[GlobalID]]) -> List[Operator]:
+def _TOreachable_operators(model: Model, O: List[Operator], achievers: List[int]) -> List[Operator]:
     """
     Get Total-Order achievers and remove those that cannot be reachable (not available).
     
     @param model: Model class
     @param O: List of available operators
-    @param achievers: Dict mapping operator global IDs to sets of global IDs of operators that can achieve it.
+    @param achievers: achievers mask of each operator, by local id (see _calculate_TO_achievers).
     
-    NOTE: shift_offset_id maps global IDs to local IDs for indexing them into an array.
-    NOTE: Instead of checking whether an operator is in the 'achievers' set, we verify in the 'available' set.
+    NOTE: only achievers still available (in O) are relaxed-applied.
     """
-    achievable_op: Set[Operator] = set()
-    available: List[int] = [0] * len(model.operators)
-    shift_offset_id: int = len(model.facts)
-
-    # mark available operators in the 'available' array
+    available: int = 0
     for o in O:
-        available[o.global_id - shift_offset_id] = 1  # shift left operators IDs
+        available |= 1 << o.local_id
 
-    # check if each operator is applicable (achievers satisfy all operator preconditions)
+    R_operators: List[Operator] = []
     for o in O:
         achiever_state = model.initial_state
-        removed_achievers: Set[GlobalID] = set()
-        op_achievers = achievers[o.global_id]
-        
-        for a_id in op_achievers:
-            if a_id == GlobalID(-1):  # Skip trivial achievers
-                continue
-            if available[a_id - shift_offset_id] == 0:
-                removed_achievers.add(a_id)
-                continue
-            o_a = model.get_component(a_id)
-            achiever_state = o_a.relaxed_apply_bitwise(achiever_state)
-        
-        op_achievers -= removed_achievers
-        if o.applicable_bitwise(achiever_state):  # Check if the operator is achievable
-            achievable_op.add(o)
-        
-    return list(achievable_op)
+        for a_id in mask_facts(achievers[o.local_id] & available):
+            achiever_state = model.operators[a_id].relaxed_apply(achiever_state)
+        if o.applicable(achiever_state):  # Check if the operator is achievable
+            R_operators.append(o)
+    return R_operators
 
-def _Dreachable_operators(initial_task_network: List[Union[AbstractTask, Operator]]) -> Set[Operator]:
+def Dreachable_operators(initial_task_network: List[Union[AbstractTask, Operator]]) -> Set[Operator]:
     def _dfs_reachable(task_node: Union[AbstractTask, Operator],
                        R: Set[Operator],
                        visited: Set[Union[AbstractTask, Operator]]) -> None:
@@ -201,88 +137,48 @@ def _Dreachable_operators(initial_task_network: List[Union[AbstractTask, Operato
     
     return tdg_reachable_operators
 
-def _Ereachable_operators(operators: List[Operator], initial_state: int) -> Tuple[List[Operator], int]:
-    reachable_operators: List[Operator] = []
-    reachable_facts: int = initial_state
-    O: Set[Operator] = set(operators)
-    
-    changed: bool = True
-    while changed:
-        changed = False
-        remove_op: Set[Operator] = set()
-        for op in O:
-            if op not in reachable_operators and op.applicable_bitwise(reachable_facts):
-                reachable_operators.append(op)
-                reachable_facts = op.relaxed_apply_bitwise(reachable_facts)
-                remove_op.add(op)
-                changed = True
-        O -= remove_op
-    
-    return reachable_operators, reachable_facts
-
-def _compute_achievers_set(model: Model) -> Dict[int, Set[int]]:
-    reachable: List[Set[int]] = _calculate_TO_reachable(model)
-    achievers: Dict[int, Set[int]] = _calculate_TO_achievers(model, reachable)
-    return achievers
-
-def _bottom_up_removal(R_decompositions: List[Decomposition],
-                       R_operators: List[Operator], 
-                       R_abstract_tasks: List[AbstractTask],
-                       reachable_facts: int) -> None:
+def Ereachable_operators(operators: List[Operator], initial_state: int) -> Tuple[List[Operator], int]:
     """
-    Performs a bottom-up removal process on the reachable decompositions, operators, and abstract tasks
-    to eliminate those that cannot be achieved or are invalid due to the absence of their required components.
+    Delete-relaxed reachability with unsatisfied-precondition counters:
+    each operator counts its preconditions not yet reached and is indexed
+    under them (fact -> consumers). Reaching a fact decrements its
+    consumers, an operator whose counter drops to zero is applied. Every
+    operator and precondition is visited once.
+    Returns the reachable operators (in the order of `operators`) and the
+    reachable facts.
+    """
+    consumers: Dict[int, List[int]] = {}
+    missing: List[int] = [0] * len(operators)
+    queue: List[int] = []
+    for op_i, op in enumerate(operators):
+        count = 0
+        for fact in mask_facts(op.pos_precons & ~initial_state):
+            consumers.setdefault(fact, []).append(op_i)
+            count += 1
+        missing[op_i] = count
+        if count == 0:
+            queue.append(op_i)
 
-    Decompositions are removed:
-        (1) Not applicable based on the current set of delete-relaxed reachable facts.
-        (2) If some subtask (operator or abstract) was pruned.
-    
-    Abstract tasks are removed when they no longer have valid decompositions.
+    reachable_facts: int = initial_state
+    while queue:
+        op = operators[queue.pop()]
+        new_facts = op.add_effects & ~reachable_facts
+        if not new_facts:
+            continue
+        reachable_facts |= new_facts
+        for fact in mask_facts(new_facts):
+            for op_i in consumers.get(fact, ()):
+                missing[op_i] -= 1
+                if missing[op_i] == 0:
+                    queue.append(op_i)
 
-    The process repeats until any decomposition or task is removed.
-    
-    @param R_decompositions: List of decompositions to be pruned.
-    @param R_operators: List of operators to be pruned.
-    @param R_abstract_tasks: List of abstract tasks to be pruned.
-    @param reachable_facts: Set of facts that are currently reachable.
-    """
-    
-    cleaned: bool = True
-    while cleaned:
-        cleaned = False
-        decompositions: List[Decomposition] = []
-        abstract_tasks: List[AbstractTask] = []
+    reachable_operators = [op for op_i, op in enumerate(operators) if missing[op_i] == 0]
+    return reachable_operators, reachable_facts
 
-        # Remove decompositions
-        for d in R_decompositions:
-            valid: bool = True
-            if not d.applicable_bitwise(reachable_facts):
-                valid = False
-            else:
-                for t in d.task_network:
-                    if isinstance(t, Operator) and t not in R_operators:
-                        valid = False
-                        break
-                    elif isinstance(t, AbstractTask) and t not in R_abstract_tasks:
-                        valid = False
-                        break
-            if valid:
-                decompositions.append(d)
-            else:
-                d.compound_task.decompositions.remove(d)
-                cleaned = True
-            
-        # Remove abstract tasks
-        for abt in R_abstract_tasks:
-            if len(abt.decompositions) > 0:
-                abstract_tasks.append(abt)
-            else:
-                cleaned = True
-        
-        R_decompositions.clear()
-        R_decompositions.extend(decompositions)
-        R_abstract_tasks.clear()
-        R_abstract_tasks.extend(abstract_tasks)
+def _compute_achievers_set(model: Model) -> List[int]:
+    scc_of, sccs = task_sccs(model)
+    reach: List[int] = _calculate_TO_reachable(model, scc_of, sccs)
+    return _calculate_TO_achievers(model, scc_of, sccs, reach)
 
 def TO_relax_reachability(model: Model) -> None:
     print(f'Starting TO reachability.')
@@ -308,16 +204,17 @@ def TO_relax_reachability(model: Model) -> None:
         i += 1
         count_curr_O = len(R_operators)
         
-        # Measure time for _Dreachable_operators
+        # Measure time for Dreachable_operators
         start_D_reachable = time.time()
-        D_Rops_set = _Dreachable_operators(model.initial_tn)  # operators reachable by decomposition space
+        D_Rops_set = Dreachable_operators(model.initial_tn)  # operators reachable by decomposition space
         elapsed_D_reachable = time.time() - start_D_reachable
         if FLAGS.LOG_GROUNDER:   
             print(f'\t({i}) Decomposition reachability after {elapsed_D_reachable:.2f} seconds.')
 
-        # Measure time for _Ereachable_operators
+        # Measure time for Ereachable_operators
         start_E_reachable = time.time()
-        E_Rops, reachable_facts = _Ereachable_operators(D_Rops_set, model.initial_state)  # operators reachable by executability space
+        E_Rops, reachable_facts = Ereachable_operators([o for o in R_operators if o in D_Rops_set],
+                                                        model.initial_state)  # operators reachable by executability space
         elapsed_E_reachable = time.time() - start_E_reachable
         if FLAGS.LOG_GROUNDER:   
             print(f'\t({i}) Executability reachability after {elapsed_E_reachable:.2f} seconds.')
@@ -337,7 +234,7 @@ def TO_relax_reachability(model: Model) -> None:
             break    
           
         start_bur = time.time()                    
-        _bottom_up_removal(R_decompositions, R_operators, R_abstract_tasks, reachable_facts)
+        bottom_up_removal(R_decompositions, R_operators, R_abstract_tasks, reachable_facts)
         elapsed_bur = time.time() - start_bur
         if FLAGS.LOG_GROUNDER:   
             count_burRops = len(R_operators)
@@ -348,6 +245,7 @@ def TO_relax_reachability(model: Model) -> None:
             print(f'\t\t({i}) Bottom up removed {count_TORops - count_burRops} operators.')
         break
     
+    keep_initial_tasks(model, R_operators, R_abstract_tasks)
     model.decompositions = R_decompositions
     model.abstract_tasks = R_abstract_tasks
     model.operators = R_operators
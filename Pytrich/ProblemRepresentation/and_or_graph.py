@@ -1,15 +1,16 @@
-from enum import Enum, auto
-from collections import deque
+from array import array
+from enum import IntEnum, auto
+import heapq
+from typing import Iterable, List, Optional
 
-from Pytrich.PostProcessing.total_order_reachability import _compute_achievers_set
-from Pytrich.model import Operator
+from Pytrich.model import Model, Operator, mask_facts
 
-class NodeType(Enum):
+class NodeType(IntEnum):
     AND = auto()
     OR = auto()
     INIT = auto()
 
-class ContentType(Enum):
+class ContentType(IntEnum):
     OPERATOR = auto()
     ABSTRACT_TASK = auto()
     METHOD = auto()
@@ -19,34 +20,37 @@ class ContentType(Enum):
     Nan = auto()
 
 
-class AndOrNode:
-    def __init__(self, ID, LOCALID, node_type, content_type=ContentType.Nan, weight=0, str_name=''):
-        self.ID = ID # node's global id
-        self.LOCALID = LOCALID # component's position in model
-        self.type  = node_type
-        self.content_type = content_type
-        self.successors   = []
-        self.predecessors = []
-        
-        # specific for computing heuristic values using AND/OR structure
-        self.forced_true = False
-        self.num_forced_predecessors = 0
-        self.weight    = weight
-        self.value     = 0
-        # for output
-        self.str_name = str_name
-        
-    def __str__(self):
-        return F"Node ID={self.ID}:{self.str_name}"
-    def __repr__(self) -> str:
-        return f"<Node {self.ID} {self.content_type}>"
-    
 class AndOrGraph:
-    def __init__(self, model, graph_type = 0):
+    """
+    AND/OR graph over the model components in compressed sparse row form.
+
+    Node ids are the components' global ids (facts, operators, abstract
+    tasks, decompositions), followed by one recomposition node per operator
+    in the top-down and relaxed composition graphs. Node attributes are
+    typed arrays indexed by node id (`node_type`, `content_type`, `weight`,
+    `local_id`) and the edges are two CSR tables:
+        predecessors of v: pred_ids[pred_offsets[v]:pred_offsets[v+1]]
+        successors of v:   succ_ids[succ_offsets[v]:succ_offsets[v+1]]
+    in edge insertion order. The graph is immutable once built, so
+    heuristics keep their per-node values in their own arrays and share one
+    graph per type through AndOrGraph.for_model.
+
+    Graph types:
+        0 bottom-up, 1 top-down, 2 task decomposition graph, 3 relaxed composition
+    """
+    def __init__(self, model: Model, graph_type: int = 0):
         self.model = model
-        self.nodes = None
+        self.graph_type = graph_type
         self.components_count = len(model.facts) + len(model.operators) + len(model.abstract_tasks) + len(model.decompositions)
-        self.init_nodes = set()
+        self.node_count = self.components_count
+        if graph_type in (1, 3):
+            self.node_count += len(model.operators)
+        self.node_type = array('b', [NodeType.OR]) * self.node_count
+        self.content_type = array('b', [ContentType.Nan]) * self.node_count
+        self.weight = array('q', [0]) * self.node_count
+        self.local_id = array('i', [0]) * self.node_count
+        self._sources = array('i')
+        self._targets = array('i')
         if graph_type == 0:
             self.bu_initialize(model)
         elif graph_type == 1:
@@ -58,36 +62,88 @@ class AndOrGraph:
         else:
             print(f"Invalid Graph Type {graph_type}")
             exit(0)
-        
+        self.pred_offsets, self.pred_ids = self._compress(self._targets, self._sources)
+        self.succ_offsets, self.succ_ids = self._compress(self._sources, self._targets)
+        self._sources = self._targets = None
+
+    @classmethod
+    def for_model(cls, model: Model, graph_type: int) -> 'AndOrGraph':
+        """The model's graph of `graph_type`, built on first use and shared afterwards."""
+        graph = model.and_or_graphs.get(graph_type)
+        if graph is None:
+            graph = model.and_or_graphs[graph_type] = cls(model, graph_type)
+        return graph
+
+    def _compress(self, keys: array, values: array):
+        """Counting sort of the edges by `keys` (stable): (offsets, values in key order)."""
+        offsets = array('i', [0]) * (self.node_count + 1)
+        for k in keys:
+            offsets[k + 1] += 1
+        for v in range(self.node_count):
+            offsets[v + 1] += offsets[v]
+        ids = array('i', [0]) * len(keys)
+        position = array('i', offsets)
+        for k, value in zip(keys, values):
+            ids[position[k]] = value
+            position[k] += 1
+        return offsets, ids
+
+    def __len__(self):
+        return self.node_count
+
+    def predecessors(self, node_id: int) -> array:
+        return self.pred_ids[self.pred_offsets[node_id]:self.pred_offsets[node_id + 1]]
+
+    def successors(self, node_id: int) -> array:
+        return self.succ_ids[self.succ_offsets[node_id]:self.succ_offsets[node_id + 1]]
+
+    def in_degree(self, node_id: int) -> int:
+        return self.pred_offsets[node_id + 1] - self.pred_offsets[node_id]
+
+    def name(self, node_id: int) -> str:
+        if node_id >= self.components_count:
+            return f'R-{self.model.operators[self.local_id[node_id]].name}'
+        return self.model.get_component(node_id).name
+
+    def _set_node(self, node_id, local_id, node_type, content_type, weight=0):
+        self.node_type[node_id] = node_type
+        self.content_type[node_id] = content_type
+        self.weight[node_id] = weight
+        self.local_id[node_id] = local_id
+
+    def add_edge(self, source: int, target: int):
+        self._sources.append(source)
+        self._targets.append(target)
+
+    def _set_facts(self, model, use_init=True):
+        for f in model.facts:
+            init = use_init and model.initial_state >> f.local_id & 1
+            self._set_node(f.local_id, f.local_id, NodeType.INIT if init else NodeType.OR, ContentType.FACT)
+
+    def _set_abstract_tasks(self, model):
+        for t_i, t in enumerate(model.abstract_tasks):
+            self._set_node(t.global_id, t_i, NodeType.OR, ContentType.ABSTRACT_TASK)
+
+    def _add_strips_edges(self, op):
+        # fact -> operator for preconditions, operator -> fact for add effects
+        for fact in mask_facts(op.pos_precons):
+            self.add_edge(fact, op.global_id)
+        for fact in mask_facts(op.add_effects):
+            self.add_edge(op.global_id, fact)
+
     def tdg_initialize(self, model):
         '''
         Task Decomposition Graph only
         '''
-        self.nodes = [None] * self.components_count # should ignore facts
-        for f_i, f in enumerate(self.model.facts):
-            fact_node = AndOrNode(f.global_id, f_i, NodeType.OR, content_type=ContentType.FACT, str_name=f_i)
-            self.nodes[f.global_id]=fact_node
-
-        # set abstract task
-        for t_i, t in enumerate(model.abstract_tasks):
-            task_node = AndOrNode(t.global_id, t_i, NodeType.OR, content_type=ContentType.ABSTRACT_TASK, str_name=t.name)
-            self.nodes[t.global_id]=task_node
-            
-        # set primitive tasks -operators
+        self._set_facts(model, use_init=False)
+        self._set_abstract_tasks(model)
         for op_i, op in enumerate(model.operators):
-            operator_node = AndOrNode(op.global_id, op_i, NodeType.AND, content_type=ContentType.OPERATOR, weight=op.cost, str_name=op.name)
-            self.nodes[op.global_id] = operator_node
-            
-        # set methods
+            self._set_node(op.global_id, op_i, NodeType.AND, ContentType.OPERATOR, op.cost)
         for d_i, d in enumerate(model.decompositions):
-            decomposition_node = AndOrNode(d.global_id, d_i, NodeType.AND, content_type=ContentType.METHOD, str_name=d.name)
-            self.nodes[d.global_id] = decomposition_node
-            task_head_id = d.compound_task.global_id
-            self.add_edge(decomposition_node, self.nodes[task_head_id])
+            self._set_node(d.global_id, d_i, NodeType.AND, ContentType.METHOD)
+            self.add_edge(d.global_id, d.compound_task.global_id)
             for subt in d.task_network:
-                subt_node:AndOrNode = self.nodes[subt.global_id]
-                self.add_edge(subt_node, decomposition_node)
-
+                self.add_edge(subt.global_id, d.global_id)
 
     def bu_initialize(self, model):
         '''
@@ -95,46 +151,17 @@ class AndOrGraph:
           We refer to it as 'bottom-up' because it captures the HTN hierarchy this way
           see: Höller, D., & Bercher, P. (2021). Landmark Generation in HTN Planning. Proceedings of the AAAI Conference on Artificial Intelligence
         '''
-        self.nodes = [None] * self.components_count
-        # set facts
-        for fact in self.model.facts:
-            fact_node = AndOrNode(fact.local_id, fact.local_id, NodeType.OR, content_type=ContentType.FACT, str_name=fact.name)
-            self.nodes[fact.local_id]  = fact_node
-            if model.initial_state & (1 << fact.local_id):
-                fact_node.type = NodeType.INIT
-        
-        
-        # set abstract task
-        for t_i, t in enumerate(model.abstract_tasks):
-            task_node = AndOrNode(t.global_id, t_i, NodeType.OR, content_type=ContentType.ABSTRACT_TASK, str_name=t.name)
-            self.nodes[t.global_id]=task_node
-            
-        # set primitive tasks -operators
+        self._set_facts(model)
+        self._set_abstract_tasks(model)
         for op_i, op in enumerate(model.operators):
-            operator_node = AndOrNode(op.global_id, op_i, NodeType.AND, content_type=ContentType.OPERATOR, str_name=op.name)
-            self.nodes[op.global_id] = operator_node
-            for fact_pos in range(max(op.pos_precons.bit_length(), op.add_effects.bit_length())):
-                if op.pos_precons & (1 << fact_pos):
-                    var_node:AndOrNode = self.nodes[fact_pos]
-                    self.add_edge(var_node, operator_node)
-                if op.add_effects & (1 << fact_pos):
-                    var_node:AndOrNode = self.nodes[fact_pos]
-                    self.add_edge(operator_node, var_node)
-                    
-        # set methods
+            self._set_node(op.global_id, op_i, NodeType.AND, ContentType.OPERATOR)
+            self._add_strips_edges(op)
         for d_i, d in enumerate(model.decompositions):
-            decomposition_node = AndOrNode(d.global_id, d_i, NodeType.AND, content_type=ContentType.METHOD, str_name=d.name)
-            self.nodes[d.global_id] = decomposition_node
-            task_head_id = d.compound_task.global_id
-            self.add_edge(decomposition_node, self.nodes[task_head_id])
+            self._set_node(d.global_id, d_i, NodeType.AND, ContentType.METHOD)
+            self.add_edge(d.global_id, d.compound_task.global_id)
             for subt in d.task_network:
-                subt_node:AndOrNode = self.nodes[subt.global_id]
-                self.add_edge(subt_node, decomposition_node)
-                # NOTE: removing it for know, since we are using panda grounding
-                # for fact_pos in range(facts_count): 
-                #     if d.pos_precons & (1 << fact_pos):
-                #         fact_node = self.nodes[fact_pos]
-                #         self.add_edge(fact_node, decomposition_node)
+                self.add_edge(subt.global_id, d.global_id)
+                # NOTE: method preconditions are not connected, since we are using panda grounding
 
     def td_initialize(self, model):
         '''
@@ -144,193 +171,208 @@ class AndOrGraph:
 
           Encode task hierarchy using a top-down view.
         '''
-        self.nodes = [None] * (self.components_count + len(model.operators))
-        # set facts
-        for fact in self.model.facts:
-            fact_node = AndOrNode(fact.local_id, fact.local_id, NodeType.OR, content_type=ContentType.FACT, str_name=fact.name)
-            self.nodes[fact.local_id]  = fact_node
-            if model.initial_state & (1 << fact.local_id):
-                fact_node.type = NodeType.INIT
-        # set abstract task
-        for t_i, t in enumerate(model.abstract_tasks):
-            task_node = AndOrNode(t.global_id, t_i, NodeType.OR, content_type=ContentType.ABSTRACT_TASK, str_name=t.name)
-            self.nodes[t.global_id]=task_node
+        self._set_facts(model)
+        self._set_abstract_tasks(model)
         # NOTE: Recomposition Graph defines tnI as INIT node
         for task in model.initial_tn:
-            self.nodes[task.global_id].type= NodeType.INIT
-        # set primitive tasks -operators
+            self.node_type[task.global_id] = NodeType.INIT
         for op_i, op in enumerate(model.operators):
-            operator_node = AndOrNode(op.global_id, op_i, NodeType.AND, content_type=ContentType.OPERATOR, str_name=op.name)
-            recomposition_node = AndOrNode(self.components_count + op_i, op_i, NodeType.OR, content_type=ContentType.RECOMPOSITION, str_name=f'R-{op.name}')
-            self.nodes[operator_node.ID] = operator_node
-            self.nodes[recomposition_node.ID] = recomposition_node
-            self.add_edge(recomposition_node, operator_node)
-            for fact_pos in range(max(op.pos_precons.bit_length(), op.add_effects.bit_length())):
-                if op.pos_precons & (1 << fact_pos):
-                    var_node = self.nodes[fact_pos]
-                    self.add_edge(var_node, operator_node)
-                if op.add_effects & (1 << fact_pos):
-                    var_node = self.nodes[fact_pos]
-                    self.add_edge(operator_node, var_node)
-        # set methods
+            recomposition_id = self.components_count + op_i
+            self._set_node(op.global_id, op_i, NodeType.AND, ContentType.OPERATOR)
+            self._set_node(recomposition_id, op_i, NodeType.OR, ContentType.RECOMPOSITION)
+            self.add_edge(recomposition_id, op.global_id)
+            self._add_strips_edges(op)
         for d_i, d in enumerate(model.decompositions):
-            decomposition_node = AndOrNode(d.global_id, d_i, NodeType.AND, content_type=ContentType.METHOD, str_name=d.name)
-            self.nodes[d.global_id] = decomposition_node
-            task_head_id = d.compound_task.global_id
-            self.add_edge(self.nodes[task_head_id], decomposition_node)
+            self._set_node(d.global_id, d_i, NodeType.AND, ContentType.METHOD)
+            self.add_edge(d.compound_task.global_id, d.global_id)
             for subt in d.task_network:
-                subt_node = self.nodes[subt.global_id]
                 if isinstance(subt, Operator):
-                    rec_node_ID = self.components_count+subt_node.LOCALID
-                    rec_node = self.nodes[rec_node_ID] # get recomposition node
-                    self.add_edge(decomposition_node, rec_node) # if operator, connect decomposition to recomposition node
+                    # if operator, connect decomposition to recomposition node
+                    self.add_edge(d.global_id, self.components_count + subt.local_id)
                 else:
-                    self.add_edge(decomposition_node, subt_node)
-                
-                # for fact_pos in range(facts_count):
-                #     if d.pos_precons_bitwise & (1 << fact_pos):
-                #         fact_node = self.nodes[fact_pos]
-                #         self.add_edge(fact_node, decomposition_node)
+                    self.add_edge(d.global_id, subt.global_id)
 
     # Relaxed Composition Graph (required to compute hmax and lmcut in DOF+TI HTN planning)
     def rc_initialize(self, model):
         """
-        Similar to the 'bottom-up' initialization (bu_initialize), 
+        Similar to the 'bottom-up' initialization (bu_initialize),
         but each operator (action) is followed by a dedicated OR node
         that can connect to methods. This graph follows the direction of edges
         as in the bottom-up graph, but introduces a composition nodes for each action.
         """
-        extra_or_count = len(model.operators)
-        total_nodes_count = self.components_count + extra_or_count
-        self.nodes = [None] * total_nodes_count
-
-        # set facts
-        for f in self.model.facts:
-            fact_node = AndOrNode(
-                f.local_id, f.local_id,
-                NodeType.OR,
-                content_type=ContentType.FACT,
-                str_name=f.name
-            )
-            self.nodes[f.local_id] = fact_node
-            if model.initial_state & (1 << f.local_id):
-                fact_node.type = NodeType.INIT
-
-        # set abstract tasks
-        for abti, at in enumerate(model.abstract_tasks):
-            tnode = AndOrNode(
-                at.global_id, abti,
-                NodeType.OR,
-                content_type=ContentType.ABSTRACT_TASK,
-                str_name=at.name
-            )
-            self.nodes[at.global_id] = tnode
-
-        # 3. Set Primitive Tasks (Operators)
+        self._set_facts(model)
+        self._set_abstract_tasks(model)
         offset = self.components_count
         for oi, op in enumerate(model.operators):
-            # op.global_id maps to the operator node
-            onode = AndOrNode(
-                op.global_id, oi,
-                NodeType.AND,
-                content_type=ContentType.OPERATOR,
-                weight=op.cost,
-                str_name=op.name
-            )
-            self.nodes[op.global_id] = onode
-
-            #composition node
-            cnid = offset + oi
-            cnode = AndOrNode(
-                cnid, oi,
-                NodeType.OR,
-                content_type=ContentType.RECOMPOSITION,
-                str_name=f'R-{op.name}'
-            )
-            self.nodes[cnid] = cnode
-            self.add_edge(onode, cnode)
-
-            if op.pos_precons.bit_length() == 0:
-                onode.type = NodeType.INIT
-
-            max_bit = max(op.pos_precons.bit_length(), op.add_effects.bit_length())
-            for fact_pos in range(max_bit):
-                if op.pos_precons & (1 << fact_pos):
-                    var_node = self.nodes[fact_pos]
-                    self.add_edge(var_node, onode)  # fact -> operator
-                if op.add_effects & (1 << fact_pos):
-                    var_node = self.nodes[fact_pos]
-                    self.add_edge(onode, var_node)  # operator -> fact
-
-        # set methods
+            node_type = NodeType.AND if op.pos_precons else NodeType.INIT
+            self._set_node(op.global_id, oi, node_type, ContentType.OPERATOR, op.cost)
+            # composition node
+            self._set_node(offset + oi, oi, NodeType.OR, ContentType.RECOMPOSITION)
+            self.add_edge(op.global_id, offset + oi)
+            self._add_strips_edges(op)
         for d_i, d in enumerate(model.decompositions):
-            dnode = AndOrNode(
-                d.global_id, d_i,
-                NodeType.AND,
-                weight=1,
-                content_type=ContentType.METHOD,
-                str_name=d.name
-            )
-            self.nodes[d.global_id] = dnode
-
-            dhid = d.compound_task.global_id # decomposition's head id
-            self.add_edge(dnode, self.nodes[dhid])
-
+            self._set_node(d.global_id, d_i, NodeType.AND, ContentType.METHOD, 1)
+            self.add_edge(d.global_id, d.compound_task.global_id)
             # connect methods to subtasks
             for subt in d.task_network:
-                subtnode = self.nodes[subt.global_id]
                 if isinstance(subt, Operator):
                     # if operator, connect composition node to method
-                    cnid = offset + subtnode.LOCALID
-                    cnode = self.nodes[cnid]
-                    self.add_edge(cnode, dnode)
+                    self.add_edge(offset + subt.local_id, d.global_id)
                 else:
                     # if abstract subtask, connect directly
-                    self.add_edge(subtnode, dnode)
-        
-    def to_initialize(self, model):
-        pass
-        # set total-order achievers node
-        # to_achievers = _compute_achievers_set(model)
-        # for o_id, achievers in to_achievers.items():
-        #     if -1 in achievers:
-        #         continue
-            
-        #     pred_lst = []
-        #     use_achivers = False
-        #     o = model.get_component(o_id)
-        #     for fact in o.get_precons_bitfact():
-        #         fn = self.nodes[fact]
-        #         for p in fn.predecessors:
-        #             if p.ID not in achievers: # to-achievers is less than total achievers
-        #                 use_achivers=True
-        #             else:
-        #                 pred_lst.append(p)
-        #         if use_achivers:
-        #             break
-        #     if use_achivers:
-        #         print(f'use achivers in {o.name}')
-        #         no = self.nodes[o_id]
-        #         to_no = self.nodes[components_count+no.content]
-        #         self.add_edge(to_no, operator_node)
-        #         for p in pred_lst:
-        #             print(f'\t{p.label}')
-        #             to_no.predecessors.append(p)
-        #             self.add_edge(p, to_no)
-
-    def update_bu_graph(self, state):
+                    self.add_edge(subt.global_id, d.global_id)
+
+    def state_node_types(self, state: int) -> array:
+        """Copy of node_type with the facts of `state` as INIT nodes and the other facts as OR nodes."""
+        node_type = array('b', self.node_type)
         for fact in self.model.facts:
-            fact_ao_node = self.nodes[fact.global_id]
-            if fact_ao_node.type==NodeType.INIT and ~state & (1 << fact.global_id):
-                fact_ao_node.type=NodeType.OR
-            elif state & (1 << fact.global_id):
-                fact_ao_node.type=NodeType.INIT
-    
-    def add_edge(self, nodeA, nodeB):
-        nodeA.successors.append(nodeB)
-        nodeB.predecessors.append(nodeA)
-    
-    def remove_edge(self, nodeA, nodeB):
-        nodeA.successors.remove(nodeB)
-        nodeB.predecessors.remove(nodeA)
-    
\ No newline at end of file
+            node_type[fact.global_id] = NodeType.INIT if state >> fact.global_id & 1 else NodeType.OR
+        return node_type
+
+    def generalized_dijkstra(self, use_max: bool = False, node_type: Optional[array] = None) -> List[float]:
+        """
+        Knuth's generalized Dijkstra: cost of every node, where an INIT node
+        costs its weight, an AND node its weight plus the sum (the max if
+        use_max) of its predecessors' costs and an OR node its weight plus its
+        cheapest predecessor (inf if none is reachable).
+        `node_type` replaces the graph's node types, e.g. by
+        state_node_types(state). See GeneralizedDijkstra, which also keeps
+        the costs to repair them incrementally.
+        """
+        return GeneralizedDijkstra(self, use_max=use_max, node_type=node_type).compute()
+
+
+class GeneralizedDijkstra:
+    """
+    Knuth's generalized Dijkstra over an AndOrGraph, with the costs kept so
+    that they can be repaired when some inputs change.
+
+    Each AND node keeps the sum (the max if use_max) of the costs its
+    predecessors passed on and the number of predecessors still at inf; it
+    is queued when that number drops to zero, an OR node is queued on every
+    improvement. A node passes the change of its cost to its successors when
+    it is popped (`propagated` holds what it passed last), so a decrease
+    costs O(1) per edge: the sum is adjusted by the difference, only the max
+    is rescanned when the decreased predecessor held it. Nodes are popped in
+    cost order, which requires non-negative weights.
+
+    Entry points:
+        compute()          costs from scratch (all costs must still be inf)
+        lower(queue)       the queued (cost, node) entries were lowered
+        invalidate(nodes)  the costs of `nodes` may have increased
+    `supporter[v]` is the predecessor an OR node takes its cost from (-1 if
+    none).
+    """
+    def __init__(self, graph: AndOrGraph, use_max: bool = False,
+                 weight: Optional[array] = None, node_type: Optional[array] = None):
+        self.graph = graph
+        self.use_max = use_max
+        # replaces the graph's node weights, e.g. to change the cost of methods
+        self.weight = graph.weight if weight is None else weight
+        self.node_type = array('b', graph.node_type if node_type is None else node_type)
+        inf = float('inf')
+        pred_offsets = graph.pred_offsets
+        self.cost: List[float] = [inf] * len(graph)
+        self.supporter = array('i', [-1]) * len(graph)
+        self.propagated: List[float] = [inf] * len(graph)
+        self.reached: List[float] = [0] * len(graph)
+        self.missing = array('i', (pred_offsets[v + 1] - pred_offsets[v] for v in range(len(graph))))
+        # nodes popped by the queue, statistics only
+        self.touched = 0
+
+    def compute(self) -> List[float]:
+        """Costs from the INIT nodes and the AND nodes without predecessors."""
+        cost, weight, node_type, missing = self.cost, self.weight, self.node_type, self.missing
+        queue = []
+        for v in range(len(self.graph)):
+            if node_type[v] == NodeType.INIT or (node_type[v] == NodeType.AND and missing[v] == 0):
+                cost[v] = weight[v]
+                queue.append((cost[v], v))
+        heapq.heapify(queue)
+        self.lower(queue)
+        return cost
+
+    def _max_reached(self, v: int) -> float:
+        propagated = self.propagated
+        return max((propagated[p] for p in self.graph.predecessors(v) if propagated[p] != float('inf')),
+                   default=0)
+
+    def lower(self, queue: list):
+        """
+        Dijkstra from the queued (cost, node) heap, whose costs were lowered:
+        every popped node passes its decrease to its successors, until no
+        cost can be lowered.
+        """
+        inf = float('inf')
+        cost, supporter, weight, node_type = self.cost, self.supporter, self.weight, self.node_type
+        propagated, reached, missing, use_max = self.propagated, self.reached, self.missing, self.use_max
+        succ_offsets, succ_ids = self.graph.succ_offsets, self.graph.succ_ids
+        while queue:
+            c, u = heapq.heappop(queue)
+            old = propagated[u]
+            if c > cost[u] or c >= old:
+                continue
+            propagated[u] = c
+            self.touched += 1
+            for v in succ_ids[succ_offsets[u]:succ_offsets[u + 1]]:
+                if node_type[v] == NodeType.OR:
+                    if weight[v] + c < cost[v]:
+                        cost[v] = weight[v] + c
+                        supporter[v] = u
+                        heapq.heappush(queue, (cost[v], v))
+                elif node_type[v] == NodeType.AND:
+                    if old == inf:
+                        missing[v] -= 1
+                        reached[v] = max(reached[v], c) if use_max else reached[v] + c
+                    elif not use_max:
+                        reached[v] += c - old
+                    elif old == reached[v]:
+                        reached[v] = self._max_reached(v)
+                    if missing[v] == 0 and weight[v] + reached[v] < cost[v]:
+                        cost[v] = weight[v] + reached[v]
+                        heapq.heappush(queue, (cost[v], v))
+
+    def invalidate(self, nodes: Iterable[int]):
+        """
+        The costs of `nodes` may have increased, and `nodes` includes every
+        node whose cost depended on them: resets them to inf, withdraws what
+        they passed to their AND successors, recomputes them from their
+        predecessors and lowers the graph from there.
+        """
+        inf = float('inf')
+        cost, supporter, weight, node_type = self.cost, self.supporter, self.weight, self.node_type
+        propagated, reached, missing, use_max = self.propagated, self.reached, self.missing, self.use_max
+        graph = self.graph
+        nodes = list(nodes)
+        rescan = set()
+        for u in nodes:
+            old = propagated[u]
+            cost[u] = propagated[u] = inf
+            supporter[u] = -1
+            if old == inf:
+                continue
+            for v in graph.successors(u):
+                if node_type[v] == NodeType.AND:
+                    missing[v] += 1
+                    if not use_max:
+                        reached[v] -= old
+                    elif old == reached[v]:
+                        rescan.add(v)
+        for v in rescan:
+            reached[v] = self._max_reached(v)
+
+        queue = []
+        for v in nodes:
+            if node_type[v] == NodeType.OR:
+                for p in graph.predecessors(v):
+                    if weight[v] + propagated[p] < cost[v]:
+                        cost[v] = weight[v] + propagated[p]
+                        supporter[v] = p
+            elif node_type[v] == NodeType.INIT:
+                cost[v] = weight[v]
+            elif missing[v] == 0:
+                cost[v] = weight[v] + reached[v]
+            if cost[v] < inf:
+                queue.append((cost[v], v))
+        heapq.heapify(queue)
+        self.lower(queue)
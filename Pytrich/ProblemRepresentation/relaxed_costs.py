@@ -0,0 +1,110 @@
+from array import array
+import heapq
+from typing import Iterable, Iterator, List, Optional, Set
+
+from Pytrich.model import mask_facts
+from Pytrich.ProblemRepresentation.and_or_graph import AndOrGraph, GeneralizedDijkstra, NodeType
+
+
+class RelaxedCosts(GeneralizedDijkstra):
+    """
+    Relaxed cost of every node of an AND/OR graph for a state, repaired
+    incrementally when the state changes.
+
+    Costs follow AndOrGraph.generalized_dijkstra: an INIT node costs its
+    weight, an AND node its weight plus the sum (the max if use_max) of its
+    predecessors' costs and an OR node its weight plus its cheapest
+    predecessor. Facts are INIT nodes when they hold in the state.
+
+    update(state) starts from the costs of the previous state: facts that no
+    longer hold invalidate the nodes depending on them (AND successors, OR
+    successors they support), which are recomputed from the rest of the
+    graph, then facts that now hold lower their successors (see
+    GeneralizedDijkstra). Only the nodes whose inputs changed are touched,
+    and a state equal to the previous one (e.g. method successors) costs
+    nothing.
+    """
+    def __init__(self, graph: AndOrGraph, use_max: bool = False, weight: Optional[array] = None):
+        super().__init__(graph, use_max=use_max, weight=weight)
+        self.fact_count = len(graph.model.facts)
+        self.state: Optional[int] = None
+
+    def update(self, state: int) -> List[float]:
+        """Costs of `state`, computed from scratch on the first call and repaired afterwards."""
+        if self.state is None:
+            self.state = state
+            node_type = self.node_type
+            for f in range(self.fact_count):
+                node_type[f] = NodeType.INIT if state >> f & 1 else NodeType.OR
+            return self.compute()
+        changed = self.state ^ state
+        if not changed:
+            return self.cost
+        removed = list(mask_facts(changed & self.state))
+        added = list(mask_facts(changed & state))
+        self.state = state
+        if removed:
+            self._raise(removed)
+        if added:
+            queue = []
+            for f in added:
+                self.node_type[f] = NodeType.INIT
+                self.cost[f] = self.weight[f]
+                self.supporter[f] = -1
+                queue.append((self.cost[f], f))
+            heapq.heapify(queue)
+            self.lower(queue)
+        return self.cost
+
+    def _raise(self, removed: List[int]):
+        """
+        Facts in `removed` no longer hold: invalidates them and the nodes
+        whose cost depended on them. Costs only increase, so the other
+        nodes keep theirs.
+        """
+        cost, supporter, node_type = self.cost, self.supporter, self.node_type
+        succ_offsets, succ_ids = self.graph.succ_offsets, self.graph.succ_ids
+        affected = set(removed)
+        stack = list(removed)
+        for f in removed:
+            node_type[f] = NodeType.OR
+        while stack:
+            u = stack.pop()
+            for v in succ_ids[succ_offsets[u]:succ_offsets[u + 1]]:
+                if v in affected or node_type[v] == NodeType.INIT or cost[v] == float('inf'):
+                    continue
+                if node_type[v] == NodeType.AND or supporter[v] == u:
+                    affected.add(v)
+                    stack.append(v)
+        self.invalidate(affected)
+
+    def goal_costs(self, goal_ids: Iterable[int]) -> Iterator[float]:
+        """Costs of the goal nodes, inf for ids outside the graph."""
+        cost = self.cost
+        size = len(cost)
+        for g in goal_ids:
+            yield cost[g] if 0 <= g < size else float('inf')
+
+    def relaxed_plan(self, goal_ids: Iterable[int]) -> Optional[Set[int]]:
+        """
+        Nodes of the relaxed plan of the goals: all predecessors of AND
+        nodes and the supporter of OR nodes, back to the INIT nodes.
+        Returns None if a goal is unreachable (or outside the graph).
+        """
+        node_type, supporter = self.node_type, self.supporter
+        pred_offsets, pred_ids = self.graph.pred_offsets, self.graph.pred_ids
+        plan = set()
+        stack = list(goal_ids)
+        if any(cost == float('inf') for cost in self.goal_costs(stack)):
+            return None
+        while stack:
+            v = stack.pop()
+            if v in plan:
+                continue
+            plan.add(v)
+            if node_type[v] == NodeType.AND:
+                stack.extend(pred_ids[pred_offsets[v]:pred_offsets[v + 1]])
+            elif node_type[v] == NodeType.OR and supporter[v] != -1:
+                stack.append(supporter[v])
+        return plan
+
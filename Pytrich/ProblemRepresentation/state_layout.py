@@ -0,0 +1,184 @@
+from typing import FrozenSet, List, NamedTuple, Tuple
+
+from Pytrich.model import Model, Operator, mask_facts
+
+
+def group_mask(group: List[int]) -> int:
+    mask = 0
+    for fact in group:
+        mask |= 1 << fact
+    return mask
+
+
+def _is_invariant(group_mask: int, initial_state: int, operators: List[Operator]) -> bool:
+    """
+    At most one fact of the group holds in every reachable state: it holds
+    initially, and an operator adding one fact of the group removes the
+    others (it deletes them, or it requires one and deletes that one).
+    """
+    if (initial_state & group_mask) & ((initial_state & group_mask) - 1):
+        return False
+    for o in operators:
+        added = o.add_effects & group_mask
+        if not added:
+            continue
+        if added & (added - 1):
+            return False
+        others = group_mask & ~added
+        required = o.pos_precons & group_mask
+        if required & (required - 1):
+            continue  # never applicable
+        if required:
+            if required & others & ~o.del_effects:
+                return False
+        elif others & ~o.del_effects:
+            return False
+    return True
+
+
+def invariant_mutex_groups(model: Model) -> List[List[int]]:
+    """
+    The model's mutex groups (SAS variables) of at least two facts that are
+    proven invariant against the initial state and the operators, the
+    others are ignored.
+    """
+    return [group for group in model.mutex_groups
+            if len(group) > 1 and _is_invariant(group_mask(group), model.initial_state, model.operators)]
+
+
+class PackedOperator(NamedTuple):
+    """Operator masks over a PackedStateLayout, see PackedStateLayout.compile_operator."""
+    never: bool
+    pre_mask: int
+    pre_value: int
+    neg_checks: Tuple[Tuple[int, int], ...]          # (field mask, forbidden value)
+    clear_mask: int
+    set_mask: int
+    cond_clears: Tuple[Tuple[int, FrozenSet[int]], ...]  # (field mask, values that get cleared)
+
+
+class PackedStateLayout:
+    """
+    Compact state encoding: each invariant mutex group of k facts is one
+    field of ceil(log2(k + 1)) bits holding 0 (none of the facts) or the
+    1-based position of the fact that holds; the other facts keep one bit
+    each. Requires each group to be a consecutive fact range, as PANDA
+    writes them.
+
+    Only states where every group holds at most one fact can be packed,
+    which is the case for all states reachable from the initial state.
+    """
+    def __init__(self, model: Model):
+        self.unpacked_bits = len(model.facts)
+        groups = [g for g in invariant_mutex_groups(model) if g == list(range(g[0], g[-1] + 1))]
+        group_at = {g[0]: g for g in groups}
+
+        # (source shift, source mask, target shift, field width) per segment,
+        # field width 0 for runs of facts copied bit by bit
+        self.segments: List[Tuple[int, int, int, int]] = []
+        # (field mask, shift, code) of each fact: the field holding it and its 1-based value there
+        self.field_of: List[Tuple[int, int, int]] = [(0, 0, 0)] * len(model.facts)
+        offset = 0
+        fact = 0
+        while fact < len(model.facts):
+            group = group_at.get(fact)
+            if group is not None:
+                width = len(group).bit_length()
+                self.segments.append((fact, (1 << len(group)) - 1, offset, width))
+                field_mask = ((1 << width) - 1) << offset
+                for code, f in enumerate(group, 1):
+                    self.field_of[f] = (field_mask, offset, code)
+                offset += width
+                fact += len(group)
+                continue
+            # run of facts outside the groups, copied as they are
+            end = fact
+            while end < len(model.facts) and end not in group_at:
+                self.field_of[end] = (1 << (offset + end - fact), offset + end - fact, 1)
+                end += 1
+            self.segments.append((fact, (1 << (end - fact)) - 1, offset, 0))
+            offset += end - fact
+            fact = end
+        self.packed_bits = offset
+        self.operators: List[PackedOperator] = [self.compile_operator(o) for o in model.operators]
+
+    def pack(self, state: int) -> int:
+        packed = 0
+        for source, mask, target, width in self.segments:
+            bits = (state >> source) & mask
+            if width:
+                # at most one bit set: its position + 1, 0 if none
+                bits = bits.bit_length()
+            packed |= bits << target
+        return packed
+
+    def unpack(self, packed: int) -> int:
+        state = 0
+        for source, mask, target, width in self.segments:
+            if width:
+                code = (packed >> target) & ((1 << width) - 1)
+                if code:
+                    state |= 1 << (source + code - 1)
+            else:
+                state |= ((packed >> target) & mask) << source
+        return state
+
+    def compile_operator(self, o: Operator) -> PackedOperator:
+        """
+        Precompiles an operator for packed states:
+            applicable: (s & pre_mask) == pre_value and no neg_checks field
+                        holds its forbidden value
+            apply:      (s & ~clear_mask) | set_mask, then each cond_clears
+                        field is cleared if it holds one of its values
+        A delete of a group fact is unconditional when the operator requires
+        that fact, and conditional on the current field value otherwise.
+        """
+        never = bool(o.pos_precons & o.neg_precons)
+        pre_mask = pre_value = 0
+        for f in mask_facts(o.pos_precons):
+            field_mask, shift, code = self.field_of[f]
+            if pre_mask & field_mask and (pre_value & field_mask) != code << shift:
+                never = True  # two facts of one group
+            pre_mask |= field_mask
+            pre_value |= code << shift
+
+        neg_checks = []
+        for f in mask_facts(o.neg_precons):
+            field_mask, shift, code = self.field_of[f]
+            if field_mask == 1 << shift:
+                pre_mask |= field_mask  # single bit, must be 0
+            else:
+                neg_checks.append((field_mask, code << shift))
+
+        clear_mask = set_mask = 0
+        cond_clears = {}
+        for f in mask_facts(o.del_effects & ~o.add_effects):
+            field_mask, shift, code = self.field_of[f]
+            if field_mask == 1 << shift or (pre_value & field_mask) == code << shift:
+                clear_mask |= field_mask
+            elif not pre_mask & field_mask:
+                cond_clears.setdefault(field_mask, set()).add(code << shift)
+        for f in mask_facts(o.add_effects):
+            field_mask, shift, code = self.field_of[f]
+            clear_mask |= field_mask
+            set_mask |= code << shift
+            cond_clears.pop(field_mask, None)
+        return PackedOperator(never, pre_mask, pre_value, tuple(neg_checks), clear_mask, set_mask,
+                              tuple((field_mask, frozenset(values)) for field_mask, values in cond_clears.items()))
+
+    def applicable(self, packed: int, operator_id: int) -> bool:
+        o = self.operators[operator_id]
+        if o.never or (packed & o.pre_mask) != o.pre_value:
+            return False
+        for field_mask, value in o.neg_checks:
+            if (packed & field_mask) == value:
+                return False
+        return True
+
+    def apply(self, packed: int, operator_id: int) -> int:
+        o = self.operators[operator_id]
+        packed = (packed & ~o.clear_mask) | o.set_mask
+        for field_mask, values in o.cond_clears:
+            if (packed & field_mask) in values:
+                packed &= ~field_mask
+        return packed
@@ -1,6 +1,5 @@
 
 import time
-import heapq
 import psutil
 
 from typing import Optional, Type, Union, List, Dict
@@ -10,6 +9,10 @@ from Pytrich.Heuristics.blind_heuristic import BlindHeuristic
 from Pytrich.Heuristics.heuristic import Heuristic
 from Pytrich.Heuristics.lmcount_heuristic import LandmarkCountHeuristic
 from Pytrich.Search.htn_node import AstarNode, GreedyNode, HTNNode
+from Pytrich.Search.open_list import OpenList
+from Pytrich.Search.progression import plan_length, progress_operators
+from Pytrich.Search.state_registry import StateRegistry
+from Pytrich.Search.zobrist import ZobristHash
 from Pytrich.model import Operator, AbstractTask, Model
 import Pytrich.FLAGS as FLAGS
 
@@ -18,8 +21,10 @@ def search(
         heuristic: Type[BlindHeuristic] = BlindHeuristic,
         node_type: Type[AstarNode] = AstarNode,
         n_params: Optional[Dict] = None,
-        use_early=False
-
+        use_early=False,
+        open_list='bucket',
+        lifo=False,
+        use_chain=False
     ) -> None:
     print('Staring solver')
     start_time   = time.time()
@@ -29,28 +34,31 @@ def search(
     count_revisits = 0
     seq_num        = 0
     
+    # exact (state_id, tn_id) -> g table, see StateRegistry.node_key
     closed_list = {}
+    registry = StateRegistry(model)
+    zobrist = ZobristHash(model)
     node= None
     node = node_type(None, None, None,
                      model.initial_state,
                      model.initial_tn,
                      seq_num,
+                     state_hash=zobrist.state_hash(model.initial_state),
                      **n_params)
     
     print(node.__output__())
     node.update_g_h(0, heuristic.initialize(model, node))
     print(heuristic.__output__())
-    pq = []
-    
-    heapq.heappush(pq, node)
+    pq = OpenList(open_list, lifo)
+    pq.push(node)
     memory_usage = psutil.virtual_memory().percent
     init_search_time = time.time()
     current_time = time.time()
     while pq:
         expansions += 1
-        node:HTNNode = heapq.heappop(pq)
+        node:HTNNode = pq.pop()
         # print(node.h_value, end = ' ')
-        closed_list[hash(node)]=node.g_value
+        closed_list[registry.node_key(node.state, node.state_hash, node.task_network)]=node.g_value
         # time and memory control
         if FLAGS.MONITOR_SEARCH_RESOURCES and expansions%100 == 0:
             current_time = time.time()
@@ -88,31 +96,34 @@ def search(
             break    
         elif len(node.task_network) == 0: #task network empty but goal wasnt achieved
             continue
-        task:Union[AbstractTask, Operator] = node.task_network[0]
+        task:Union[AbstractTask, Operator] = node.task_network.head
         # check if task is primitive
         if isinstance(task, Operator):
             #print(f'o', end= '  ')
-            if not task.applicable(node.state):
+            progression = progress_operators(node, zobrist, use_chain)
+            if progression is None:
                 continue
             
             seq_num += 1
-            new_state        = task.apply(node.state)
-            new_task_network = node.task_network[1:]
-            new_node         = node_type(node, task, None, new_state, new_task_network, seq_num)
+            chain, new_state, new_state_hash, new_task_network = progression
+            task  = chain[-1]
+            new_g = node.g_value+plan_length(chain)
 
-            if use_early and model.goal_reached(new_node.state, new_node.task_network):
+            if use_early and model.goal_reached(new_state, new_task_network):
                 STATUS = 'GOAL'
                 psutil.cpu_percent()
                 memory_usage = psutil.virtual_memory().percent
                 elapsed_time = current_time - start_time
                 break
 
-            try_get_node_g_val = closed_list.get(hash(new_node))
-            if try_get_node_g_val and try_get_node_g_val <= node.g_value+1:
+            try_get_node_g_val = closed_list.get(registry.lookup_key(new_state, new_state_hash, new_task_network))
+            if try_get_node_g_val is not None and try_get_node_g_val <= new_g:
                 count_revisits+=1
             else:
-                new_node.update_g_h(node.g_value+1, heuristic(node, new_node))
-                heapq.heappush(pq, new_node)
+                new_node = node_type(node, task, None, new_state, new_task_network, seq_num,
+                                     state_hash=new_state_hash, chain=chain if len(chain) > 1 else None)
+                new_node.update_g_h(new_g, heuristic(node, new_node))
+                pq.push(new_node)
             
         # otherwise its abstract
         else:
@@ -120,9 +131,8 @@ def search(
                 if not method.applicable(node.state):
                     continue
                 seq_num += 1
-                refined_task_network  = method.task_network+node.task_network[1:]
-                new_node          = node_type(node, task, method, node.state, refined_task_network, seq_num)
-                if use_early and model.goal_reached(new_node.state, new_node.task_network):
+                refined_task_network  = node.task_network.tail.prepend(method.task_network)
+                if use_early and model.goal_reached(node.state, refined_task_network):
                     STATUS = 'GOAL'
                     psutil.cpu_percent()
                     memory_usage = psutil.virtual_memory().percent
@@ -130,18 +140,19 @@ def search(
                     break 
 
 
-                try_get_node_g_val = closed_list.get(hash(new_node))
-                if try_get_node_g_val and try_get_node_g_val <= node.g_value:
+                try_get_node_g_val = closed_list.get(registry.lookup_key(node.state, node.state_hash, refined_task_network))
+                if try_get_node_g_val is not None and try_get_node_g_val <= node.g_value:
                     count_revisits+=1
                 else:
+                    new_node = node_type(node, task, method, node.state, refined_task_network, seq_num, state_hash=node.state_hash)
                     new_node.update_g_h(node.g_value, heuristic(node, new_node))
-                    heapq.heappush(pq, new_node)
+                    pq.push(new_node)
 
     
     current_time = time.time()
     elapsed_time = current_time - start_time
     nodes_second = expansions/float(current_time - init_search_time)
-    _, op_sol, goal_dist_sol = node.extract_solution()
+    _, op_sol, goal_dist_sol = node.extract_solution(model.original_subtasks)
     
     if FLAGS.LOG_SEARCH:
         desc = Descriptions()
@@ -153,3 +164,4 @@ def search(
               f"{desc('fringe_size', len(pq))}\n"
               f"Revisits Avoided: {count_revisits}\n"
               f"Used Memory: {memory_usage}%")
+        print(registry.__output__(closed_list))
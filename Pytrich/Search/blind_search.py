@@ -10,6 +10,9 @@ from Pytrich.Heuristics.heuristic import Heuristic
 from Pytrich.Heuristics.novelty_heuristic import NoveltyHeuristic
 from Pytrich.model import Operator, AbstractTask, Model, Fact, Decomposition
 from Pytrich.Search.htn_node import HTNNode
+from Pytrich.Search.progression import progress_operators
+from Pytrich.Search.state_registry import StateRegistry
+from Pytrich.Search.zobrist import ZobristHash
 from Pytrich.tools import parse_search_params
 import Pytrich.FLAGS as FLAGS
 
@@ -19,7 +22,8 @@ def search(
         node_type: Type[HTNNode] = HTNNode,
         heuristic: Heuristic = None,
         n_params: Optional[Dict] = None,
-        use_novelty=False
+        use_novelty=False,
+        use_chain=False
     ):
     print('Starting blind search')
     start_time = time.time()
@@ -30,7 +34,10 @@ def search(
     seq_num = 0
 
     closed_list = set()
-    node = node_type(None, None, None, model.initial_state, model.initial_tn, seq_num, 0)
+    registry = StateRegistry(model)
+    zobrist = ZobristHash(model)
+    node = node_type(None, None, None, model.initial_state, model.initial_tn, seq_num, 0,
+                     state_hash=zobrist.state_hash(model.initial_state))
     
     novelty=None
     if use_novelty:
@@ -78,7 +85,7 @@ def search(
                     break
 
         # Add the node to the closed list
-        closed_list.add(hash(node))
+        closed_list.add(registry.node_key(node.state, node.state_hash, node.task_network))
 
         # Check if the current node is the goal
         if model.goal_reached(node.state, node.task_network):
@@ -89,29 +96,33 @@ def search(
         elif len(node.task_network) == 0:  # Task network empty but goal wasn't achieved
             continue
 
-        task = node.task_network[0]
+        task = node.task_network.head
         # Check if task is primitive
         if isinstance(task, Operator):
-            if not task.applicable(node.state):
+            progression = progress_operators(node, zobrist, use_chain)
+            if progression is None:
                 continue
 
             seq_num += 1
-            new_state = task.apply(node.state)
-            new_task_network = node.task_network[1:]
-            new_node = node_type(node, task, None, new_state, new_task_network, seq_num, node.g_value + 1)
+            chain, new_state, new_state_hash, new_task_network = progression
+            task = chain[-1]
+            chain = chain if len(chain) > 1 else None
 
             # Eager goal detection
-            if model.goal_reached(new_node.state, new_node.task_network):
-                node = new_node  # Update node to the goal node
+            if model.goal_reached(new_state, new_task_network):
+                node = node_type(node, task, None, new_state, new_task_network, seq_num, node.g_value + 1,
+                                 state_hash=new_state_hash, chain=chain)  # Update node to the goal node
                 STATUS = 'GOAL'
                 current_time = time.time()
                 elapsed_time = current_time - start_time
                 break
 
             # Check for repeated nodes
-            if hash(new_node) in closed_list:
+            if registry.lookup_key(new_state, new_state_hash, new_task_network) in closed_list:
                 count_revisits += 1
             else:
+                new_node = node_type(node, task, None, new_state, new_task_network, seq_num, node.g_value + 1,
+                                     state_hash=new_state_hash, chain=chain)
                 if use_novelty and novelty(node, new_node) == 0:
                     novelty_queue.append(new_node)
                 else:
@@ -122,21 +133,23 @@ def search(
                 if not method.applicable(node.state):
                     continue
                 seq_num += 1
-                refined_task_network = method.task_network + node.task_network[1:]
-                new_node = node_type(node, task, method, node.state, refined_task_network, seq_num, node.g_value)
+                refined_task_network = node.task_network.tail.prepend(method.task_network)
 
                 # Eager goal detection
-                if model.goal_reached(new_node.state, new_node.task_network):
-                    node = new_node  # Update node to the goal node
+                if model.goal_reached(node.state, refined_task_network):
+                    node = node_type(node, task, method, node.state, refined_task_network, seq_num, node.g_value,
+                                     state_hash=node.state_hash)  # Update node to the goal node
                     STATUS = 'GOAL'
                     current_time = time.time()
                     elapsed_time = current_time - start_time
                     break
 
                 # Check for repeated nodes
-                if hash(new_node) in closed_list:
+                if registry.lookup_key(node.state, node.state_hash, refined_task_network) in closed_list:
                     count_revisits += 1
                 else:
+                    new_node = node_type(node, task, method, node.state, refined_task_network, seq_num, node.g_value,
+                                         state_hash=node.state_hash)
                     if use_novelty and novelty(node, new_node) == 0:
                         novelty_queue.append(new_node)
                     else:
@@ -145,7 +158,7 @@ def search(
     current_time = time.time()
     elapsed_time = current_time - start_time
     nodes_second = expansions / float(current_time - init_search_time)
-    _, op_sol, goal_dist_sol = node.extract_solution()
+    _, op_sol, goal_dist_sol = node.extract_solution(model.original_subtasks)
     fringe_size = len(queue) if not use_novelty else len(novelty_queue) + len(queue)
     if FLAGS.LOG_SEARCH:
         desc = Descriptions()
@@ -156,4 +169,5 @@ def search(
               f"{desc('nodes_expanded', expansions)}\n"
               #f"{desc('fringe_size', len(pq))}\n"
               f"Revisits Avoided: {count_revisits}\n"
-              f"Used Memory: {memory_usage}%")
\ No newline at end of file
+              f"Used Memory: {memory_usage}%")
+        print(registry.__output__(closed_list))
\ No newline at end of file
@@ -5,6 +5,9 @@ import Pytrich.FLAGS as FLAGS
 
 from Pytrich.model import Model, Operator, AbstractTask
 from Pytrich.Search.htn_node import HTNNode
+from Pytrich.Search.progression import progress_operators
+from Pytrich.Search.state_registry import StateRegistry
+from Pytrich.Search.zobrist import ZobristHash
 from Pytrich.DESCRIPTIONS import Descriptions
 
 # If your NoveltyHeuristic is in a separate module, e.g.:
@@ -17,7 +20,8 @@ def search(
     heuristic=None,
     node_type=None,
     n_params=None,
-    use_novelty: bool = False
+    use_novelty: bool = False,
+    use_chain: bool = False
 ) -> None:
     """
     Iterative DFS with a global visited set. If 'use_novelty' is True, we instantiate
@@ -38,7 +42,10 @@ def search(
 
     # Root node
     seq_num = 0
-    root = HTNNode(None, None, None, model.initial_state, model.initial_tn, seq_num)
+    registry = StateRegistry(model)
+    zobrist = ZobristHash(model)
+    root = HTNNode(None, None, None, model.initial_state, model.initial_tn, seq_num,
+                   state_hash=zobrist.state_hash(model.initial_state))
 
     # If using novelty, instantiate and initialize the "lazyft" novelty heuristic
     novelty_h = None
@@ -105,7 +112,7 @@ def search(
                 break
 
         # Check visited
-        h_node = hash(node)
+        h_node = registry.node_key(node.state, node.state_hash, node.task_network)
         if h_node in visited:
             count_revisits += 1
             continue
@@ -123,14 +130,19 @@ def search(
             continue
 
         # Expand the first task
-        task = node.task_network[0]
+        task = node.task_network.head
 
         # CASE 1: Primitive operator
         if isinstance(task, Operator):
-            if task.applicable(node.state):
-                new_state = task.apply(node.state)
-                new_tn = node.task_network[1:]
-                child = HTNNode(node, task, None, new_state, new_tn, node.g_value + 1)
+            progression = progress_operators(node, zobrist, use_chain)
+            if progression is not None:
+                chain, new_state, new_state_hash, new_tn = progression
+                # skip children that were already expanded before allocating them
+                if registry.lookup_key(new_state, new_state_hash, new_tn) in visited:
+                    count_revisits += 1
+                    continue
+                child = HTNNode(node, chain[-1], None, new_state, new_tn, node.g_value + 1,
+                                state_hash=new_state_hash, chain=chain if len(chain) > 1 else None)
 
                 if use_novelty and novelty_h(node, child)==0:
                     preferred_stack.append(child)
@@ -141,8 +153,12 @@ def search(
         else:  # AbstractTask
             for method in task.decompositions:
                 if method.applicable(node.state):
-                    refined_tn = method.task_network + node.task_network[1:]
-                    child = HTNNode(node, task, method, node.state, refined_tn, node.g_value + 1)
+                    refined_tn = node.task_network.tail.prepend(method.task_network)
+                    if registry.lookup_key(node.state, node.state_hash, refined_tn) in visited:
+                        count_revisits += 1
+                        continue
+                    child = HTNNode(node, task, method, node.state, refined_tn, node.g_value + 1,
+                                    state_hash=node.state_hash)
 
                     if use_novelty and novelty_h(node, child)==0:
                         preferred_stack.append(child)
@@ -160,7 +176,7 @@ def search(
     # Extract solution if found
     sol_size = 0
     if found_solution and solution_node:
-        _, op_sol, goal_dist_sol = solution_node.extract_solution()
+        _, op_sol, goal_dist_sol = solution_node.extract_solution(model.original_subtasks)
         sol_size = len(op_sol)
 
     # Logging
@@ -177,5 +193,6 @@ def search(
               f"{desc('fringe_size', fringe_size)}\n"
               f"Revisits Avoided: {count_revisits}\n"
               f"Used Memory: {memory_usage}%")
+        print(registry.__output__(visited))
 
     print(f"DFS finished. Status: {final_status}, expansions: {expansions}, solution size: {sol_size}")
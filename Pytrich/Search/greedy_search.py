@@ -0,0 +1,183 @@
+import time
+import psutil
+
+from typing import Optional, Type, Union, Dict
+
+from Pytrich.DESCRIPTIONS import Descriptions
+from Pytrich.Heuristics.blind_heuristic import BlindHeuristic
+from Pytrich.Search.htn_node import GreedyNode, HTNNode
+from Pytrich.Search.open_list import OpenList
+from Pytrich.Search.progression import plan_length, progress_operators
+from Pytrich.Search.state_registry import StateRegistry
+from Pytrich.Search.zobrist import ZobristHash
+from Pytrich.model import Operator, AbstractTask, Model
+import Pytrich.FLAGS as FLAGS
+
+
+def search(
+        model: Model,
+        heuristic: Type[BlindHeuristic] = BlindHeuristic,
+        node_type: Type[GreedyNode] = GreedyNode,
+        n_params: Optional[Dict] = None,
+        use_lazy=True,
+        use_preferred=False,
+        boost=1000,
+        open_list='bucket',
+        lifo=False,
+        use_chain=False
+    ) -> None:
+    """
+    Greedy best-first search, nodes are never reopened.
+
+    use_lazy: deferred evaluation, children are queued with their parent's
+        h-value and the heuristic is only computed when a node is popped.
+        Children of the root are evaluated right away, since the value
+        returned by heuristic.initialize may not have the type of later
+        evaluations (e.g. tuple-valued novelty).
+    use_preferred: successors the heuristic marks as preferred
+        (heuristic.is_preferred) are also queued in a second open list.
+        Both lists are alternated, and the preferred one gets `boost` extra
+        pops each time a new best h-value is found.
+    use_chain: apply leading runs of operators in a single step
+        (see progress_operators).
+    """
+    print('Starting greedy best-first search')
+    start_time   = time.time()
+    control_time = start_time
+    STATUS = 'UNSOLVABLE'
+    expansions      = 0
+    evaluations     = 0
+    preferred_count = 0
+    count_revisits  = 0
+    seq_num         = 0
+
+    closed_list = set()
+    registry = StateRegistry(model)
+    zobrist = ZobristHash(model)
+    node = node_type(None, None, None,
+                     model.initial_state,
+                     model.initial_tn,
+                     seq_num,
+                     state_hash=zobrist.state_hash(model.initial_state),
+                     **n_params)
+
+    print(node.__output__())
+    node.update_g_h(0, heuristic.initialize(model, node))
+    evaluations += 1
+    print(heuristic.__output__())
+    best_h = None
+
+    # queue 0 holds every successor, queue 1 only the preferred ones
+    queues = [OpenList(open_list, lifo), OpenList(open_list, lifo)] if use_preferred \
+        else [OpenList(open_list, lifo)]
+    priorities = [0] * len(queues)
+    queues[0].push(node)
+
+    memory_usage = psutil.virtual_memory().percent
+    init_search_time = time.time()
+    current_time = time.time()
+    while any(queues):
+        queue_id = min((i for i in range(len(queues)) if queues[i]), key=priorities.__getitem__)
+        priorities[queue_id] += 1
+        node: HTNNode = queues[queue_id].pop()
+
+        node_key = registry.node_key(node.state, node.state_hash, node.task_network)
+        if node_key in closed_list:
+            count_revisits += 1
+            continue
+        closed_list.add(node_key)
+
+        if use_lazy and node.parent is not None:
+            node.update_g_h(node.g_value, heuristic(node.parent, node))
+            evaluations += 1
+            if node.h_value == float('inf'):
+                continue
+
+        expansions += 1
+        if node.parent is not None and (best_h is None or node.h_value < best_h):
+            best_h = node.h_value
+            if use_preferred:
+                priorities[1] -= boost
+
+        # time and memory control
+        if FLAGS.MONITOR_SEARCH_RESOURCES and expansions%100 == 0:
+            current_time = time.time()
+            if current_time - control_time > 1:
+                control_time = current_time
+                memory_usage = psutil.virtual_memory().percent
+                elapsed_time = current_time - start_time
+                nodes_second = expansions/float(current_time - start_time)
+                print(f"(Elapsed Time: {elapsed_time:.2f} seconds, \
+                    Nodes/second: {nodes_second:.2f} n/s, h-best {best_h} \
+                    Expanded Nodes: {expansions}, \
+                    Evaluated Nodes: {evaluations}, \
+                    Fringe Size: {sum(len(q) for q in queues)} \
+                    Revists Avoided: {count_revisits}, \
+                    Used Memory: {memory_usage}")
+                psutil.cpu_percent()
+                if psutil.virtual_memory().percent > 85:
+                    STATUS = 'OUT OF MEMORY'
+                    break
+                elif current_time - start_time > 60:
+                    STATUS = 'TIMEOUT'
+                    break
+
+        if model.goal_reached(node.state, node.task_network):
+            STATUS = 'GOAL'
+            memory_usage = psutil.virtual_memory().percent
+            break
+        elif len(node.task_network) == 0:
+            continue
+
+        task: Union[AbstractTask, Operator] = node.task_network.head
+        chain = None
+        if isinstance(task, Operator):
+            progression = progress_operators(node, zobrist, use_chain)
+            if progression is None:
+                continue
+            chain, new_state, new_state_hash, new_task_network = progression
+            task  = chain[-1]
+            successors = [(None, new_state, new_state_hash, new_task_network, node.g_value+plan_length(chain))]
+            chain = chain if len(chain) > 1 else None
+        else:
+            successors = [(method, node.state, node.state_hash,
+                           node.task_network.tail.prepend(method.task_network), node.g_value)
+                          for method in task.decompositions if method.applicable(node.state)]
+
+        for method, new_state, new_state_hash, new_task_network, g_value in successors:
+            if registry.lookup_key(new_state, new_state_hash, new_task_network) in closed_list:
+                count_revisits += 1
+                continue
+            seq_num += 1
+            new_node = node_type(node, task, method, new_state, new_task_network, seq_num,
+                                 state_hash=new_state_hash, chain=chain)
+            if use_lazy and node.parent is not None:
+                new_node.update_g_h(g_value, node.h_value)
+            else:
+                new_node.update_g_h(g_value, heuristic(node, new_node))
+                evaluations += 1
+                if new_node.h_value == float('inf'):
+                    continue
+            queues[0].push(new_node)
+            if use_preferred and heuristic.is_preferred(node, new_node):
+                preferred_count += 1
+                queues[1].push(new_node)
+
+    current_time = time.time()
+    elapsed_time = current_time - start_time
+    nodes_second = expansions/float(current_time - init_search_time)
+    _, op_sol, goal_dist_sol = node.extract_solution(model.original_subtasks)
+
+    if FLAGS.LOG_SEARCH:
+        desc = Descriptions()
+        print(f"{desc('search_status', STATUS)}\n"
+              f"{desc('search_elapsed_time', elapsed_time)}\n"
+              f"{desc('nodes_per_second', nodes_second)}\n"
+              f"{desc('solution_size', len(op_sol))}\n"
+              f"{desc('nodes_expanded', expansions)}\n"
+              f"{desc('nodes_evaluated', evaluations)}\n"
+              f"{desc('preferred_successors', preferred_count)}\n"
+              f"{desc('fringe_size', sum(len(q) for q in queues))}\n"
+              f"Revisits Avoided: {count_revisits}\n"
+              f"Used Memory: {memory_usage}%")
+        print(registry.__output__(closed_list))
@@ -1,5 +1,68 @@
-from typing import List, Optional, Union
-from Pytrich.model import AbstractTask, Decomposition, Operator
+from typing import Dict, List, Optional, Union
+from Pytrich.model import AbstractTask, Decomposition, MacroOperator, Operator, TrieDecomposition
+from Pytrich.Search.task_network import TaskNetwork
+from Pytrich.Search.zobrist import node_hash
+
+
+class _TriePrefix:
+    """
+    Subtask positions opened by a method trie prefix method (see
+    _original_operators): which original method they belong to, and at
+    which offset, is only known once a leaf below the prefix is chosen.
+    """
+    __slots__ = ('labels', 'parent')
+
+    def __init__(self, parent: Optional['_TriePrefix']):
+        self.labels: List[list] = []
+        self.parent = parent
+
+
+def _original_operators(path: List['HTNNode'],
+                        original_subtasks: Dict[Optional[str], List[Optional[Operator]]]) -> Dict[int, List[Operator]]:
+    """
+    Replays the task networks along `path` (root first), labelling every
+    subtask with the method and position it comes from, and returns, by
+    id of each operator node, its applied operators as they were in the
+    original methods (see Model.original_subtasks).
+    """
+    BRANCH = -1
+    # labels [method name or _TriePrefix, position], head of the network last
+    labels = [[None, i] for i in reversed(range(len(path[0].task_network)))]
+    applied = []
+    for node in path[1:]:
+        if node.decomposition is None:
+            for operator in node.chain or (node.task,):
+                applied.append((node, operator, labels.pop()))
+            continue
+        head = labels.pop()
+        d = node.decomposition
+        size = len(d.task_network)
+        if not isinstance(d, TrieDecomposition):
+            new_labels = [[d.name, i] for i in range(size)]
+        elif d.origin is None:
+            # prefix + [branch task]
+            prefix = _TriePrefix(head[0] if head[1] == BRANCH else None)
+            prefix.labels = [[prefix, i] for i in range(size - 1)]
+            new_labels = prefix.labels + [[prefix, BRANCH]]
+        else:
+            # a leaf completes its origin's network, the prefixes above it run the rest
+            end = len(d.origin.task_network) - size
+            new_labels = [[d.origin.name, end + i] for i in range(size)]
+            prefix = head[0]
+            while prefix is not None:
+                end -= len(prefix.labels)
+                for i, label in enumerate(prefix.labels):
+                    label[0], label[1] = d.origin.name, end + i
+                prefix = prefix.parent
+        labels.extend(reversed(new_labels))
+
+    operators: Dict[int, List[Operator]] = {}
+    for node, operator, (name, position) in applied:
+        originals = original_subtasks.get(name) if not isinstance(name, _TriePrefix) else None
+        if originals and originals[position] is not None:
+            operator = originals[position]
+        operators.setdefault(id(node), []).append(operator)
+    return operators
 
 class HTNNode:
     G: Optional[int] = 1
@@ -9,16 +72,22 @@ class HTNNode:
                  task: Union[Operator, AbstractTask],
                  decomposition: Optional[Decomposition],
                  state: Union[int, set],
-                 task_network: List[Union[Operator, AbstractTask]],
+                 task_network: Union[TaskNetwork, List[Union[Operator, AbstractTask]]],
                  seq_num: int,
                  H: Optional[float] = None,
-                 G: Optional[float] = None):
+                 G: Optional[float] = None,
+                 state_hash: Optional[int] = None,
+                 chain: Optional[List[Operator]] = None):
         # HTN info
         self.state = state
         self.parent = parent
         self.task = task
         self.decomposition = decomposition
-        self.task_network: List[Union[Operator, AbstractTask]] = task_network
+        # operators applied in one step to reach this node (task is the last one), see progress_operators
+        self.chain = chain
+        if not isinstance(task_network, TaskNetwork):
+            task_network = TaskNetwork.from_list(task_network)
+        self.task_network: TaskNetwork = task_network
         
         # Node value info
         self.seq_num  = seq_num
@@ -30,29 +99,51 @@ class HTNNode:
             HTNNode.H = H
         # Heursitics info
         self.lm_node = None # for landmarks
-        # NOTE: only use if we search considering visited nodes -high computational cost
-        self.hash_node = hash((self.state, tuple(task_network)))
+        self.tdg_value = None # for TDG: (finite sum, infinite count) of the task network
+        self.preferred = None # for h_FF: global ids of the successors in the relaxed plan
+        # Zobrist key of the state, derived incrementally by the search (see ZobristHash)
+        self.state_hash = state_hash if state_hash is not None else hash(state)
+        self.hash_node = node_hash(self.state_hash, self.task_network)
 
         
     def update_g_h(self, g_value, h_value):
         self.h_value = h_value
         self.g_value = g_value
     
-    def extract_solution(self):
+    def extract_solution(self, original_subtasks: Optional[Dict[Optional[str], List[Optional[Operator]]]] = None):
         """
         Returns the list of actions that were applied from the initial node to
         the goal node.
+        With `original_subtasks` (Model.original_subtasks) operators merged by
+        duplicate elimination are reported as the operator the method had.
         """
         plan_path = []
         goal_dist = []
         operators = []
+        original = None
+        if original_subtasks:
+            path = [self]
+            while path[-1].parent is not None:
+                path.append(path[-1].parent)
+            original = _original_operators(path[::-1], original_subtasks)
         while self.parent is not None:
-            goal_dist.append(self.task)
-            plan_path.append(self.task)
-            if isinstance(self.task, Operator) and self.task.cost!=0:
-                operators.append(self.task)
+            if original is not None and self.decomposition is None:
+                tasks = reversed(original[id(self)])
             else:
-                plan_path.append(self.decomposition)
+                tasks = reversed(self.chain) if self.chain else (self.task,)
+            for task in tasks:
+                goal_dist.append(task)
+                plan_path.append(task)
+                if isinstance(task, MacroOperator):
+                    operators.extend(o for o in reversed(task.expand()) if o.cost!=0)
+                elif isinstance(task, Operator) and task.cost!=0:
+                    operators.append(task)
+                elif isinstance(self.decomposition, TrieDecomposition):
+                    # trie methods stand for the original method of their leaf
+                    if self.decomposition.origin is not None:
+                        plan_path.append(self.decomposition.origin)
+                else:
+                    plan_path.append(self.decomposition)
 
             self = self.parent
         plan_path.reverse()
@@ -94,6 +185,9 @@ class GreedyNode(HTNNode):
     def __lt__(self, other):
         return (self.h_value, self.g_value) < (other.h_value, other.g_value)
 
+    def open_key(self):
+        return self.h_value, self.g_value
+
 
 class AstarNode(HTNNode):
     def __lt__(self, other):
@@ -106,6 +200,10 @@ class AstarNode(HTNNode):
                 other.h_value, \
                 other.seq_num)
 
+    def open_key(self):
+        # same order as __lt__, seq_num ties are left to the open list
+        return self.g_value*HTNNode.G + self.h_value*HTNNode.H, self.h_value
+
 
 class TiebreakingNode(HTNNode):
     def __lt__(self, other):
@@ -118,5 +216,10 @@ class TiebreakingNode(HTNNode):
                 other.h_value, \
                 other.seq_num)
 
+    def open_key(self):
+        # the root may be initialized with a scalar value
+        h_value = self.h_value if isinstance(self.h_value, tuple) else (self.h_value,)
+        return self.g_value*HTNNode.G + h_value[0]*HTNNode.H, h_value
+
 
     
\ No newline at end of file
@@ -0,0 +1,162 @@
+import heapq
+import math
+from collections import deque
+from typing import List, Optional
+
+from Pytrich.Search.htn_node import HTNNode
+
+
+class BucketOpenList:
+    """
+    Two-level bucket queue over integer keys (key1, key2), as returned by
+    `node.open_key()`: buckets[key1][key2] is a deque of nodes, popped FIFO
+    or LIFO. Push is O(1); pop is O(1) amortized, the minimum pointers only
+    move back when a smaller key is pushed.
+
+    Nodes with an infinite key (dead ends for most heuristics) are kept
+    apart and only popped once every finite bucket is empty.
+    """
+    def __init__(self, lifo: bool = False):
+        self.lifo = lifo
+        self.buckets: List[Optional[_KeyBuckets]] = []
+        self.min_key = 0
+        self.size = 0
+        self.infinite = deque()
+
+    def accepts(self, key1, key2) -> bool:
+        return type(key1) is int and type(key2) is int and key1 >= 0 and key2 >= 0
+
+    def push(self, node: HTNNode, key1, key2):
+        if key1 == math.inf or key2 == math.inf:
+            self.infinite.append(node)
+            return
+        buckets = self.buckets
+        if key1 >= len(buckets):
+            buckets.extend([None] * (key1 + 1 - len(buckets)))
+        inner = buckets[key1]
+        if inner is None:
+            inner = buckets[key1] = _KeyBuckets()
+        inner.push(node, key2)
+        if self.size == 0 or key1 < self.min_key:
+            self.min_key = key1
+        self.size += 1
+
+    def pop(self) -> HTNNode:
+        if self.size == 0:
+            return self.infinite.pop() if self.lifo else self.infinite.popleft()
+        buckets = self.buckets
+        key1 = self.min_key
+        while buckets[key1] is None or buckets[key1].size == 0:
+            key1 += 1
+        self.min_key = key1
+        self.size -= 1
+        return buckets[key1].pop(self.lifo)
+
+    def __len__(self):
+        return self.size + len(self.infinite)
+
+
+class _KeyBuckets:
+    __slots__ = ('queues', 'min_key', 'size')
+
+    def __init__(self):
+        self.queues: List[Optional[deque]] = []
+        self.min_key = 0
+        self.size = 0
+
+    def push(self, node, key):
+        queues = self.queues
+        if key >= len(queues):
+            queues.extend([None] * (key + 1 - len(queues)))
+        queue = queues[key]
+        if queue is None:
+            queue = queues[key] = deque()
+        queue.append(node)
+        if self.size == 0 or key < self.min_key:
+            self.min_key = key
+        self.size += 1
+
+    def pop(self, lifo):
+        queues = self.queues
+        key = self.min_key
+        while not queues[key]:
+            key += 1
+        self.min_key = key
+        self.size -= 1
+        return queues[key].pop() if lifo else queues[key].popleft()
+
+
+class HeapOpenList:
+    """
+    Binary heap over packed (key1, key2, seq, node) tuples. The insertion
+    counter `seq` breaks ties (FIFO, or LIFO when negated), so nodes are
+    never compared and no `__lt__` is called. Used for keys the bucket
+    queue cannot index: fractional costs or tuple-valued heuristics.
+    """
+    def __init__(self, lifo: bool = False):
+        self.lifo = lifo
+        self.heap = []
+        self.counter = 0
+
+    def accepts(self, key1, key2) -> bool:
+        return True
+
+    def push(self, node: HTNNode, key1, key2):
+        self.counter += 1
+        seq = -self.counter if self.lifo else self.counter
+        heapq.heappush(self.heap, (key1, key2, seq, node))
+
+    def pop(self) -> HTNNode:
+        return heapq.heappop(self.heap)[3]
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class OpenList:
+    """
+    Open list used by the best-first searches. Nodes are ordered by
+    `node.open_key()` (see AstarNode, GreedyNode, TiebreakingNode), ties are
+    broken by insertion order.
+
+    It starts as a BucketOpenList and migrates to a HeapOpenList, keeping the
+    current pop order, the first time a key the buckets cannot index is
+    pushed (e.g. UCP landmark costs or aggregated tuple values).
+    open_list="heap" uses the heap from the start.
+    """
+    def __init__(self, open_list: str = 'bucket', lifo: bool = False):
+        if open_list not in ('bucket', 'heap'):
+            raise ValueError(f'Unknown open list: {open_list}')
+        self.lifo = lifo
+        self.impl = BucketOpenList(lifo) if open_list == 'bucket' else HeapOpenList(lifo)
+
+    def push(self, node: HTNNode):
+        key1, key2 = node.open_key()
+        if not self.impl.accepts(key1, key2) and key1 != math.inf and key2 != math.inf:
+            self._migrate()
+        self.impl.push(node, key1, key2)
+
+    def pop(self) -> HTNNode:
+        return self.impl.pop()
+
+    def _migrate(self):
+        """
+        Moves every node into a heap; drained nodes get increasing sequence
+        numbers below any later push, so their relative order is preserved.
+        """
+        buckets = self.impl
+        heap = HeapOpenList(self.lifo)
+        n = len(buckets)
+        for i in range(n):
+            node = buckets.pop()
+            key1, key2 = node.open_key()
+            heap.heap.append((key1, key2, i - n if self.lifo else i, node))
+        heapq.heapify(heap.heap)
+        heap.counter = n
+        self.impl = heap
+
+    def __len__(self):
+        return len(self.impl)
+
+    def __bool__(self):
+        return len(self.impl) > 0
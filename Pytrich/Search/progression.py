@@ -0,0 +1,42 @@
+from typing import List, Optional, Tuple
+
+from Pytrich.Search.htn_node import HTNNode
+from Pytrich.Search.task_network import TaskNetwork
+from Pytrich.Search.zobrist import ZobristHash
+from Pytrich.model import MacroOperator, Operator
+
+
+def progress_operators(node: HTNNode, zobrist: ZobristHash, use_chain: bool = False) \
+        -> Optional[Tuple[List[Operator], int, int, TaskNetwork]]:
+    """
+    Progresses the operator at the head of node's task network.
+
+    With use_chain the maximal leading run of operators is applied in a
+    single step: none of them branches, so the intermediate nodes are never
+    created (nor hashed, looked up or evaluated). The successor keeps the
+    applied run in `node.chain` and extract_solution expands it.
+
+    Returns (chain, new_state, new_state_hash, new_task_network), or None if
+    an operator along the run is not applicable.
+    """
+    chain = []
+    state = node.state
+    tn = node.task_network
+    while True:
+        operator = tn.head
+        if not operator.applicable(state):
+            return None
+        state = operator.apply(state)
+        chain.append(operator)
+        tn = tn.tail
+        if not use_chain or not tn.size or not isinstance(tn.head, Operator):
+            break
+    return chain, state, zobrist.apply(node.state_hash, node.state, state), tn
+
+
+def plan_length(chain: List[Operator]) -> int:
+    """
+    Number of original operators in chain, macro operators count as the
+    operators they were compiled from.
+    """
+    return sum(len(o.expand()) if isinstance(o, MacroOperator) else 1 for o in chain)
@@ -5,6 +5,9 @@ import Pytrich.FLAGS as FLAGS
 
 from Pytrich.model import Model, Operator, AbstractTask
 from Pytrich.Search.htn_node import HTNNode
+from Pytrich.Search.progression import progress_operators
+from Pytrich.Search.state_registry import StateRegistry
+from Pytrich.Search.zobrist import ZobristHash
 from Pytrich.DESCRIPTIONS import Descriptions
 from Pytrich.Heuristics.novelty_heuristic import NoveltyHeuristic
 import sys
@@ -15,7 +18,8 @@ def search(
     heuristic=None,
     node_type=None,
     n_params=None,
-    use_novelty: bool = False
+    use_novelty: bool = False,
+    use_chain: bool = False
 ) -> None:
     """
     Recursive DFS for HTN planning.
@@ -41,7 +45,10 @@ def search(
     
     # Create root node using positional arguments only
     seq_num = 0
-    root = HTNNode(None, None, None, model.initial_state, model.initial_tn, seq_num)
+    registry = StateRegistry(model)
+    zobrist = ZobristHash(model)
+    root = HTNNode(None, None, None, model.initial_state, model.initial_tn, seq_num,
+                   state_hash=zobrist.state_hash(model.initial_state))
     
     # If novelty is enabled, instantiate and initialize the novelty heuristic
     novelty_h = None
@@ -77,7 +84,7 @@ def search(
                 return status
 
         # Cycle detection: if already in the current recursion path, skip
-        h_node = hash(node)
+        h_node = registry.node_key(node.state, node.state_hash, node.task_network)
         if h_node in in_path:
             count_revisits += 1
             return None
@@ -96,21 +103,30 @@ def search(
             return None
 
         # Expand the first task
-        task = node.task_network[0]
+        task = node.task_network.head
         children: List[HTNNode] = []
         # CASE 1: Primitive operator
         if isinstance(task, Operator):
-            if task.applicable(node.state):
-                new_state = task.apply(node.state)
-                new_tn = node.task_network[1:]
-                child = HTNNode(node, task, None, new_state, new_tn, node.g_value + 1)
-                children.append(child)
+            progression = progress_operators(node, zobrist, use_chain)
+            if progression is not None:
+                chain, new_state, new_state_hash, new_tn = progression
+                # skip children already on the path before allocating them
+                if registry.lookup_key(new_state, new_state_hash, new_tn) in in_path:
+                    count_revisits += 1
+                else:
+                    child = HTNNode(node, chain[-1], None, new_state, new_tn, node.g_value + 1,
+                                    state_hash=new_state_hash, chain=chain if len(chain) > 1 else None)
+                    children.append(child)
         # CASE 2: Abstract Task: expand each applicable method
         else:
             for method in task.decompositions:
                 if method.applicable(node.state):
-                    refined_tn = method.task_network + node.task_network[1:]
-                    child = HTNNode(node, task, method, node.state, refined_tn, node.g_value + 1)
+                    refined_tn = node.task_network.tail.prepend(method.task_network)
+                    if registry.lookup_key(node.state, node.state_hash, refined_tn) in in_path:
+                        count_revisits += 1
+                        continue
+                    child = HTNNode(node, task, method, node.state, refined_tn, node.g_value + 1,
+                                    state_hash=node.state_hash)
                     children.append(child)
         
         # Partition children into "novel" and "remaining" if novelty is used.
@@ -145,7 +161,7 @@ def search(
     final_status = "GOAL" if found_solution[0] else (result if result in ["OUT OF MEMORY", "TIMEOUT"] else "UNSOLVABLE")
     sol_size = 0
     if found_solution[0] and solution_node[0] is not None:
-        _, op_sol, goal_dist_sol = solution_node[0].extract_solution()
+        _, op_sol, goal_dist_sol = solution_node[0].extract_solution(model.original_subtasks)
         sol_size = len(op_sol)
 
     if FLAGS.LOG_SEARCH:
@@ -160,5 +176,6 @@ def search(
               f"{desc('fringe_size', 0)}\n"  # fringe size is 0 for recursive DFS
               f"Revisits Avoided: {count_revisits}\n"
               f"Used Memory: {memory_usage}%")
+        print(registry.__output__(in_path))
     print(f"Recursive DFS finished. Status: {final_status}, expansions: {expansions}, solution size: {sol_size}")
 
@@ -0,0 +1,171 @@
+import sys
+from typing import Dict, List, Optional
+
+from Pytrich.DESCRIPTIONS import Descriptions
+import Pytrich.FLAGS as FLAGS
+from Pytrich.model import Model
+from Pytrich.ProblemRepresentation.state_layout import PackedStateLayout
+from Pytrich.Search.task_network import TaskNetwork
+from Pytrich.Search.zobrist import MASK64
+
+# odd step used to probe the next slot when two states share a Zobrist key
+PROBE_STEP = 0x9E3779B97F4A7C15
+# bits reserved for the task network id inside a closed-list key
+TN_ID_BITS = 32
+
+
+class StateRegistry:
+    """
+    Interns the states and task networks reached by a search and gives each
+    distinct one a dense integer id (in the spirit of Fast Downward's
+    StateRegistry).
+
+    - States are stored once in `states`; the slot table is keyed by the
+      state's Zobrist key and every hit is verified against the stored
+      state, colliding keys are resolved by probing, so ids are exact.
+    - Task networks are hash-consed cell by cell: a suffix is identified by
+      (head.global_id, id of its tail), so networks sharing a suffix share
+      its ids and interning a successor only visits its new cells. The id
+      is cached on the cell (TaskNetwork.tn_id).
+
+    A search node is then identified by `node_key`, a single int packing
+    (state_id, tn_id), which is what the closed lists store. Task network
+    ids and global ids must fit in TN_ID_BITS, an OverflowError is raised
+    otherwise instead of letting keys alias. `lookup_key` finds the key of
+    a node without interning it, for duplicate checks on generated children
+    that may never be expanded.
+
+    With FLAGS.PACKED_STATES the stored states use the model's
+    PackedStateLayout (one field per SAS variable instead of one bit per
+    fact). A state is packed once, when it is interned or when a probed slot
+    has to be compared, and probes that hit an empty slot pack nothing; the
+    search itself keeps working on unpacked states.
+    """
+    def __init__(self, model: Optional[Model] = None):
+        if model is not None and len(model.components) >> TN_ID_BITS:
+            raise OverflowError(f'global ids do not fit in {TN_ID_BITS} bits')
+        self.layout: Optional[PackedStateLayout] = \
+            PackedStateLayout(model) if FLAGS.PACKED_STATES and model is not None else None
+        self.states: List[int] = []
+        self._state_slots: Dict[int, int] = {}
+        self._tn_cells: Dict[int, int] = {}
+        self.state_collisions = 0
+
+    def state_id(self, state: int, state_hash: int) -> int:
+        states = self.states
+        slots = self._state_slots
+        layout = self.layout
+        stored = None
+        key = state_hash
+        while True:
+            sid = slots.get(key)
+            if sid is None:
+                if stored is None:
+                    stored = layout.pack(state) if layout is not None else state
+                sid = len(states)
+                states.append(stored)
+                slots[key] = sid
+                return sid
+            if stored is None:
+                stored = layout.pack(state) if layout is not None else state
+            if states[sid] == stored:
+                return sid
+            self.state_collisions += 1
+            key = (key + PROBE_STEP) & MASK64
+
+    def tn_id(self, task_network: TaskNetwork) -> int:
+        tn = task_network
+        if tn.tn_id >= 0:
+            return tn.tn_id
+        pending = []
+        while tn.tn_id < 0:
+            pending.append(tn)
+            tn = tn.tail
+        cells = self._tn_cells
+        tail_id = tn.tn_id
+        for cell in reversed(pending):
+            key = (tail_id << TN_ID_BITS) | cell.head.global_id
+            cell_id = cells.get(key)
+            if cell_id is None:
+                cell_id = len(cells) + 1
+                if cell_id >> TN_ID_BITS:
+                    raise OverflowError(f'task network ids do not fit in {TN_ID_BITS} bits')
+                cells[key] = cell_id
+            cell.tn_id = tail_id = cell_id
+        return tail_id
+
+    def node_key(self, state: int, state_hash: int, task_network: TaskNetwork) -> int:
+        return (self.state_id(state, state_hash) << TN_ID_BITS) | self.tn_id(task_network)
+
+    def lookup_key(self, state: int, state_hash: int, task_network: TaskNetwork) -> Optional[int]:
+        """
+        node_key of a node whose state and task network are already
+        interned, None otherwise (then no closed list can contain it).
+        Nothing is added to the registry.
+        """
+        tn = task_network
+        pending = []
+        while tn.tn_id < 0:
+            pending.append(tn)
+            tn = tn.tail
+        tail_id = tn.tn_id
+        for cell in reversed(pending):
+            tail_id = self._tn_cells.get((tail_id << TN_ID_BITS) | cell.head.global_id)
+            if tail_id is None:
+                return None
+            cell.tn_id = tail_id
+        stored = None
+        key = state_hash
+        while True:
+            sid = self._state_slots.get(key)
+            if sid is None:
+                return None
+            if stored is None:
+                stored = self.layout.pack(state) if self.layout is not None else state
+            if self.states[sid] == stored:
+                return (sid << TN_ID_BITS) | tail_id
+            key = (key + PROBE_STEP) & MASK64
+
+    def memory_stats(self, closed_list) -> Dict[str, float]:
+        """
+        Bytes used by the registry and by the closed list built on top of it.
+        `closed_list` is the set or dict of node keys kept by the search.
+        """
+        state_bytes = _container_bytes(self.states)
+        registry_bytes = state_bytes + _container_bytes(self._state_slots) + _container_bytes(self._tn_cells)
+        closed_bytes = _container_bytes(closed_list)
+        entries = len(closed_list)
+        return {
+            'registered_states': len(self.states),
+            'registered_tn_cells': len(self._tn_cells),
+            'state_collisions': self.state_collisions,
+            'state_bytes': state_bytes,
+            'closed_entries': entries,
+            'registry_bytes': registry_bytes,
+            'closed_bytes': closed_bytes,
+            'bytes_per_entry': (registry_bytes + closed_bytes) / entries if entries else 0.0,
+        }
+
+    def __output__(self, closed_list):
+        desc = Descriptions()
+        stats = self.memory_stats(closed_list)
+        out_str = f'{desc("registered_states", stats["registered_states"])}\n'
+        if self.layout is not None:
+            out_str += f'{desc("state_bits", f"{self.layout.unpacked_bits} to {self.layout.packed_bits}")}\n'
+        out_str += f'{desc("state_bytes", stats["state_bytes"])}\n'
+        out_str += f'{desc("registered_tn_cells", stats["registered_tn_cells"])}\n'
+        out_str += f'{desc("state_collisions", stats["state_collisions"])}\n'
+        out_str += f'{desc("closed_entries", stats["closed_entries"])}\n'
+        out_str += f'{desc("closed_bytes_per_entry", stats["bytes_per_entry"])}'
+        return out_str
+
+
+def _container_bytes(container) -> int:
+    size = sys.getsizeof(container)
+    if isinstance(container, dict):
+        for key, value in container.items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+    else:
+        for item in container:
+            size += sys.getsizeof(item)
+    return size
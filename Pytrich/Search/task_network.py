@@ -0,0 +1,109 @@
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Union
+
+from Pytrich.model import AbstractTask, Operator
+from Pytrich.Search.zobrist import suffix_hash
+
+
+class TaskNetwork:
+    """
+    Immutable task network stored as a cons-list.
+
+    Each cell holds the first task (head) and the remaining network (tail),
+    so successors share the suffix of their parent's network:
+        - progressing the head is O(1): the child network is `tn.tail`
+        - a decomposition only allocates one cell per subtask of the method:
+            `tn.tail.prepend(method.task_network)`
+    The empty network is the cell with size 0 (`TaskNetwork.EMPTY`).
+
+    Every cell also stores the 64-bit polynomial hash of the suffix it starts,
+    composed from the head's key and the tail's hash (see suffix_hash), so
+    hashing a new network costs one step per allocated cell and never
+    rehashes the shared suffix.
+    `tn_id` caches the id given to the suffix by a StateRegistry (-1 until
+    the cell is interned, 0 for the empty network).
+    """
+    __slots__ = ('head', 'tail', 'size', 'hash_value', 'tn_id')
+    EMPTY: 'TaskNetwork' = None
+
+    def __init__(self, head: Optional[Union[Operator, AbstractTask]] = None,
+                 tail: Optional['TaskNetwork'] = None):
+        self.head = head
+        self.tail = tail
+        self.tn_id: int = -1
+        if tail is not None:
+            self.size: int = tail.size + 1
+            self.hash_value: int = suffix_hash(head.global_id, tail.hash_value)
+        else:
+            self.size = 0
+            self.hash_value = 0
+
+    @staticmethod
+    def from_list(tasks: Iterable[Union[Operator, AbstractTask]]) -> 'TaskNetwork':
+        return TaskNetwork.EMPTY.prepend(tasks)
+
+    def prepend(self, tasks: Iterable[Union[Operator, AbstractTask]]) -> 'TaskNetwork':
+        """
+        Returns the network `tasks + self`, sharing self as the suffix.
+        """
+        if not isinstance(tasks, (list, tuple)):
+            tasks = list(tasks)
+        tn = self
+        for task in reversed(tasks):
+            tn = TaskNetwork(task, tn)
+        return tn
+
+    def to_list(self) -> List[Union[Operator, AbstractTask]]:
+        return list(self)
+
+    def __iter__(self) -> Iterator[Union[Operator, AbstractTask]]:
+        tn = self
+        while tn.size:
+            yield tn.head
+            tn = tn.tail
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.size)
+            if step < 0:
+                return list(self)[index]
+            return list(islice(self, start, max(start, stop), step))
+        if index == 0 and self.size:
+            return self.head
+        if index < 0:
+            index += self.size
+        if index < 0 or index >= self.size:
+            raise IndexError('task network index out of range')
+        return next(islice(self, index, None))
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, TaskNetwork):
+            return list(self) == other
+        if self.size != other.size or self.hash_value != other.hash_value:
+            return False
+        a, b = self, other
+        while a.size:
+            if a is b:
+                return True
+            if a.head != b.head:
+                return False
+            a, b = a.tail, b.tail
+        return True
+
+    def __hash__(self):
+        return self.hash_value
+
+    def __repr__(self):
+        return f"<TN {self[0:min(5, self.size)]}{'...' if self.size > 5 else ''}>"
+
+
+TaskNetwork.EMPTY = TaskNetwork()
+TaskNetwork.EMPTY.tn_id = 0
@@ -0,0 +1,65 @@
+import random
+
+from Pytrich.model import Model
+
+MASK64 = (1 << 64) - 1
+# odd multiplier of the polynomial task network hash
+TN_BASE = 0x9E3779B97F4A7C15
+
+
+def task_key(global_id: int) -> int:
+    """Random-looking 64-bit key of a task (splitmix64 of its global id)."""
+    z = (global_id + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def suffix_hash(global_id: int, tail_hash: int) -> int:
+    """
+    Polynomial hash of the network `task + tail` from the hash of tail:
+        h(t1..tn) = key(t1) + B*key(t2) + ... + B^(n-1)*key(tn)  (mod 2^64)
+    Task keys do not depend on the position, which only enters through the
+    powers of B, so a network's hash is composed from its suffix's hash in
+    one step per prepended task.
+    """
+    return (task_key(global_id) + TN_BASE * tail_hash) & MASK64
+
+
+def node_hash(state_hash: int, task_network) -> int:
+    """
+    Combines the Zobrist key of a state with the suffix hash stored in the
+    first cell of the task network (see TaskNetwork.hash_value).
+    """
+    return state_hash ^ task_network.hash_value
+
+
+class ZobristHash:
+    """
+    Incremental 64-bit Zobrist hashing of states.
+
+    Each fact gets a random 64-bit key and the hash of a state is the XOR of
+    the keys of its true facts. A successor's hash is derived from its
+    parent's by XORing the keys of the facts that changed, so the cost is
+    O(|effects|) instead of O(|state|).
+    """
+    def __init__(self, model: Model, seed: int = 42):
+        rng = random.Random(seed)
+        self.fact_keys = [rng.getrandbits(64) for _ in range(len(model.facts))]
+
+    def state_hash(self, state: int) -> int:
+        return self.apply(0, 0, state)
+
+    def apply(self, state_hash: int, state: int, new_state: int) -> int:
+        """
+        Hash of `new_state` given the hash of `state`. Only facts in the
+        symmetric difference (a subset of the applied add/delete effects)
+        are visited.
+        """
+        changed = state ^ new_state
+        fact_keys = self.fact_keys
+        while changed:
+            low_bit = changed & -changed
+            state_hash ^= fact_keys[low_bit.bit_length() - 1]
+            changed ^= low_bit
+        return state_hash
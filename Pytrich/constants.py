@@ -3,6 +3,8 @@ from Pytrich.Heuristics.tdg_heuristic import TaskDecompositionHeuristic
 from Pytrich.Heuristics.lmcount_heuristic import LandmarkCountHeuristic
 from Pytrich.Heuristics.novelty_heuristic import NoveltyHeuristic
 from Pytrich.Heuristics.hmax_heuristic import HmaxHeuristic
+from Pytrich.Heuristics.relaxed_heuristic import AdditiveHeuristic, FFHeuristic
+from Pytrich.Heuristics.lmcut_heuristic import LMCutHeuristic
 from Pytrich.Heuristics.aggregation import Max, Tiebreaking
 
 HEURISTICS = {
@@ -11,6 +13,9 @@ HEURISTICS = {
     "TDG": TaskDecompositionHeuristic,
     "NOVELTY": NoveltyHeuristic,
     "HMAX": HmaxHeuristic,
+    "HADD": AdditiveHeuristic,
+    "HFF": FFHeuristic,
+    "LMCUT": LMCutHeuristic,
 }
 
 AGGREGATIONS = {
@@ -1,22 +1,30 @@
 import sys
-from typing import List, Union
+from typing import Dict, List, Optional, Union
 
 from Pytrich.DESCRIPTIONS import Descriptions
 
+
+def mask_facts(mask: int):
+    """Ids of the bits set in mask (facts of a state, or any id bitset), lowest first."""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
 class Fact:
+    __slots__ = ('name', 'global_id', 'local_id')
+
     def __init__(self, name, local_id, global_id):
         self.name = name
-        self.hash_name = hash(name)
         self.global_id:int = global_id
         self.local_id:int  = local_id
     
     def __eq__(self, other):
-        return (
-            self.name == other.name
-        )
+        return self is other or self.name == other.name
 
     def __hash__(self):
-        return  self.hash_name
+        return hash(self.name)
 
     def __str__(self):
         return f"F({self.name} ({self.global_id}))"
@@ -25,9 +33,11 @@ class Fact:
         return f"<F{self.global_id}:{self.name} >"
 
 class Operator:
+    __slots__ = ('name', 'global_id', 'local_id', 'cost',
+                 'pos_precons', 'neg_precons', 'add_effects', 'del_effects')
+
     def __init__(self, global_id, local_id, name, cost, pos_precons, neg_precons, add_effects, del_effects):
         self.name = name
-        self.hash_name = hash(name)
         self.global_id:int = global_id
         self.local_id:int  = local_id
 
@@ -67,12 +77,10 @@ class Operator:
             i += 1
 
     def __eq__(self, other):
-        return (
-            self.name == other.name
-        )
+        return self is other or self.name == other.name
 
     def __hash__(self):
-        return  self.hash_name
+        return hash(self.name)
 
     def __str__(self):
         return f"OP({self.name} {bin(self.pos_precons)} {bin(self.neg_precons)})"
@@ -80,28 +88,49 @@ class Operator:
     def __repr__(self):
         return f"<Op {self.global_id}:{self.name} >"
 
+class MacroOperator(Operator):
+    """
+    Sequence of operators compiled into a single operator
+    (see PostProcessing/macro_compilation.py). `operators` keeps the original
+    operators so plans can be expanded back.
+    """
+    __slots__ = ('operators',)
+
+    def __init__(self, global_id, local_id, operators: List[Operator],
+                 pos_precons, neg_precons, add_effects, del_effects):
+        name = 'macro[' + ';'.join(o.name for o in operators) + ']'
+        super().__init__(global_id, local_id, name, sum(o.cost for o in operators),
+                         pos_precons, neg_precons, add_effects, del_effects)
+        self.operators: List[Operator] = operators
+
+    def expand(self) -> List[Operator]:
+        return self.operators
+
 class AbstractTask:
+    __slots__ = ('name', 'decompositions', 'global_id', 'local_id')
+
     def __init__(self, global_id, local_id, decompositions, name):
         self.name = name
-        self.hash_name = hash(name)
         self.decompositions: List[Decomposition] = decompositions
         self.global_id:int = global_id
         self.local_id:int  = local_id
         
     def __eq__(self, other):
-        return self.name == other.name
+        return self is other or self.name == other.name
     
     def __str__(self):
         return f'GT({self.name} arity {len(self.decompositions)})'
     def __repr__(self):
         return f'<Gt %s>' % self.name
     def __hash__(self):
-        return hash(self.hash_name)
+        return hash(self.name)
 
 class Decomposition:
+    __slots__ = ('name', 'global_id', 'local_id', 'compound_task', 'task_network',
+                 'pos_precons', 'neg_precons')
+
     def __init__(self, name, global_id, local_id, pos_precons, neg_precons, compound_task, task_network):
         self.name = name
-        self.hash_name = hash(name)
         self.global_id:int = global_id
         self.local_id:int  = local_id
 
@@ -115,10 +144,10 @@ class Decomposition:
                ((state_bitwise & self.neg_precons) == 0)
 
     def __eq__(self, other):
-        return self.name == other.name
+        return self is other or self.name == other.name
     
     def __hash__(self):
-        return self.hash_name
+        return hash(self.name)
     
     def __repr__(self):
         return f"<D {self.name} {self.task_network} >"
@@ -128,7 +157,20 @@ class Decomposition:
         s += f"\tDecomposed Task: {self.compound_task}\n"
         s += f"\tTask Network: {self.task_network[0:min(5, len(self.task_network))]}\n"
         return s
-    
+
+class TrieDecomposition(Decomposition):
+    """
+    Method introduced by factoring shared method prefixes
+    (see PostProcessing/method_trie.py). `origin` is the original method a
+    leaf completes, None for methods ending in a branch point.
+    """
+    __slots__ = ('origin',)
+
+    def __init__(self, name, global_id, local_id, pos_precons, neg_precons, compound_task, task_network,
+                 origin: Optional[Decomposition] = None):
+        super().__init__(name, global_id, local_id, pos_precons, neg_precons, compound_task, task_network)
+        self.origin: Optional[Decomposition] = origin
+
     
 
 class Model:
@@ -142,6 +184,13 @@ class Model:
         self.operators = operators
         self.decompositions = decompositions
         self.abstract_tasks = abstract_tasks
+        # fact ids of each SAS variable (';; Mutex Groups'), at most one of them holds in a state
+        self.mutex_groups: List[List[int]] = []
+        # method name (None for the initial task network) -> operator it had at each position before
+        # duplicate elimination replaced it, None where unchanged (PostProcessing/duplicate_elimination.py)
+        self.original_subtasks: Dict[Optional[str], List[Optional[Operator]]] = {}
+        # AND/OR graphs by graph type, shared by the heuristics (see AndOrGraph.for_model)
+        self.and_or_graphs: Dict[int, object] = {}
         
         self.desc = Descriptions()
 
@@ -154,41 +203,27 @@ class Model:
         self.iabt_end  = self.iabt_init + len(self.abstract_tasks)-1
         self.idec_init = self.iabt_end+1
         self.idec_end  = self.idec_init + len(self.decompositions)-1
+        self._index_components()
         
         #self._remove_panda_top()
     
     def get_component(self, component_id):
-        if component_id <= self.ifacts_end:
-            fact=self.facts[component_id]
-            assert fact.global_id == component_id, (
-                f'FACT COMPONENT INDEXING FAILED: expected {component_id}, got {fact.global_id}'
-            )
-            return self.facts[component_id]
-        
-        if component_id >= self.iop_init and component_id <= self.iop_end:
-            operator = self.operators[component_id - self.iop_init]
-            assert operator.global_id == component_id, (
-                f'OPERATOR COMPONENT INDEXING FAILED: expected {component_id}, got {operator.global_id}'
-            )
-            return operator
-        
-        if component_id >= self.iabt_init and component_id <= self.iabt_end:
-            abstract_task = self.abstract_tasks[component_id - self.iabt_init]
-            assert abstract_task.global_id == component_id, (
-                f'ABSTRACT TASK COMPONENT INDEXING FAILED: expected {component_id}, got {abstract_task.global_id}'
-            )
-            return abstract_task
-        
-        if component_id >= self.idec_init and component_id <= self.idec_end:
-            decomposition = self.decompositions[component_id - self.idec_init]
-            assert decomposition.global_id == component_id, (
-                f'DECOMPOSITION COMPONENT INDEXING FAILED: expected {component_id}, got {decomposition.global_id}'
-            )
-            return decomposition
-
+        if 0 <= component_id < len(self.components):
+            return self.components[component_id]
         raise ValueError(f'Invalid component_id: {component_id}')
 
-            
+    def _index_components(self):
+        """
+        Flat table indexed by global id (facts, operators, abstract tasks,
+        decompositions), so get_component is a single list lookup.
+        """
+        self.components: List[Union[Fact, Operator, AbstractTask, Decomposition]] = \
+            self.facts + self.operators + self.abstract_tasks + self.decompositions
+        for global_id, component in enumerate(self.components):
+            assert component.global_id == global_id, (
+                f'COMPONENT INDEXING FAILED: expected {global_id}, got {component.global_id} ({component.name})'
+            )
+
     #NOTE: remove artificial _top task and method added by panda 
     # def _remove_panda_top(self):
     #     self.initial_tn = self.initial_tn [0].decompositions[0].task_network #specific for panda grounder
@@ -201,47 +236,30 @@ class Model:
     #             self.abstract_tasks.remove(t)
     #             break
         
-    # def assign_global_ids(self):
-    #     next_id = len(self.facts)
-        
-    #     # Assign global IDs to operators
-    #     for o in self.operators:
-    #         o.global_id = next_id
-    #         next_id += 1
-        
-    #     self.iop_init = self.operators[0].global_id
-    #     self.iop_end = self.operators[-1].global_id
-
-    #     # Check for overlap with facts
-    #     assert self.iop_init not in self._int_to_explicit, (
-    #         'Operator index overlapped with fact index'
-    #     )
-
-    #     # Assign global IDs to abstract tasks
-    #     for ab_t in self.abstract_tasks:
-    #         ab_t.global_id = next_id
-    #         next_id += 1
-        
-    #     self.iabt_init = self.abstract_tasks[0].global_id
-    #     self.iabt_end = self.abstract_tasks[-1].global_id
-
-    #     # Check for overlap with operators
-    #     assert self.iabt_init > self.iop_end, (
-    #         'Abstract task index overlapped with operator index'
-    #     )
-
-    #     # Assign global IDs to decompositions
-    #     for d in self.decompositions:
-    #         d.global_id = next_id
-    #         next_id += 1
-        
-    #     self.idec_init = self.decompositions[0].global_id
-    #     self.idec_end = self.decompositions[-1].global_id
+    def assign_global_ids(self):
+        """
+        Renumbers operators, abstract tasks and decompositions after a
+        post-processing pass added or removed components, keeping the global
+        id layout (facts, operators, abstract tasks, decompositions) and
+        local ids equal to list positions.
+        """
+        next_id = len(self.facts)
+        for components in (self.operators, self.abstract_tasks, self.decompositions):
+            for local_id, component in enumerate(components):
+                component.global_id = next_id
+                component.local_id  = local_id
+                next_id += 1
 
-    #     # Check for overlap with abstract tasks
-    #     assert self.idec_init > self.iabt_end, (
-    #         'Decomposition index overlapped with abstract task index'
-    #     )
+        self.ifacts_end = len(self.facts) - 1
+        self.iop_init  = self.ifacts_end+1
+        self.iop_end   = self.iop_init + len(self.operators)-1
+        self.iabt_init = self.iop_end + 1
+        self.iabt_end  = self.iabt_init + len(self.abstract_tasks)-1
+        self.idec_init = self.iabt_end+1
+        self.idec_end  = self.idec_init + len(self.decompositions)-1
+        self._index_components()
+        # graphs built over the old ids
+        self.and_or_graphs = {}
 
     def state_explicit_repr(self, state):
         return [self.facts[bit_pos].name for bit_pos in range(state.bit_length()) if state & 1<<bit_pos]
@@ -249,25 +267,86 @@ class Model:
     def goal_reached(self, state, task_network=[]):
         return self.goals <= state and len(task_network) == 0
     
+    def problem_stats(self):
+        return {
+            'facts': len(self.facts),
+            'abstract_tasks': len(self.abstract_tasks),
+            'operators': len(self.operators),
+            'decompositions': len(self.decompositions),
+        }
+
     def problem_info(self):
+        stats = self.problem_stats()
         model_info = (
             f"Model info:"
-            f"\n\t{self.desc('fact_model', len(self.facts))}"
-            f"\n\t{self.desc('abstract_task_model', len(self.abstract_tasks))}"
-            f"\n\t{self.desc('operator_model', len(self.operators))}"
-            f"\n\t{self.desc('decomposition_model', len(self.decompositions))}"
+            f"\n\t{self.desc('fact_model', stats['facts'])}"
+            f"\n\t{self.desc('abstract_task_model', stats['abstract_tasks'])}"
+            f"\n\t{self.desc('operator_model', stats['operators'])}"
+            f"\n\t{self.desc('decomposition_model', stats['decompositions'])}"
         )
         return model_info
     
+    def memory_usage(self):
+        """
+        Deep size in bytes of each part of the model. A component is counted
+        once, in its own list: references to other components (method task
+        networks, compound tasks, ...) only cost the pointer.
+        """
+        component_ids = {id(c) for c in self.components}
+        seen = set()
+        def part_size(components):
+            return sys.getsizeof(components) + \
+                sum(_deep_sizeof(c, seen, component_ids) for c in components)
+        return {
+            'facts': part_size(self.facts),
+            'operators': part_size(self.operators),
+            'abstract_tasks': part_size(self.abstract_tasks),
+            'decompositions': part_size(self.decompositions),
+            'initial_state': sys.getsizeof(self.initial_state),
+            'goals': sys.getsizeof(self.goals),
+            'initial_tn': sys.getsizeof(self.initial_tn),
+            'components': sys.getsizeof(self.components),
+        }
+
     def __str__(self):
+        usage = self.memory_usage()
         memory_info = (
             f"\nMemory Usage:"
-            f"\n\tFacts: {sys.getsizeof(self.facts)} bytes"
-            f"\n\tInitial State: {sys.getsizeof(self.initial_state)} bytes"
-            f"\n\tGoals: {sys.getsizeof(self.goals)} bytes"
-            f"\n\tOperators: {sys.getsizeof(self.operators)} bytes"
-            f"\n\tInitial Task Network: {sys.getsizeof(self.initial_tn)} bytes"
-            f"\n\tDecompositions: {sys.getsizeof(self.decompositions)} bytes"
+            f"\n\tFacts: {usage['facts']} bytes"
+            f"\n\tOperators: {usage['operators']} bytes"
+            f"\n\tAbstract Tasks: {usage['abstract_tasks']} bytes"
+            f"\n\tDecompositions: {usage['decompositions']} bytes"
+            f"\n\tInitial State: {usage['initial_state']} bytes"
+            f"\n\tGoals: {usage['goals']} bytes"
+            f"\n\tInitial Task Network: {usage['initial_tn']} bytes"
+            f"\n\tComponent Index: {usage['components']} bytes"
+            f"\n\tTotal: {sum(usage.values())} bytes"
         )
         return memory_info
-    
+
+
+def _deep_sizeof(obj, seen, stop=frozenset()) -> int:
+    """
+    sys.getsizeof of obj plus everything it references: container items and
+    __slots__ attributes. Objects whose id is in `stop` are not followed
+    (unless obj itself), `seen` holds the ids already counted.
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or (o is not obj and id(o) in stop):
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        else:
+            for cls in type(o).__mro__:
+                for slot in cls.__dict__.get('__slots__', ()):
+                    if hasattr(o, slot):
+                        stack.append(getattr(o, slot))
+    return size
@@ -6,14 +6,17 @@ import time
 from Pytrich.Grounder.panda_ground import PandaGrounder
 from Pytrich.Heuristics.aggregation import Max, Tiebreaking
 from Pytrich.Heuristics.hmax_heuristic import HmaxHeuristic
-from Pytrich.Search.htn_node import AstarNode, HTNNode, TiebreakingNode
+from Pytrich.Search.htn_node import AstarNode, GreedyNode, HTNNode, TiebreakingNode
 # heursitic
 from .Heuristics.blind_heuristic import BlindHeuristic
 from .Heuristics.tdg_heuristic import TaskDecompositionHeuristic
 from .Heuristics.lmcount_heuristic import LandmarkCountHeuristic
 from .Heuristics.novelty_heuristic import NoveltyHeuristic
+from .Heuristics.relaxed_heuristic import AdditiveHeuristic, FFHeuristic
+from .Heuristics.lmcut_heuristic import LMCutHeuristic
 # search
 from .Search.astar_search import search as astar_search
+from .Search.greedy_search import search as greedy_search
 from .Search.blind_search import search as blind_search
 from .Search.depth_first_search import search as depth_first_search
 from .Search.recdepth_first_search import search as recdepth_first_search
@@ -21,6 +24,7 @@ from .Search.recdepth_first_search import search as recdepth_first_search
 SEARCHES = {
     "Blind": blind_search,
     "Astar": astar_search,
+    "GBFS": greedy_search,
     "DFS": depth_first_search,
     "rDFS": recdepth_first_search,
 }
@@ -30,13 +34,16 @@ HEURISTICS = {
     "LMCOUNT"  : LandmarkCountHeuristic,
     "TDG"      : TaskDecompositionHeuristic,
     "NOVELTY"  : NoveltyHeuristic,
-    "HMAX"     : HmaxHeuristic
+    "HMAX"     : HmaxHeuristic,
+    "HADD"     : AdditiveHeuristic,
+    "HFF"      : FFHeuristic,
+    "LMCUT"    : LMCutHeuristic
 }
 
 NODES = {
     "HTNNode"    : HTNNode,
     "AstarNode"  : AstarNode,
-    "GreedyNode"  : AstarNode,
+    "GreedyNode"  : GreedyNode,
     "TiebreakingNode": TiebreakingNode
 }
 
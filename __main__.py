@@ -40,6 +40,49 @@ def main():
         action="store_true",
         help="Use total-order reachability analysis during grounding post-processing"
     )
+    argparser.add_argument(
+        "-mp", "--mutexpruning", 
+        action="store_true",
+        help="Drop operators and methods whose preconditions are mutually exclusive under the SAS mutex groups"
+    )
+    argparser.add_argument(
+        "-ps", "--packedstates", 
+        action="store_true",
+        help="Store search states with one field per SAS variable instead of one bit per fact"
+    )
+    argparser.add_argument(
+        "-mc", "--macros", 
+        action="store_true",
+        help="Inline single-method tasks and compile leading operator runs into macro operators during grounding post-processing"
+    )
+    argparser.add_argument(
+        "-fr", "--factrelevance", 
+        action="store_true",
+        help="Drop facts that are never a precondition or goal and re-index the remaining ones densely during grounding post-processing"
+    )
+    argparser.add_argument(
+        "-de", "--duplicates", 
+        action="store_true",
+        help="Merge duplicate operators and methods during grounding post-processing"
+    )
+    argparser.add_argument(
+        "-dm", "--dominance", 
+        action="store_true",
+        help="Merge duplicates and drop methods dominated by a weaker-precondition method with the same task network"
+    )
+    argparser.add_argument(
+        "-mt", "--methodtrie", 
+        action="store_true",
+        help="Factor the common leading subtasks of each task's methods into a trie of artificial tasks"
+    )
+    argparser.add_argument(
+        "--grounding_cache",
+        help="Directory of grounded SAS files; identical domain/problem pairs are grounded once, also across concurrent runs"
+    )
+    argparser.add_argument(
+        "--model_cache",
+        help="Directory of post-processed model snapshots; repeated runs on the same SAS file skip parsing and post-processing"
+    )
     argparser.add_argument(
         "-mg", "--monitorgrounder", 
         action="store_true",
@@ -103,6 +146,15 @@ def main():
     FLAGS.MONITOR_SEARCH_RESOURCES = args.monitorsearch
     FLAGS.MONITOR_LM_TIME = args.monitorlandmarks
     FLAGS.USE_TO_REACHABILITY = args.totalorderreachability
+    FLAGS.USE_MACROS = args.macros
+    FLAGS.USE_FACT_RELEVANCE = args.factrelevance
+    FLAGS.USE_DUPLICATE_ELIMINATION = args.duplicates
+    FLAGS.USE_METHOD_DOMINANCE = args.dominance
+    FLAGS.USE_METHOD_TRIE = args.methodtrie
+    FLAGS.USE_MUTEX_PRUNING = args.mutexpruning
+    FLAGS.PACKED_STATES = args.packedstates
+    FLAGS.MODEL_CACHE_DIR = args.model_cache
+    FLAGS.GROUNDING_CACHE_DIR = args.grounding_cache
 
     # Extract domain and problem names if provided
     domain_name = os.path.basename(os.path.dirname(args.domain)) if args.domain else None